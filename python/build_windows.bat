@@ -21,6 +21,7 @@ echo Cleaning previous builds...
 if exist build rmdir /s /q build
 if exist dist rmdir /s /q dist
 if exist SpecteraEditor.spec del SpecteraEditor.spec
+if exist SpecteraCLI.spec del SpecteraCLI.spec
 
 REM Build the application
 echo Building application...
@@ -32,6 +33,21 @@ python -m PyInstaller ^
     --icon=NONE ^
     spectera_editor.py
 
+if errorlevel 1 (
+    echo.
+    echo Build failed. Please check the error messages above.
+    exit /b 1
+)
+
+REM A --windowed build has no console, so the command line tools get their own console build
+echo Building command line tools...
+python -m PyInstaller ^
+    --name="SpecteraCLI" ^
+    --console ^
+    --onefile ^
+    --icon=NONE ^
+    spectera_editor.py
+
 if errorlevel 1 (
     echo.
     echo Build failed. Please check the error messages above.
@@ -39,7 +55,8 @@ if errorlevel 1 (
 ) else (
     echo.
     echo Build successful!
-    echo The executable is located at: dist\SpecteraEditor.exe
+    echo The GUI is located at: dist\SpecteraEditor.exe
+    echo The command line tools are located at: dist\SpecteraCLI.exe
     echo.
-    echo You can now distribute this .exe file to any Windows machine.
+    echo You can now distribute these .exe files to any Windows machine.
 )
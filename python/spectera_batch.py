@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Spectera Batch Transfer
+Runs many source/target transfers from a manifest across a process pool.
+
+Manifest format (JSON):
+    {
+        "jobs": [
+            {"source": "primary_A.json", "target": "backup_A.json",
+             "selection": "all", "output": "out/A.json"},
+            {"source": "primary_B.json", "target": "backup_B.json",
+             "selection": [16788133, "Brad"]}
+        ]
+    }
+
+Relative source/target paths are resolved against the manifest directory and
+relative output paths against the output directory. "selection" is
+"all" (the default) or a list of device UIDs and/or names. "match" is "auto"
+(the default: by name, type and slot, then position) or "position". When
+"output" is omitted the file is written to the output directory as
+<target>_transfer.json.
+
+Copyright (C) 2024
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from spectera_engine import TransferError, run_transfer_files
+from spectera_match import POSITION_ONLY, STRATEGIES
+from spectera_profile import NULL_TIMER, StageTimer
+
+
+def load_manifest(manifest_path: str, output_dir: Optional[str] = None) -> List[Dict]:
+    """Read a manifest and resolve every job to absolute paths"""
+    with open(manifest_path, 'rb') as f:
+        manifest = json.loads(f.read())
+
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    output_dir = os.path.abspath(output_dir) if output_dir else base_dir
+    jobs = manifest.get('jobs', []) if isinstance(manifest, dict) else manifest
+
+    resolved = []
+    for index, job in enumerate(jobs):
+        if 'source' not in job or 'target' not in job:
+            raise ValueError(f"Job {index} needs both 'source' and 'target'")
+        source = os.path.join(base_dir, job['source'])
+        target = os.path.join(base_dir, job['target'])
+        if job.get('output'):
+            output = os.path.join(output_dir, job['output'])
+        else:
+            stem = os.path.splitext(os.path.basename(target))[0]
+            output = os.path.join(output_dir, f"{stem}_transfer.json")
+        resolved.append({
+            'index': index,
+            'source': source,
+            'target': target,
+            'output': output,
+            'selection': job.get('selection', 'all'),
+            'match': job.get('match', 'auto'),
+        })
+
+    outputs = [job['output'] for job in resolved]
+    if len(set(outputs)) != len(outputs):
+        raise ValueError("Two or more jobs write to the same output file")
+    return resolved
+
+
+def run_job(job: Dict) -> Dict:
+    """Run one manifest job; never raises so a bad pair cannot stop the batch"""
+    start = time.perf_counter()
+    timer = StageTimer('batch_job', target=job['target']) if job.get('timings') else NULL_TIMER
+    try:
+        out_dir = os.path.dirname(job['output'])
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+        strategies = POSITION_ONLY if job.get('match') == 'position' else STRATEGIES
+        summary = run_transfer_files(job['source'], job['target'], job['output'], job['selection'],
+                                     strategies, timer, compact=job.get('compact', False))
+        summary['status'] = 'ok'
+    except TransferError as e:
+        summary = {'status': 'error', 'error': f"{e.title}: {e.message}"}
+    except Exception as e:
+        summary = {'status': 'error', 'error': f"{type(e).__name__}: {e}"}
+    summary.update({
+        'index': job['index'],
+        'source': job['source'],
+        'target': job['target'],
+        'output': job['output'],
+        'seconds': round(time.perf_counter() - start, 4),
+    })
+    if timer.enabled:
+        summary['stages'] = timer.to_record()['stages']
+    return summary
+
+
+def run_batch(jobs: List[Dict], workers: Optional[int] = None) -> List[Dict]:
+    """Run all jobs across a process pool and return results in manifest order"""
+    if workers == 1 or len(jobs) <= 1:
+        return [run_job(job) for job in jobs]
+
+    # Imported here: the process pool machinery is slow to import and serial runs never need it
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_job, job) for job in jobs]
+        for future in as_completed(futures):
+            results.append(future.result())
+    results.sort(key=lambda r: r['index'])
+    return results
+
+
+def build_report(results: List[Dict], elapsed: float) -> Dict:
+    """Summarize a batch run"""
+    failed = [r for r in results if r['status'] != 'ok']
+    return {
+        'generated': datetime.now().isoformat(timespec='seconds'),
+        'jobs': len(results),
+        'succeeded': len(results) - len(failed),
+        'failed': len(failed),
+        'seconds': round(elapsed, 4),
+        'results': results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run Spectera settings transfers from a manifest")
+    parser.add_argument('manifest', help="JSON manifest listing source/target/selection jobs")
+    parser.add_argument('-o', '--output-dir', help="Directory for job outputs (default: manifest directory)")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="Number of worker processes (default: all cores)")
+    parser.add_argument('-r', '--report', default=None,
+                        help="Summary report path (default: batch_report.json in the output directory)")
+    parser.add_argument('--timings', action='store_true',
+                        help="Record per-stage timings for every job in the report")
+    parser.add_argument('--compact', action='store_true',
+                        help="Hold configs as compact records: less memory, slower transfers")
+    args = parser.parse_args(argv)
+
+    try:
+        jobs = load_manifest(args.manifest, args.output_dir)
+    except (OSError, ValueError) as e:
+        print(f"Failed to read manifest: {e}", file=sys.stderr)
+        return 2
+
+    for job in jobs:
+        job['timings'] = args.timings
+        job['compact'] = args.compact
+    start = time.perf_counter()
+    results = run_batch(jobs, args.jobs)
+    report = build_report(results, time.perf_counter() - start)
+
+    report_path = args.report or os.path.join(
+        os.path.abspath(args.output_dir) if args.output_dir else os.path.dirname(os.path.abspath(args.manifest)),
+        "batch_report.json"
+    )
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for r in results:
+        if r['status'] == 'ok':
+            print(f"[ok]    {os.path.basename(r['output'])}: {r['description']}")
+        else:
+            print(f"[error] {os.path.basename(r['target'])}: {r['error']}")
+    print(f"{report['succeeded']}/{report['jobs']} jobs succeeded in {report['seconds']}s; report: {report_path}")
+    return 0 if report['failed'] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
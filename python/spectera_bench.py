@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Spectera transfer benchmarks
+Times each stage of the transfer pipeline on synthetic configs (see spectera_synth)
+and records wall time and peak traced memory as JSON, so results from two versions
+can be compared.
+
+    python spectera_bench.py suite --devices 1000 10000 --output bench.json
+    python spectera_bench.py suite --devices 1000 10000 --compare bench.json
+    python spectera_bench.py cow --devices 5000 --selected 50
+    python spectera_bench.py fleet --devices 5000 --targets 8 --workers 1 2 4
+    python spectera_bench.py startup --budget-ms 75
+
+Copyright (C) 2024
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+"""
+
+import argparse
+import copy
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import spectera_engine as engine
+import spectera_fleet as fleet
+from spectera_validate import validate_config
+from spectera_match import DeviceMatcher
+from spectera_synth import generate_config, repaired_target
+
+
+STAGES = ('load', 'index', 'uid_mapping', 'routing_clone', 'transfer', 'validation', 'save')
+
+# Modules the command line tools load; none of them may pull in tkinter
+STARTUP_MODULES = ('spectera_editor', 'spectera_engine', 'spectera_batch', 'spectera_fleet',
+                   'spectera_merge', 'spectera_diff', 'spectera_validate', 'spectera_cache',
+                   'spectera_watch', 'spectera_history')
+STARTUP_BUDGET_MS = 75.0
+
+
+def deepcopy_transfer(source_data: Dict, target_data: Dict, selected_devices: List[Dict]) -> Dict:
+    """Reference implementation: deep-copy the whole target, then every routed record"""
+    output_data = copy.deepcopy(target_data)
+    uid_mapping = engine.map_uids_by_position(
+        source_data['pairedDevices'], target_data['pairedDevices'],
+        {d.get('mtUid') for d in selected_devices}
+    )
+    output_devices = []
+    for device in selected_devices:
+        new_device = copy.deepcopy(device)
+        new_device['mtUid'] = uid_mapping.get(device.get('mtUid'), device.get('mtUid'))
+        output_devices.append(new_device)
+    output_data['pairedDevices'] = output_devices
+
+    used = engine.get_audiolink_ids_for_devices(selected_devices)
+    link_ids = {link.get('audiolinkId') for link in output_data['audiolinks']}
+    for link in source_data['audiolinks']:
+        if link.get('audiolinkId') in used and link.get('audiolinkId') not in link_ids:
+            output_data['audiolinks'].append(copy.deepcopy(link))
+    for section, id_key, link_key in (('audioInputs', 'inputId', 'iemAudiolinkId'),
+                                      ('audioOutputs', 'outputId', 'micAudiolinkId')):
+        by_id = {rec.get(id_key): rec for rec in output_data[section]}
+        for rec in source_data[section]:
+            if rec.get(link_key, -1) in used and rec.get(id_key) in by_id:
+                by_id[rec.get(id_key)].update(copy.deepcopy(rec))
+    return output_data
+
+
+def measure(func: Callable, repeat: int = 3) -> Dict:
+    """Return best wall time and peak traced allocation for func()"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'seconds': best, 'peak_bytes': peak}
+
+
+def bench_copy_on_write(devices: int, selected: Optional[int] = None, repeat: int = 3) -> Dict:
+    """Time the deepcopy and copy-on-write transfers on a synthetic config pair"""
+    source = generate_config(devices)
+    target = repaired_target(source)
+    chosen = source['pairedDevices'] if selected is None else source['pairedDevices'][:selected]
+    source_index = engine.RoutingIndex(source)
+    target_index = engine.RoutingIndex(target)
+    matcher = DeviceMatcher(target['pairedDevices'])
+
+    deep = measure(lambda: deepcopy_transfer(source, target, chosen), repeat)
+    cow = measure(lambda: engine.generate_transfer(
+        source, target, chosen, source_index, target_index, matcher=matcher), repeat)
+    return {
+        'devices': devices,
+        'selected': len(chosen),
+        'deepcopy': deep,
+        'copy_on_write': cow,
+        'speedup': deep['seconds'] / cow['seconds'] if cow['seconds'] else float('inf'),
+        'memory_ratio': deep['peak_bytes'] / cow['peak_bytes'] if cow['peak_bytes'] else float('inf'),
+    }
+
+
+def bench_pipeline(devices: int, selected: Optional[int] = None, repeat: int = 3,
+                   shuffle: bool = True) -> Dict:
+    """Time every stage of a file-to-file transfer for one config size"""
+    source = generate_config(devices)
+    target = repaired_target(source, shuffle=shuffle)
+    chosen = source['pairedDevices'] if selected is None else source['pairedDevices'][:selected]
+    chosen_uids = {d['mtUid'] for d in chosen}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source_path = os.path.join(tmp, 'source.json')
+        target_path = os.path.join(tmp, 'target.json')
+        output_path = os.path.join(tmp, 'output.json')
+        engine.save_config(source, source_path)
+        engine.save_config(target, target_path)
+
+        source_index = engine.RoutingIndex(source)
+        target_index = engine.RoutingIndex(target)
+        matcher = DeviceMatcher(target['pairedDevices'])
+        result = engine.generate_transfer(source, target, chosen, source_index, target_index, matcher=matcher)
+        output = result.output_data
+
+        stages = {
+            'load': lambda: (engine.load_config(source_path), engine.load_config(target_path)),
+            'index': lambda: (engine.RoutingIndex(source), engine.RoutingIndex(target),
+                              DeviceMatcher(target['pairedDevices'])),
+            'uid_mapping': lambda: matcher.match(source['pairedDevices'], chosen_uids),
+            'routing_clone': lambda: engine.clone_devices_with_routing(
+                source, chosen, dict(target), source_index, target_index),
+            'transfer': lambda: engine.generate_transfer(
+                source, target, chosen, source_index, target_index, matcher=matcher),
+            'validation': lambda: validate_config(output),
+            'save': lambda: engine.save_config(output, output_path),
+        }
+        timings = {name: measure(stages[name], repeat) for name in STAGES}
+        output_bytes = os.path.getsize(output_path)
+
+    return {
+        'devices': devices,
+        'selected': len(chosen),
+        'counts': {section: len(source[section]) for section in
+                   ('pairedDevices', 'audiolinks', 'audioInputs', 'audioOutputs')},
+        'output_bytes': output_bytes,
+        'stages': timings,
+    }
+
+
+def bench_fleet(devices: int, targets: int, workers: List[int]) -> Dict:
+    """Time one source to many targets for each worker count (one run each; pools are costly to start)"""
+    source_data = generate_config(devices)
+    with tempfile.TemporaryDirectory() as tmp:
+        source_path = os.path.join(tmp, 'source.json')
+        engine.save_config(source_data, source_path)
+        target_paths = []
+        for i in range(targets):
+            target_paths.append(os.path.join(tmp, f"target_{i}.json"))
+            engine.save_config(repaired_target(source_data, shuffle=True, seed=i), target_paths[-1])
+
+        source = fleet.FleetSource.load(source_path)
+        runs = []
+        for count in workers:
+            jobs = fleet.plan_targets(target_paths, os.path.join(tmp, f"out_{count}"))
+            start = time.perf_counter()
+            results = fleet.run_fleet(source, jobs, count)
+            elapsed = time.perf_counter() - start
+            runs.append({
+                'workers': count,
+                'seconds': elapsed,
+                'targets_per_second': targets / elapsed if elapsed else float('inf'),
+                'failed': sum(1 for r in results if r['status'] != 'ok'),
+            })
+    return {'devices': devices, 'targets': targets, 'runs': runs}
+
+
+def bench_startup(modules=STARTUP_MODULES, repeat: int = 5) -> List[Dict]:
+    """Import each module in a fresh interpreter; best import time and whether Tk got loaded"""
+    code = ("import sys, time; start = time.perf_counter(); import {module}; "
+            "print(time.perf_counter() - start, 'tkinter' in sys.modules)")
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for module in modules:
+        best = None
+        tkinter = False
+        for _ in range(repeat):
+            out = subprocess.run([sys.executable, '-c', code.format(module=module)], cwd=here,
+                                 capture_output=True, text=True, check=True).stdout.split()
+            seconds = float(out[0])
+            best = seconds if best is None else min(best, seconds)
+            tkinter = tkinter or out[1] == 'True'
+        results.append({'module': module, 'import_ms': best * 1000, 'tkinter': tkinter})
+    return results
+
+
+def environment() -> Dict:
+    """Describe where the benchmark ran, so results from different machines are not mixed up"""
+    info = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+    try:
+        info['git_revision'] = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        info['git_revision'] = None
+    return info
+
+
+def compare(results: Dict, baseline: Dict, threshold: float = 1.25) -> List[str]:
+    """Return a line per stage that got slower (or used more memory) than threshold x baseline"""
+    regressions = []
+    previous = {r['devices']: r for r in baseline.get('results', [])}
+    for r in results['results']:
+        old = previous.get(r['devices'])
+        if old is None:
+            continue
+        for stage, now in r['stages'].items():
+            before = old.get('stages', {}).get(stage)
+            if not before:
+                continue
+            for metric in ('seconds', 'peak_bytes'):
+                if before[metric] and now[metric] > before[metric] * threshold:
+                    regressions.append(
+                        f"{r['devices']} devices, {stage}: {metric} {before[metric]:.4g} -> {now[metric]:.4g} "
+                        f"({now[metric] / before[metric]:.2f}x)"
+                    )
+    return regressions
+
+
+def print_pipeline(r: Dict):
+    print(f"\n{r['devices']} devices ({r['selected']} selected), "
+          f"{r['counts']['audiolinks']} audiolinks, {r['counts']['audioInputs']} inputs, "
+          f"{r['counts']['audioOutputs']} outputs, output {r['output_bytes'] / 1e6:.2f} MB")
+    for stage in STAGES:
+        t = r['stages'][stage]
+        print(f"  {stage:<14} {t['seconds'] * 1000:>10.2f} ms {t['peak_bytes'] / 1e6:>9.2f} MB peak")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the Spectera transfer pipeline")
+    sub = parser.add_subparsers(dest='command')
+
+    suite = sub.add_parser('suite', help="Time every pipeline stage (default)")
+    suite.add_argument('--devices', type=int, nargs='+', default=[1000, 10000],
+                       help="Devices per synthetic config (default: 1000 10000)")
+    suite.add_argument('--selected', type=int, default=None, help="Devices to transfer (default: all)")
+    suite.add_argument('--repeat', type=int, default=3)
+    suite.add_argument('--output', help="Write results as JSON to this path")
+    suite.add_argument('--compare', help="Baseline results JSON to check for regressions")
+    suite.add_argument('--threshold', type=float, default=1.25,
+                       help="Slowdown factor that counts as a regression (default: 1.25)")
+
+    cow = sub.add_parser('cow', help="Compare copy-on-write output construction against deepcopy")
+    cow.add_argument('--devices', type=int, nargs='+', default=[1000, 5000])
+    cow.add_argument('--selected', type=int, default=None)
+    cow.add_argument('--repeat', type=int, default=3)
+
+    fleet_parser = sub.add_parser('fleet', help="Time one source to many targets across worker counts")
+    fleet_parser.add_argument('--devices', type=int, default=2000)
+    fleet_parser.add_argument('--targets', type=int, default=8)
+    fleet_parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+
+    startup = sub.add_parser('startup', help="Check headless import times against a budget")
+    startup.add_argument('--budget-ms', type=float, default=STARTUP_BUDGET_MS,
+                         help=f"Maximum import time per module (default: {STARTUP_BUDGET_MS:g} ms)")
+    startup.add_argument('--repeat', type=int, default=5)
+
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] not in ('suite', 'cow', 'fleet', 'startup', '-h', '--help'):
+        argv.insert(0, 'suite')
+    args = parser.parse_args(argv)
+
+    if args.command == 'cow':
+        print(f"{'devices':>8} {'selected':>8} {'deepcopy':>10} {'cow':>10} {'speedup':>8} "
+              f"{'deep MB':>8} {'cow MB':>8}")
+        for devices in args.devices:
+            r = bench_copy_on_write(devices, args.selected, args.repeat)
+            print(f"{r['devices']:>8} {r['selected']:>8} {r['deepcopy']['seconds']:>9.4f}s "
+                  f"{r['copy_on_write']['seconds']:>9.4f}s {r['speedup']:>7.1f}x "
+                  f"{r['deepcopy']['peak_bytes'] / 1e6:>8.2f} {r['copy_on_write']['peak_bytes'] / 1e6:>8.2f}")
+        return 0
+
+    if args.command == 'startup':
+        failures = 0
+        for r in bench_startup(repeat=args.repeat):
+            problems = []
+            if r['import_ms'] > args.budget_ms:
+                problems.append(f"over the {args.budget_ms:g} ms budget")
+            if r['tkinter']:
+                problems.append("imports tkinter")
+            failures += bool(problems)
+            print(f"  {r['module']:<20} {r['import_ms']:>8.1f} ms  {'; '.join(problems) or 'ok'}")
+        return 1 if failures else 0
+
+    if args.command == 'fleet':
+        r = bench_fleet(args.devices, args.targets, args.workers)
+        print(f"{r['devices']} devices to {r['targets']} targets")
+        base = r['runs'][0]['seconds']
+        for run in r['runs']:
+            print(f"  {run['workers']:>3} workers {run['seconds']:>8.3f}s {run['targets_per_second']:>7.2f} targets/s "
+                  f"{base / run['seconds']:>5.2f}x{'  (' + str(run['failed']) + ' failed)' if run['failed'] else ''}")
+        return 0
+
+    results = {'environment': environment(), 'results': []}
+    for devices in args.devices:
+        r = bench_pipeline(devices, args.selected, args.repeat)
+        results['results'].append(r)
+        print_pipeline(r)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'rb') as f:
+            regressions = compare(results, json.loads(f.read()), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.compare}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nNo regressions against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Spectera config cache
+Keeps recently opened base station exports parsed and indexed, so reopening a
+known file (or switching between recent ones) skips reading and parsing.
+
+Copyright (C) 2024
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+"""
+
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+import spectera_engine as engine
+from spectera_model import compact_config
+from spectera_profile import NULL_TIMER, StageTimer
+from spectera_validate import ValidationReport, validate_config
+
+
+# Bump when the pickled payload layout changes so stale disk entries are ignored
+DISK_FORMAT_VERSION = 2
+
+
+class CachedConfig:
+    """A parsed config plus indexes derived from it
+
+    Entries are shared between callers; treat ``data`` and every derived
+    object as read-only.
+    """
+
+    def __init__(self, digest: str, size: int, data: Dict, derived: Optional[Dict] = None):
+        self.digest = digest
+        self.size = size
+        self.data = data
+        self._derived = derived or {}
+        self._lock = threading.Lock()
+
+    @property
+    def routing(self) -> engine.RoutingIndex:
+        return self.derived('routing', engine.RoutingIndex)
+
+    @property
+    def validation(self) -> ValidationReport:
+        return self.derived('validation', validate_config)
+
+    def derived(self, name: str, factory: Callable[[Dict], object]):
+        """Return factory(data), computing it once per entry"""
+        with self._lock:
+            if name not in self._derived:
+                self._derived[name] = factory(self.data)
+            return self._derived[name]
+
+
+class ConfigCache:
+    """LRU cache of parsed configs keyed by content hash
+
+    A (path, size, mtime) lookup answers repeat opens of an unchanged file without
+    touching its contents; a file whose stat changed is re-read and hashed, and is
+    only re-parsed if its content is actually new. Memory is bounded by the total
+    size of the cached files (max_bytes) and by max_entries. With disk_dir set,
+    parsed entries are also pickled there so they survive a restart; only point it
+    at a directory you trust, as pickles are loaded from it. With compact, parsed
+    configs are held as compact records (see spectera_model), which take much less
+    memory and save to the same bytes.
+    """
+
+    def __init__(self, max_entries: int = 8, max_bytes: int = 256 * 1024 * 1024,
+                 disk_dir: Optional[str] = None, max_disk_entries: int = 32, compact: bool = False):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_entries = max_disk_entries
+        self.compact = compact
+        self._entries = OrderedDict()  # digest -> CachedConfig, least recently used first
+        self._stat_keys = {}           # (path, size, mtime_ns) -> digest
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+            }
+
+    def describe(self) -> str:
+        """One-line summary for status bars and logs"""
+        s = self.stats()
+        return f"cache: {s['hits']} hits, {s['disk_hits']} disk hits, {s['misses']} misses"
+
+    def load(self, path: str, progress: Optional[Callable[[int, int], None]] = None,
+             timer: StageTimer = NULL_TIMER) -> CachedConfig:
+        """Return the cached entry for path, reading and parsing it only when needed"""
+        st = os.stat(path)
+        stat_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+
+        with self._lock:
+            digest = self._stat_keys.get(stat_key)
+            if digest is not None and digest in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(digest)
+                return self._entries[digest]
+
+        raw = engine.read_config_bytes(path, progress, timer=timer)
+        with timer.stage('hash'):
+            digest = hashlib.sha256(raw).hexdigest()
+
+        with self._lock:
+            self._stat_keys[stat_key] = digest
+            entry = self._entries.get(digest)
+            if entry is not None:
+                self.hits += 1
+                self._entries.move_to_end(digest)
+                return entry
+
+        with timer.stage('disk_cache'):
+            entry = self._load_from_disk(digest, len(raw))
+        if entry is not None:
+            with self._lock:
+                self.disk_hits += 1
+        else:
+            data = engine.parse_config(raw, timer)
+            if self.compact:
+                data = compact_config(data, timer)
+            entry = CachedConfig(digest, len(raw), data)
+            with self._lock:
+                self.misses += 1
+            if self.disk_dir:
+                entry.routing  # Build the derived indexes so they are persisted with the data
+                entry.validation
+                self.store(entry)
+
+        self._insert(entry)
+        return entry
+
+    def store(self, entry: CachedConfig):
+        """Persist an entry (with its derived indexes) to the disk tier, if enabled"""
+        if not self.disk_dir:
+            return
+        path = self._disk_path(entry.digest)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with entry._lock:
+            payload = (DISK_FORMAT_VERSION, entry.size, entry.data, dict(entry._derived))
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except (OSError, pickle.PicklingError):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._trim_disk()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stat_keys.clear()
+            self._bytes = 0
+
+    def _insert(self, entry: CachedConfig):
+        with self._lock:
+            if entry.digest not in self._entries:
+                self._entries[entry.digest] = entry
+                self._bytes += entry.size
+            self._entries.move_to_end(entry.digest)
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self.evictions += 1
+            live = set(self._entries)
+            if len(self._stat_keys) > 4 * self.max_entries:
+                self._stat_keys = {k: d for k, d in self._stat_keys.items() if d in live}
+
+    def _disk_path(self, digest: str) -> str:
+        # Compact and plain-dict payloads are kept apart so each cache gets the layout it asked for
+        layout = 'c' if self.compact else 'd'
+        return os.path.join(self.disk_dir, f"{digest}.v{DISK_FORMAT_VERSION}.{layout}.pickle")
+
+    def _load_from_disk(self, digest: str, size: int) -> Optional[CachedConfig]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(digest)
+        try:
+            with open(path, 'rb') as f:
+                version, cached_size, data, derived = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Corrupt or incompatible entry: drop it and fall back to parsing
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        if version != DISK_FORMAT_VERSION or cached_size != size:
+            return None
+        os.utime(path)
+        return CachedConfig(digest, size, data, derived)
+
+    def _trim_disk(self):
+        try:
+            names = [n for n in os.listdir(self.disk_dir) if n.endswith('.pickle')]
+        except OSError:
+            return
+        if len(names) <= self.max_disk_entries:
+            return
+        paths = sorted((os.path.join(self.disk_dir, n) for n in names), key=os.path.getmtime)
+        for path in paths[:len(paths) - self.max_disk_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Spectera device list model
+Selection state and incremental search over pairedDevices, independent of the GUI toolkit.
+
+Copyright (C) 2024
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+
+# Search prefixes that restrict a term to one field, e.g. "type:SEK rf:1 uid:1678"
+FIELD_PREFIXES = {
+    'name': 0,
+    'type': 1,
+    'rf': 2,
+    'uid': 3,
+}
+
+
+class DeviceListModel:
+    """Selection and filter state for a (possibly very large) pairedDevices list
+
+    Selection is kept in a bytearray indexed by position in pairedDevices, and the
+    current filter result in ``view`` (a list of positions), so a view can render
+    any window of rows without touching the rest.
+    """
+
+    def __init__(self, devices: Optional[List[Dict]] = None):
+        self.devices = list(devices or [])
+        self.selected = bytearray(len(self.devices))
+        # Lower-cased (name, type, rfChannelId, mtUid) per device, built once
+        self._fields = [
+            (str(d.get('name', 'Unnamed')).lower(), str(d.get('type', '')).lower(),
+             str(d.get('rfChannelId', '')), str(d.get('mtUid', '')))
+            for d in self.devices
+        ]
+        self.view = list(range(len(self.devices)))
+        self.query = ''
+
+    def __len__(self) -> int:
+        return len(self.view)
+
+    def row(self, view_pos: int) -> Tuple[int, Dict]:
+        """Return (device index, device) for a position in the current view"""
+        index = self.view[view_pos]
+        return index, self.devices[index]
+
+    @staticmethod
+    def _parse(query: str) -> List[Tuple[Optional[int], str]]:
+        terms = []
+        for token in query.lower().split():
+            field, sep, value = token.partition(':')
+            if sep and field in FIELD_PREFIXES:
+                terms.append((FIELD_PREFIXES[field], value))
+            else:
+                terms.append((None, token))
+        return terms
+
+    def _matches(self, index: int, terms: List[Tuple[Optional[int], str]]) -> bool:
+        fields = self._fields[index]
+        for field, value in terms:
+            if field is None:
+                if not any(value in f for f in fields):
+                    return False
+            elif field == FIELD_PREFIXES['rf']:
+                if value and fields[field] != value:
+                    return False
+            elif value not in fields[field]:
+                return False
+        return True
+
+    @staticmethod
+    def _narrows(old_terms: List[Tuple[Optional[int], str]], new_terms: List[Tuple[Optional[int], str]]) -> bool:
+        """True when every match of new_terms is also a match of old_terms"""
+        if not old_terms or len(new_terms) < len(old_terms):
+            return False
+        last = len(old_terms) - 1
+        if new_terms[:last] != old_terms[:last]:
+            return False
+        (old_field, old_value), (new_field, new_value) = old_terms[last], new_terms[last]
+        if old_field != new_field:
+            return False
+        if old_field == FIELD_PREFIXES['rf']:
+            return old_value == new_value
+        return old_value in new_value
+
+    def filter(self, query: str) -> List[int]:
+        """Restrict the view to devices matching every term of query
+
+        Typing more characters only narrows the previous result, so each keystroke
+        scans the current matches instead of the whole list.
+        """
+        query = query.strip()
+        terms = self._parse(query)
+        narrowing = self._narrows(self._parse(self.query), terms)
+        candidates = self.view if narrowing else range(len(self.devices))
+        if terms:
+            self.view = [i for i in candidates if self._matches(i, terms)]
+        else:
+            self.view = list(range(len(self.devices)))
+        self.query = query
+        return self.view
+
+    def is_selected(self, index: int) -> bool:
+        return bool(self.selected[index])
+
+    def toggle(self, index: int) -> bool:
+        """Flip the selection of one device and return its new state"""
+        self.selected[index] ^= 1
+        return bool(self.selected[index])
+
+    def set_all(self, value: bool):
+        """Select or deselect every device, ignoring the filter"""
+        self.selected = bytearray([1 if value else 0]) * len(self.devices)
+
+    def set_visible(self, value: bool):
+        """Select or deselect every device in the current view"""
+        if len(self.view) == len(self.devices):
+            self.set_all(value)
+            return
+        flag = 1 if value else 0
+        for index in self.view:
+            self.selected[index] = flag
+
+    def selected_count(self) -> int:
+        return self.selected.count(1)
+
+    def selected_devices(self) -> List[Dict]:
+        """Selected devices in pairedDevices order"""
+        return [d for d, flag in zip(self.devices, self.selected) if flag]
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Spectera config diff and patch
+Aligns two configs' records by key (pairedDevices by mtUid, audiolinks by
+audiolinkId, audioInputs by inputId, audioOutputs by outputId) and records only
+what changed: removed IDs, added records, and per-record field changes. A patch
+applies to the base config incrementally, sharing every untouched record, and
+reproduces the new config exactly (record order and key order included).
+
+    python spectera_diff.py diff target.json output.json -o transfer.patch.json
+    python spectera_diff.py apply target.json transfer.patch.json -o output.json
+    python spectera_diff.py show transfer.patch.json
+
+Copyright (C) 2024
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+from typing import Dict, List, Optional
+
+from spectera_engine import copy_record, load_config, save_config
+from spectera_model import is_record
+from spectera_writer import encoder_for, iter_config_chunks
+
+
+PATCH_FORMAT = 'spectera-patch'
+PATCH_VERSION = 1
+
+KEYED_SECTIONS = {
+    'pairedDevices': 'mtUid',
+    'audiolinks': 'audiolinkId',
+    'audioInputs': 'inputId',
+    'audioOutputs': 'outputId',
+}
+
+_MISSING = object()
+
+
+class PatchError(ValueError):
+    """Raised when a patch does not fit the config it is applied to"""
+
+
+def config_digest(data: Dict) -> str:
+    """sha256 of the config as it would be saved
+
+    Always encoded with the standard library, so patches verify the same on machines
+    with and without orjson.
+    """
+    digest = hashlib.sha256()
+    for chunk in iter_config_chunks(data, backend='json'):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _keyed(records, key: str) -> Optional[Dict]:
+    """Map key -> position, or None when the section cannot be aligned by key"""
+    if not isinstance(records, list):
+        return None
+    positions = {}
+    for pos, record in enumerate(records):
+        if not is_record(record):
+            return None
+        record_id = record.get(key, _MISSING)
+        if record_id is _MISSING or isinstance(record_id, (list, dict)) or record_id in positions:
+            return None
+        positions[record_id] = pos
+    return positions
+
+
+def _same(a, b) -> bool:
+    """True when a and b save to the same bytes
+
+    Stricter than ==, which treats 0, 0.0 and False (or 1 and True) as equal
+    and ignores key order.
+    """
+    if a is b:
+        return True
+    if is_record(a) and is_record(b):
+        # == rules out most differences at C speed; then the types, then nested values
+        if a != b or list(a) != list(b):
+            return False
+        a_values, b_values = list(a.values()), list(b.values())
+        types = list(map(type, a_values))
+        if types != list(map(type, b_values)):
+            return False
+        if list not in types and dict not in types:
+            return True
+        return all(_same(x, y) for x, y in zip(a_values, b_values) if type(x) in (list, dict))
+    if type(a) is not type(b):
+        return False
+    if type(a) is list:
+        return len(a) == len(b) and all(map(_same, a, b))
+    return a == b
+
+
+def _record_change(old: Dict, new: Dict) -> Optional[Dict]:
+    """Field changes turning old into new, or None when they are equal"""
+    if _same(old, new):
+        return None
+    changed = {k: v for k, v in new.items() if not _same(old.get(k, _MISSING), v)}
+    unset = [k for k in old if k not in new]
+    # Setting keeps existing keys in place and appends new ones; fall back to the whole
+    # record when that would not reproduce new's key order
+    expected = [k for k in old if k in new] + [k for k in new if k not in old]
+    if expected != list(new):
+        return {'record': new}
+    change = {'set': changed}
+    if unset:
+        change['unset'] = unset
+    return change
+
+
+def diff_section(old_records: List[Dict], new_records: List[Dict], key: str,
+                 old_positions: Optional[Dict] = None, new_positions: Optional[Dict] = None) -> Optional[Dict]:
+    """Keyed diff of one section, or None when nothing changed"""
+    old_positions = old_positions if old_positions is not None else _keyed(old_records, key)
+    new_positions = new_positions if new_positions is not None else _keyed(new_records, key)
+
+    removed = [record_id for record_id in old_positions if record_id not in new_positions]
+    added = []
+    changed = []
+    for record in new_records:
+        record_id = record[key]
+        pos = old_positions.get(record_id)
+        if pos is None:
+            added.append(record)
+            continue
+        change = _record_change(old_records[pos], record)
+        if change is not None:
+            change['id'] = record_id
+            changed.append(change)
+
+    # Applying keeps surviving records in place and appends added ones
+    removed_set = set(removed)
+    expected = [r[key] for r in old_records if r[key] not in removed_set] + [r[key] for r in added]
+    order = [r[key] for r in new_records]
+    if not (removed or added or changed) and expected == order:
+        return None
+
+    section = {'key': key}
+    if removed:
+        section['removed'] = removed
+    if added:
+        section['added'] = added
+    if changed:
+        section['changed'] = changed
+    if expected != order:
+        section['order'] = order
+    return section
+
+
+def diff_configs(old: Dict, new: Dict, base_digest: bool = True) -> Dict:
+    """Build a patch that turns old into new
+
+    Runs in time linear in the size of both configs; records shared between them
+    (as in transfer outputs) are skipped by identity.
+    """
+    patch = {'format': PATCH_FORMAT, 'version': PATCH_VERSION}
+    if base_digest:
+        patch['base_sha256'] = config_digest(old)
+    sections = {}
+    values = {}
+    for name, value in new.items():
+        old_value = old.get(name, _MISSING)
+        key = KEYED_SECTIONS.get(name)
+        if key is not None and old_value is not _MISSING:
+            old_positions = _keyed(old_value, key)
+            new_positions = _keyed(value, key)
+            if old_positions is not None and new_positions is not None:
+                section = diff_section(old_value, value, key, old_positions, new_positions)
+                if section is not None:
+                    sections[name] = section
+                continue
+        if old_value is _MISSING or not _same(old_value, value):
+            values[name] = value
+    unset = [name for name in old if name not in new]
+
+    if sections:
+        patch['sections'] = sections
+    if values:
+        patch['set'] = values
+    if unset:
+        patch['unset'] = unset
+    expected = [k for k in old if k in new] + [k for k in new if k not in old]
+    if expected != list(new):
+        patch['key_order'] = list(new)
+    return patch
+
+
+def _apply_section(records: List[Dict], section: Dict, name: str) -> List[Dict]:
+    key = section['key']
+    positions = _keyed(records, key)
+    if positions is None:
+        raise PatchError(f"{name} cannot be aligned by {key} (duplicate or missing IDs)")
+
+    removed = set(section.get('removed', ()))
+    missing = [record_id for record_id in removed if record_id not in positions]
+    if missing:
+        raise PatchError(f"{name}: {key} {missing[0]} to remove does not exist")
+
+    result = list(records)
+    for change in section.get('changed', ()):
+        pos = positions.get(change['id'])
+        if pos is None:
+            raise PatchError(f"{name}: {key} {change['id']} to change does not exist")
+        if 'record' in change:
+            result[pos] = change['record']
+            continue
+        record = copy_record(result[pos], **change.get('set', {}))
+        for field in change.get('unset', ()):
+            record.pop(field, None)
+        result[pos] = record
+
+    if removed:
+        result = [r for r in result if r[key] not in removed]
+    for record in section.get('added', ()):
+        if record[key] in positions and record[key] not in removed:
+            raise PatchError(f"{name}: {key} {record[key]} to add already exists")
+        result.append(record)
+
+    if 'order' in section:
+        by_id = {r[key]: r for r in result}
+        if len(by_id) != len(section['order']) or any(i not in by_id for i in section['order']):
+            raise PatchError(f"{name}: record order does not match the patched records")
+        result = [by_id[i] for i in section['order']]
+    return result
+
+
+def apply_patch(base: Dict, patch: Dict, verify: bool = True) -> Dict:
+    """Apply a patch to base, returning a new config that shares untouched records with base
+
+    With verify, the base must be the config the patch was made from.
+    """
+    if patch.get('format') != PATCH_FORMAT or patch.get('version') != PATCH_VERSION:
+        raise PatchError("Not a Spectera patch, or a newer patch version")
+    if verify and patch.get('base_sha256') and config_digest(base) != patch['base_sha256']:
+        raise PatchError("The patch was made for a different base config")
+
+    result = dict(base)
+    for name, section in patch.get('sections', {}).items():
+        if name not in result:
+            raise PatchError(f"Base config has no {name} section")
+        result[name] = _apply_section(result[name], section, name)
+    result.update(patch.get('set', {}))
+    for name in patch.get('unset', ()):
+        result.pop(name, None)
+    if 'key_order' in patch:
+        result = {name: result[name] for name in patch['key_order']}
+    return result
+
+
+def describe_patch(patch: Dict, limit: int = 20) -> str:
+    """Human-readable summary of a patch for review"""
+    lines = []
+    for name, section in patch.get('sections', {}).items():
+        key = section['key']
+        lines.append(f"{name}: {len(section.get('added', []))} added, {len(section.get('removed', []))} removed, "
+                     f"{len(section.get('changed', []))} changed{', reordered' if 'order' in section else ''}")
+        shown = 0
+        for record in section.get('added', [])[:limit]:
+            lines.append(f"  + {key} {record.get(key)}" + (f" ({record['name']})" if record.get('name') else ""))
+            shown += 1
+        for record_id in section.get('removed', [])[:max(0, limit - shown)]:
+            lines.append(f"  - {key} {record_id}")
+            shown += 1
+        for change in section.get('changed', [])[:max(0, limit - shown)]:
+            if 'record' in change:
+                lines.append(f"  ~ {key} {change['id']}: replaced")
+            else:
+                fields = ", ".join(f"{k}={v!r}" for k, v in change.get('set', {}).items())
+                unset = ", ".join(f"-{k}" for k in change.get('unset', ()))
+                lines.append(f"  ~ {key} {change['id']}: {', '.join(p for p in (fields, unset) if p)}")
+            shown += 1
+        total = sum(len(section.get(k, [])) for k in ('added', 'removed', 'changed'))
+        if total > shown:
+            lines.append(f"  ... and {total - shown} more")
+    for name in patch.get('set', {}):
+        lines.append(f"{name}: replaced")
+    for name in patch.get('unset', ()):
+        lines.append(f"{name}: removed")
+    return "\n".join(lines) or "No changes"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Diff and patch Spectera base station configs")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    diff = sub.add_parser('diff', help="Show what changed from OLD to NEW and optionally write a patch")
+    diff.add_argument('old')
+    diff.add_argument('new')
+    diff.add_argument('-o', '--output', help="Write the patch here")
+    diff.add_argument('--limit', type=int, default=20, help="Records listed per section (default: 20)")
+
+    apply = sub.add_parser('apply', help="Apply a patch to a base config")
+    apply.add_argument('base')
+    apply.add_argument('patch')
+    apply.add_argument('-o', '--output', required=True)
+    apply.add_argument('--force', action='store_true', help="Apply even if the base is not the patch's base")
+
+    show = sub.add_parser('show', help="Summarize a patch")
+    show.add_argument('patch')
+    show.add_argument('--limit', type=int, default=20)
+
+    args = parser.parse_args(argv)
+    try:
+        if args.command == 'diff':
+            patch = diff_configs(load_config(args.old), load_config(args.new))
+            print(describe_patch(patch, args.limit))
+            if args.output:
+                # Added and replaced records may be compact records; the config encoder handles both
+                with open(args.output, 'wb') as f:
+                    f.write(encoder_for()(patch))
+                print(f"Patch written to {args.output}")
+            return 0 if 'sections' not in patch and 'set' not in patch and 'unset' not in patch else 1
+
+        with open(args.patch, 'rb') as f:
+            patch = json.loads(f.read())
+        if args.command == 'show':
+            print(describe_patch(patch, args.limit))
+            return 0
+        save_config(apply_patch(load_config(args.base), patch, verify=not args.force), args.output)
+        print(f"Patched config written to {args.output}")
+        return 0
+    except PatchError as e:
+        print(f"Cannot apply patch: {e}", file=sys.stderr)
+        return 2
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
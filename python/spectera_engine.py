@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Spectera transfer engine
+Display-free transfer logic shared by the GUI and the batch command line tool.
+
+Copyright (C) 2024
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+"""
+
+import json
+import copy
+import os
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple, Union
+
+from spectera_match import STRATEGIES, DeviceMatcher, MatchReport
+from spectera_profile import NULL_TIMER, StageTimer
+from spectera_validate import ValidationReport, validate_config
+from spectera_writer import write_config
+
+
+NO_TARGET_DEVICES_MESSAGE = (
+    "The target file has no paired devices.\n\n"
+    "Workflow:\n"
+    "1. Pair your devices to the backup base station\n"
+    "2. Save that configuration file (this becomes your target file)\n"
+    "3. Use this tool to transfer settings from primary base station\n"
+    "4. Load the output file into the backup base station"
+)
+
+
+class TransferError(Exception):
+    """Raised when a transfer cannot be generated from the given inputs"""
+
+    def __init__(self, title: str, message: str):
+        super().__init__(message)
+        self.title = title
+        self.message = message
+
+
+class TransferResult(NamedTuple):
+    """Output of a single transfer run"""
+    output_data: Dict
+    uid_mapping: Dict
+    selected_count: int
+    mapped_count: int
+    warnings: List[str]
+    match_report: Optional[MatchReport] = None
+    validation: Optional[ValidationReport] = None
+
+    @property
+    def description(self) -> str:
+        changed = sum(1 for s, t in self.uid_mapping.items() if s != t)
+        return f"Transferred {len(self.output_data.get('pairedDevices', []))} device(s), {changed} UIDs mapped"
+
+    @property
+    def match_summary(self) -> str:
+        if self.match_report is None:
+            return ""
+        report = self.match_report
+        strategies = ", ".join(f"{count} by {name}" for name, count in sorted(report.by_strategy().items()))
+        return (f"{report.matched_count} matched ({strategies or 'none'}), "
+                f"{len(report.ambiguous)} ambiguous, {len(report.unmatched)} unmatched")
+
+
+def read_config_bytes(path: str, progress: Optional[Callable[[int, int], None]] = None,
+                      chunk_size: int = 1 << 20, timer: StageTimer = NULL_TIMER) -> bytes:
+    """Read a config file's raw bytes
+
+    When given, progress(bytes_read, total_bytes) is called after each chunk is read;
+    it may raise to abort a slow read (e.g. from a network share).
+    """
+    with timer.stage('read') as stage:
+        if progress is None:
+            with open(path, 'rb') as f:
+                raw = f.read()
+        else:
+            total = os.path.getsize(path)
+            chunks = []
+            read = 0
+            with open(path, 'rb') as f:
+                while True:
+                    chunk = f.read(chunk_size)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+                    read += len(chunk)
+                    progress(read, total)
+            raw = b''.join(chunks)
+        stage.objects = len(raw)
+    return raw
+
+
+def parse_config(raw: bytes, timer: StageTimer = NULL_TIMER) -> Dict:
+    """Parse raw config bytes"""
+    with timer.stage('parse') as stage:
+        data = json.loads(raw)
+        stage.objects = len(data.get('pairedDevices', [])) if isinstance(data, dict) else None
+    return data
+
+
+def load_config(path: str, progress: Optional[Callable[[int, int], None]] = None,
+                timer: StageTimer = NULL_TIMER, compact: bool = False) -> Dict:
+    """Load a base station configuration file
+
+    With compact, the record sections are held as compact records (see spectera_model):
+    less memory, slower transfers.
+    """
+    if progress is None and not timer.enabled:
+        # Bytes, not text: exports are UTF-8 whatever the locale (cp1252 on Windows)
+        with open(path, 'rb') as f:
+            data = json.loads(f.read())
+    else:
+        data = parse_config(read_config_bytes(path, progress, timer=timer), timer)
+    if compact:
+        from spectera_model import compact_config
+        data = compact_config(data, timer)
+    return data
+
+
+def save_config(data: Dict, path: str, timer: StageTimer = NULL_TIMER,
+                check: Optional[Callable[[], None]] = None):
+    """Save a base station configuration file
+
+    Written minified in the base station's own format, via a temporary file that
+    replaces path only once complete (see spectera_writer). A check() that raises
+    abandons the save and leaves path untouched.
+    """
+    write_config(data, path, timer=timer, check=check)
+
+
+def select_devices(source_data: Dict, selection: Union[str, List, None] = "all") -> List[Dict]:
+    """Resolve a selection ("all", or a list of UIDs and/or names) to source devices"""
+    devices = source_data.get('pairedDevices', [])
+    if selection is None or selection == "all":
+        return list(devices)
+    if isinstance(selection, (str, int)):
+        selection = [selection]
+
+    wanted = set(selection)
+    return [d for d in devices if d.get('mtUid') in wanted or d.get('name') in wanted]
+
+
+def parse_selection(values: Optional[List[str]]) -> Union[str, List]:
+    """Command line selection: "all", or UIDs (numbers) and names"""
+    if not values or values == ['all']:
+        return "all"
+    return [int(v) if v.isdigit() else v for v in values]
+
+
+def get_audiolink_ids_for_devices(devices: List[Dict]) -> Set[int]:
+    """Get all audiolink IDs referenced by the given devices"""
+    audiolink_ids = set()
+    for device in devices:
+        iem_id = device.get('iemAudiolinkId', -1)
+        mic_id = device.get('micAudiolinkId', -1)
+        # A null or non-integer link is a broken reference (see spectera_validate), not a link
+        if type(iem_id) is int and iem_id >= 0:
+            audiolink_ids.add(iem_id)
+        if type(mic_id) is int and mic_id >= 0:
+            audiolink_ids.add(mic_id)
+    return audiolink_ids
+
+
+class RoutingIndex:
+    """Lookup tables over one config's audio routing, built once per loaded config"""
+
+    def __init__(self, data: Optional[Dict]):
+        data = data or {}
+        self.links = {}             # audiolinkId -> audiolink
+        self.inputs = {}            # audiolinkId -> [audioInput] (via iemAudiolinkId)
+        self.outputs = {}           # audiolinkId -> [audioOutput] (via micAudiolinkId)
+        self.link_positions = {}    # audiolinkId -> index in audiolinks
+        self.input_positions = {}   # inputId -> index in audioInputs
+        self.output_positions = {}  # outputId -> index in audioOutputs
+
+        for pos, link in enumerate(data.get('audiolinks', [])):
+            link_id = link.get('audiolinkId')
+            if link_id not in self.links:
+                self.links[link_id] = link
+                self.link_positions[link_id] = pos
+
+        for pos, inp in enumerate(data.get('audioInputs', [])):
+            self.input_positions.setdefault(inp.get('inputId'), pos)
+            link_id = inp.get('iemAudiolinkId', -1)
+            if type(link_id) is int and link_id >= 0:
+                self.inputs.setdefault(link_id, []).append(inp)
+
+        for pos, out in enumerate(data.get('audioOutputs', [])):
+            self.output_positions.setdefault(out.get('outputId'), pos)
+            link_id = out.get('micAudiolinkId', -1)
+            if type(link_id) is int and link_id >= 0:
+                self.outputs.setdefault(link_id, []).append(out)
+
+    def routing_for(self, link_ids: Set[int]) -> Tuple[List[Dict], List[Dict], List[Dict]]:
+        """Return the audiolinks, audioInputs and audioOutputs behind the given link IDs
+
+        Each list keeps the order the records have in the config.
+        """
+        present = [i for i in link_ids if i in self.links]
+        links = [self.links[i] for i in sorted(present, key=self.link_positions.get)]
+        inputs = [inp for i in link_ids for inp in self.inputs.get(i, ())]
+        inputs.sort(key=lambda inp: self.input_positions.get(inp.get('inputId'), 0))
+        outputs = [out for i in link_ids for out in self.outputs.get(i, ())]
+        outputs.sort(key=lambda out: self.output_positions.get(out.get('outputId'), 0))
+        return links, inputs, outputs
+
+
+_SCALAR_TYPES = (str, int, float, bool, type(None))
+
+
+def copy_record(record: Dict, **changes) -> Dict:
+    """Materialize a single config record, deep-copying only nested values"""
+    new_record = {
+        key: value if isinstance(value, _SCALAR_TYPES) else copy.deepcopy(value)
+        for key, value in record.items()
+    }
+    new_record.update(changes)
+    return new_record
+
+
+def _merge_records(section: List[Dict], updates: List[Dict], id_key: str,
+                   positions: Dict) -> Optional[List[Dict]]:
+    """Return a new section list with updates merged by ID, or None when nothing changes
+
+    Records that are not touched are shared with the original list, not copied.
+    """
+    if not updates:
+        return None
+    merged = list(section)
+    new_positions = {}
+    for update in updates:
+        record_id = update.get(id_key)
+        pos = positions.get(record_id, new_positions.get(record_id))
+        if pos is not None:
+            # Update existing record
+            merged[pos] = copy_record(merged[pos], **copy_record(update))
+        else:
+            # Add new record
+            new_positions[record_id] = len(merged)
+            merged.append(copy_record(update))
+    return merged
+
+
+def clone_devices_with_routing(source_data: Dict, selected_devices: List[Dict], output_data: Dict,
+                               source_index: Optional[RoutingIndex] = None,
+                               output_index: Optional[RoutingIndex] = None) -> Dict:
+    """Clone selected devices with their audio routing
+
+    Sections of output_data are replaced rather than mutated, so output_data may share
+    lists and records with the target config. source_index and output_index may be passed
+    in when they were already built for the loaded configs; output_index must describe
+    output_data as it is before this call.
+    """
+    if source_index is None:
+        source_index = RoutingIndex(source_data)
+    if output_index is None:
+        output_index = RoutingIndex(output_data)
+
+    # Get audiolink IDs used by selected devices
+    used_audiolink_ids = get_audiolink_ids_for_devices(selected_devices)
+    source_links, source_inputs, source_outputs = source_index.routing_for(used_audiolink_ids)
+
+    # Copy audiolinks from source that are used by selected devices
+    new_links = [copy_record(link) for link in source_links
+                 if link.get('audiolinkId') not in output_index.links]
+    if new_links:
+        output_data['audiolinks'] = output_data.get('audiolinks', []) + new_links
+
+    # Copy/merge audioInputs that reference used audiolinks
+    merged_inputs = _merge_records(output_data.get('audioInputs', []), source_inputs,
+                                   'inputId', output_index.input_positions)
+    if merged_inputs is not None:
+        output_data['audioInputs'] = merged_inputs
+
+    # Copy/merge audioOutputs that reference used audiolinks
+    merged_outputs = _merge_records(output_data.get('audioOutputs', []), source_outputs,
+                                    'outputId', output_index.output_positions)
+    if merged_outputs is not None:
+        output_data['audioOutputs'] = merged_outputs
+
+    return output_data
+
+
+def map_uids_by_position(source_devices: List[Dict], target_devices: List[Dict], selected_uids: Set) -> Dict:
+    """Map selected source UIDs to target UIDs by their position in the source list"""
+    uid_mapping = {}
+    for i, source_device in enumerate(source_devices):
+        source_uid = source_device.get('mtUid')
+        if source_uid in selected_uids:
+            if i < len(target_devices):
+                uid_mapping[source_uid] = target_devices[i].get('mtUid')
+            else:
+                # Not enough target devices - keep original UID
+                uid_mapping[source_uid] = source_uid
+    return uid_mapping
+
+
+def generate_transfer(source_data: Dict, target_data: Dict, selected_devices: List[Dict],
+                      source_index: Optional[RoutingIndex] = None,
+                      target_index: Optional[RoutingIndex] = None,
+                      strategies: Iterable[str] = STRATEGIES,
+                      matcher: Optional[DeviceMatcher] = None,
+                      timer: StageTimer = NULL_TIMER) -> TransferResult:
+    """Transfer device settings from source (old UIDs) to target (new UIDs)
+
+    Source devices are matched to target devices by name, type and slot before falling
+    back to position (see spectera_match); pass strategies=POSITION_ONLY for the
+    original position-only mapping. Pass the RoutingIndex (and DeviceMatcher) built when
+    each config was loaded to avoid rebuilding them per run.
+    The output shares every unchanged section and record with target_data, so callers
+    must treat the loaded configs and the output as read-only.
+    """
+    if not source_data or not target_data:
+        raise TransferError("Error", "Please load both source and target files.")
+
+    if not selected_devices:
+        raise TransferError("No Selection", "Please select at least one device to transfer.")
+
+    target_devices = target_data.get('pairedDevices', [])
+
+    if not target_devices:
+        raise TransferError("No Target Devices", NO_TARGET_DEVICES_MESSAGE)
+
+    # Start with target data (copy-on-write: only replaced sections are new objects)
+    output_data = dict(target_data)
+
+    # Create UID mapping: match source devices to target devices
+    source_devices = source_data.get('pairedDevices', [])
+    selected_uids = {d.get('mtUid') for d in selected_devices}
+    with timer.stage('uid_mapping', objects=len(selected_devices)):
+        if matcher is None:
+            matcher = DeviceMatcher(target_devices)
+        match_report = matcher.match(source_devices, selected_uids, strategies)
+    uid_mapping = match_report.mapping
+    mapped_count = match_report.matched_count
+    warnings = match_report.warnings(len(selected_devices))
+
+    # Add selected devices with mapped UIDs
+    with timer.stage('device_copy', objects=len(selected_devices)):
+        output_devices = []
+        for device in selected_devices:
+            source_uid = device.get('mtUid')
+            if source_uid in uid_mapping:
+                output_devices.append(copy_record(device, mtUid=uid_mapping[source_uid]))
+            else:
+                output_devices.append(copy_record(device))
+
+    output_data['pairedDevices'] = output_devices
+
+    # Copy routing for selected devices
+    with timer.stage('routing_clone') as stage:
+        output_data = clone_devices_with_routing(source_data, selected_devices, output_data,
+                                                 source_index, target_index)
+        stage.objects = (len(output_data.get('audiolinks', [])) + len(output_data.get('audioInputs', []))
+                         + len(output_data.get('audioOutputs', [])))
+
+    with timer.stage('validation') as stage:
+        validation = validate_config(output_data)
+        stage.objects = len(validation.violations)
+    if not validation.ok:
+        warnings.append(
+            f"The output has {len(validation.errors)} integrity error(s):\n"
+            f"{ValidationReport(validation.errors).describe(5)}"
+        )
+
+    return TransferResult(output_data, uid_mapping, len(selected_devices), mapped_count, warnings, match_report,
+                          validation)
+
+
+def run_transfer_files(source_path: str, target_path: str, output_path: str,
+                       selection: Union[str, List, None] = "all",
+                       strategies: Iterable[str] = STRATEGIES,
+                       timer: StageTimer = NULL_TIMER, compact: bool = False) -> Dict:
+    """Load, transfer and save one source/target pair, returning a summary record"""
+    source_data = load_config(source_path, timer=timer, compact=compact)
+    selected_devices = select_devices(source_data, selection)
+    summary = transfer_to_file(source_data, selected_devices, target_path, output_path,
+                               strategies=strategies, timer=timer, compact=compact)
+    return dict(source=source_path, **summary)
+
+
+def transfer_to_file(source_data: Dict, selected_devices: List[Dict], target_path: str, output_path: str,
+                     source_index: Optional[RoutingIndex] = None,
+                     strategies: Iterable[str] = STRATEGIES,
+                     timer: StageTimer = NULL_TIMER, compact: bool = False) -> Dict:
+    """Transfer an already loaded source selection onto one target file and save the output"""
+    target_data = load_config(target_path, timer=timer, compact=compact)
+    result = generate_transfer(source_data, target_data, selected_devices, source_index,
+                               strategies=strategies, timer=timer)
+    save_config(result.output_data, output_path, timer=timer)
+    return transfer_summary(result, target_path, output_path)
+
+
+def transfer_summary(result: TransferResult, target_path: str, output_path: str) -> Dict:
+    """Summary record of one saved transfer, as used in batch, fleet and watch reports"""
+    return {
+        'target': target_path,
+        'output': output_path,
+        'selected': result.selected_count,
+        'mapped': result.mapped_count,
+        'devices': len(result.output_data.get('pairedDevices', [])),
+        'description': result.description,
+        'warnings': result.warnings,
+        'matching': result.match_report.to_dict(),
+        'validation': result.validation.to_dict(limit=20),
+    }
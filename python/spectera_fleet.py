@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Spectera Fleet Transfer
+Pushes one source base station's settings to several targets at once, e.g. the
+A and B backup rigs and the spare:
+
+    python spectera_fleet.py primary.json backup_A.json backup_B.json spare.json -o out/
+
+The source is parsed, its selection resolved and its routing index built once;
+each worker process receives that state once (a fork shares it outright) and
+then only loads, transfers and saves its own targets. Outputs are written to the
+output directory as <target>_transfer.json, and fleet_report.json records every
+target's status and which target UID each source device became.
+
+Copyright (C) 2024
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Union
+
+import spectera_engine as engine
+from spectera_engine import TransferError, parse_selection
+from spectera_match import POSITION_ONLY, STRATEGIES
+from spectera_profile import NULL_TIMER, StageTimer
+
+
+class FleetSource:
+    """A loaded source, its selected devices and routing index, shared by every target"""
+
+    def __init__(self, path: str, data: Dict, selected_devices: List[Dict],
+                 index: Optional[engine.RoutingIndex] = None):
+        self.path = path
+        self.data = data
+        self.selected_devices = selected_devices
+        self.index = index if index is not None else engine.RoutingIndex(data)
+
+    @classmethod
+    def load(cls, path: str, selection: Union[str, List, None] = "all",
+             timer: StageTimer = NULL_TIMER, compact: bool = False) -> 'FleetSource':
+        data = engine.load_config(path, timer=timer, compact=compact)
+        selected_devices = engine.select_devices(data, selection)
+        with timer.stage('index', objects=len(data.get('audiolinks', []))):
+            index = engine.RoutingIndex(data)
+        return cls(path, data, selected_devices, index)
+
+
+def plan_targets(target_paths: Iterable[str], output_dir: str,
+                 strategies: Iterable[str] = STRATEGIES, timings: bool = False,
+                 compact: bool = False) -> List[Dict]:
+    """Build one job per target, writing <target>_transfer.json into output_dir"""
+    output_dir = os.path.abspath(output_dir)
+    jobs = []
+    for index, target in enumerate(target_paths):
+        stem = os.path.splitext(os.path.basename(target))[0]
+        jobs.append({
+            'index': index,
+            'target': os.path.abspath(target),
+            'output': os.path.join(output_dir, f"{stem}_transfer.json"),
+            'strategies': tuple(strategies),
+            'timings': timings,
+            'compact': compact,
+        })
+    outputs = [job['output'] for job in jobs]
+    if len(set(outputs)) != len(outputs):
+        raise ValueError("Two or more targets have the same file name and would write the same output")
+    return jobs
+
+
+def run_target(source: FleetSource, job: Dict) -> Dict:
+    """Transfer the source onto one target; never raises so one bad target cannot stop the fleet"""
+    start = time.perf_counter()
+    timer = StageTimer('fleet_target', target=job['target']) if job.get('timings') else NULL_TIMER
+    try:
+        out_dir = os.path.dirname(job['output'])
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+        summary = engine.transfer_to_file(source.data, source.selected_devices, job['target'], job['output'],
+                                          source.index, job['strategies'], timer, job.get('compact', False))
+        summary['status'] = 'ok'
+    except TransferError as e:
+        summary = {'status': 'error', 'error': f"{e.title}: {e.message}"}
+    except Exception as e:
+        summary = {'status': 'error', 'error': f"{type(e).__name__}: {e}"}
+    summary.update({
+        'index': job['index'],
+        'target': job['target'],
+        'output': job['output'],
+        'seconds': round(time.perf_counter() - start, 4),
+    })
+    if timer.enabled:
+        summary['stages'] = timer.to_record()['stages']
+    return summary
+
+
+# Set once per worker process by the pool initializer
+_worker_source = None
+
+
+def _init_worker(source: FleetSource):
+    global _worker_source
+    _worker_source = source
+
+
+def _run_worker_target(job: Dict) -> Dict:
+    return run_target(_worker_source, job)
+
+
+# How often a running fleet calls check() while no target finishes
+CHECK_INTERVAL = 0.2
+
+
+def run_fleet(source: FleetSource, jobs: List[Dict], workers: Optional[int] = None,
+              start_method: Optional[str] = None, check: Optional[Callable[[], None]] = None) -> List[Dict]:
+    """Run every target job across a process pool and return results in target order
+
+    start_method picks how workers are started ('spawn', 'fork', ...); the platform
+    default when None. Callers with other threads running (e.g. a GUI) should use
+    'spawn', as forking a multi-threaded process can deadlock the child.
+
+    When given, check() is called between targets; if it raises (e.g. the user
+    cancelled), targets not yet started are dropped, the ones already running finish
+    their (atomic) writes, and the exception is re-raised.
+    """
+    if not source.selected_devices:
+        raise TransferError("No Selection", "Please select at least one device to transfer.")
+    if workers == 1 or len(jobs) <= 1:
+        results = []
+        for job in jobs:
+            if check is not None:
+                check()
+            results.append(run_target(source, job))
+        return results
+
+    import multiprocessing
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    mp_context = multiprocessing.get_context(start_method) if start_method else None
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context, initializer=_init_worker,
+                             initargs=(source,)) as pool:
+        pending = {pool.submit(_run_worker_target, job) for job in jobs}
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=CHECK_INTERVAL if check is not None else None,
+                                     return_when=FIRST_COMPLETED)
+                results.extend(future.result() for future in done)
+                if check is not None:
+                    check()
+        except BaseException:
+            if sys.version_info >= (3, 9):
+                pool.shutdown(cancel_futures=True)
+            else:
+                # cancel_futures is new in 3.9; cancelling each queued future does the same
+                for future in pending:
+                    future.cancel()
+            raise
+    results.sort(key=lambda r: r['index'])
+    return results
+
+
+def build_fleet_report(source: FleetSource, results: List[Dict], elapsed: float) -> Dict:
+    """Summarize a fleet run, including each selected device's UID on every successful target"""
+    failed = [r for r in results if r['status'] != 'ok']
+    targets = {}  # target file name -> {source mtUid: target mtUid}
+    for r in results:
+        if r['status'] == 'ok':
+            targets[os.path.basename(r['target'])] = {
+                m['source_uid']: m['target_uid'] for m in r['matching']['matched']
+            }
+    devices = [
+        {
+            'source_uid': d.get('mtUid'),
+            'name': d.get('name'),
+            'targets': {name: mapping.get(d.get('mtUid')) for name, mapping in targets.items()},
+        }
+        for d in source.selected_devices
+    ]
+    return {
+        'generated': datetime.now().isoformat(timespec='seconds'),
+        'source': source.path,
+        'selected': len(source.selected_devices),
+        'targets': len(results),
+        'succeeded': len(results) - len(failed),
+        'failed': len(failed),
+        'unmapped_devices': sum(1 for d in devices if None in d['targets'].values()),
+        'seconds': round(elapsed, 4),
+        'devices': devices,
+        'results': results,
+    }
+
+
+def write_report(report: Dict, path: str):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Transfer one source's settings to several target base stations")
+    parser.add_argument('source', help="Source config (primary base station)")
+    parser.add_argument('targets', nargs='+', help="Target configs (backup base stations with re-paired devices)")
+    parser.add_argument('-o', '--output-dir', help="Directory for outputs (default: source file directory)")
+    parser.add_argument('-s', '--select', nargs='+', metavar='DEVICE',
+                        help="Device UIDs and/or names to transfer (default: all)")
+    parser.add_argument('--match', choices=('auto', 'position'), default='auto',
+                        help="Match devices by name, type and slot (auto) or by position only")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="Number of worker processes (default: all cores)")
+    parser.add_argument('-r', '--report', default=None,
+                        help="Report path (default: fleet_report.json in the output directory)")
+    parser.add_argument('--timings', action='store_true',
+                        help="Record per-stage timings for the source and every target in the report")
+    parser.add_argument('--compact', action='store_true',
+                        help="Hold configs as compact records: less memory, slower transfers")
+    args = parser.parse_args(argv)
+
+    output_dir = os.path.abspath(args.output_dir or os.path.dirname(os.path.abspath(args.source)))
+    strategies = POSITION_ONLY if args.match == 'position' else STRATEGIES
+    try:
+        jobs = plan_targets(args.targets, output_dir, strategies, args.timings, args.compact)
+    except ValueError as e:
+        print(f"Invalid targets: {e}", file=sys.stderr)
+        return 2
+
+    start = time.perf_counter()
+    source_timer = StageTimer('fleet_source', source=args.source) if args.timings else NULL_TIMER
+    try:
+        source = FleetSource.load(os.path.abspath(args.source), parse_selection(args.select), source_timer,
+                                  args.compact)
+        os.makedirs(output_dir, exist_ok=True)
+        results = run_fleet(source, jobs, args.jobs)
+    except TransferError as e:
+        print(f"{e.title}: {e.message}", file=sys.stderr)
+        return 2
+    except (OSError, ValueError) as e:
+        print(f"Failed to load source: {e}", file=sys.stderr)
+        return 2
+    report = build_fleet_report(source, results, time.perf_counter() - start)
+    if source_timer.enabled:
+        report['source_stages'] = source_timer.to_record()['stages']
+
+    report_path = args.report or os.path.join(output_dir, "fleet_report.json")
+    write_report(report, report_path)
+
+    for r in results:
+        if r['status'] == 'ok':
+            print(f"[ok]    {os.path.basename(r['output'])}: {r['description']}")
+        else:
+            print(f"[error] {os.path.basename(r['target'])}: {r['error']}")
+    unmapped = f", {report['unmapped_devices']} device(s) unmapped on some target" if report['unmapped_devices'] else ""
+    print(f"{report['succeeded']}/{report['targets']} targets succeeded in {report['seconds']}s{unmapped}; "
+          f"report: {report_path}")
+    return 0 if report['failed'] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
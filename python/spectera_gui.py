@@ -0,0 +1,833 @@
+#!/usr/bin/env python3
+"""
+Spectera Base Station Settings Transfer Tool - GUI
+Tk window for transferring device settings from one base station to another.
+Start it with spectera_editor.py, which only loads this module (and Tk) when
+no command line tool was asked for.
+
+Copyright (C) 2024
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+"""
+
+import tkinter as tk
+from tkinter import filedialog, messagebox, ttk
+from typing import Dict, List, Tuple, Optional, Set
+import multiprocessing
+import os
+import time
+from datetime import datetime
+
+import spectera_engine as engine
+import spectera_fleet as fleet
+from spectera_devicelist import DeviceListModel
+from spectera_tasks import BackgroundTasks, TaskContext
+from spectera_cache import ConfigCache
+from spectera_history import HistoryStore, Snapshot
+from spectera_match import POSITION_ONLY, STRATEGIES
+from spectera_profile import NULL_TIMER, RunProfiler, StageTimer, profile_if
+from spectera_diff import describe_patch
+from spectera_validate import ValidationReport, validate_config
+
+# Parsed configs shared across file selections; set SPECTERA_CACHE_DIR to keep them across restarts,
+# and SPECTERA_COMPACT=1 to hold them as compact records (less memory, slower transfers)
+config_cache = ConfigCache(disk_dir=os.environ.get('SPECTERA_CACHE_DIR') or None,
+                           compact=os.environ.get('SPECTERA_COMPACT') == '1')
+
+# Every loaded source/target and generated output; set SPECTERA_HISTORY_DIR to keep it across restarts.
+# Only the newest entries are held in memory, like the config cache's limits
+history = HistoryStore(os.environ.get('SPECTERA_HISTORY_DIR') or None,
+                       max_snapshots=50, max_bytes=128 * 1024 * 1024)
+
+
+class VirtualDeviceList(ttk.Frame):
+    """Device list that keeps Treeview items only for the rows on screen"""
+    
+    COLUMNS = ("selected", "name", "uid", "type", "rf")
+    
+    def __init__(self, parent, on_change=None):
+        super().__init__(parent)
+        self.model = DeviceListModel()
+        self.on_change = on_change
+        self.top = 0
+        self.rows = 15
+        
+        self.tree = ttk.Treeview(self, columns=self.COLUMNS, show="headings", selectmode="none", height=self.rows)
+        for column, heading, width, stretch in (
+            ("selected", "", 30, False),
+            ("name", "Name", 220, True),
+            ("uid", "UID", 110, False),
+            ("type", "Type", 70, False),
+            ("rf", "RF Channel", 80, False),
+        ):
+            self.tree.heading(column, text=heading, anchor=tk.W)
+            self.tree.column(column, width=width, stretch=stretch, anchor=tk.W)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.on_scrollbar)
+        
+        self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(0, weight=1)
+        
+        self.tree.bind("<Configure>", self.on_resize)
+        self.tree.bind("<Button-1>", self.on_click)
+        # Mouse wheel for Windows/Mac and Linux
+        self.tree.bind("<MouseWheel>", self.on_mousewheel)
+        self.tree.bind("<Button-4>", self.on_mousewheel)
+        self.tree.bind("<Button-5>", self.on_mousewheel)
+        self.tree.bind("<Prior>", lambda e: self.scroll(-self.rows))
+        self.tree.bind("<Next>", lambda e: self.scroll(self.rows))
+    
+    def set_model(self, model: DeviceListModel):
+        """Show a new model (or a newly filtered one) from the top"""
+        self.model = model
+        self.top = 0
+        self.refresh()
+    
+    def row_height(self) -> int:
+        try:
+            return int(ttk.Style(self).lookup("Treeview", "rowheight")) or 20
+        except (TypeError, ValueError, tk.TclError):
+            return 20
+    
+    def refresh(self):
+        """Redraw the visible window of rows from the model"""
+        total = len(self.model)
+        self.top = max(0, min(self.top, total - self.rows))
+        visible = min(self.rows, total - self.top)
+        
+        for i in range(visible):
+            index, device = self.model.row(self.top + i)
+            values = (
+                "\u2611" if self.model.is_selected(index) else "\u2610",
+                device.get('name', 'Unnamed'),
+                device.get('mtUid', 'Unknown'),
+                device.get('type', ''),
+                device.get('rfChannelId', ''),
+            )
+            iid = f"row{i}"
+            if self.tree.exists(iid):
+                self.tree.item(iid, values=values)
+            else:
+                self.tree.insert("", "end", iid=iid, values=values)
+        
+        stale = self.tree.get_children()[visible:]
+        if stale:
+            self.tree.delete(*stale)
+        
+        if total:
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + self.rows) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+    
+    def scroll(self, rows: int):
+        self.top += rows
+        self.refresh()
+        return "break"
+    
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.top = int(float(amount) * len(self.model))
+            self.refresh()
+        elif action == "scroll":
+            self.scroll(int(amount) * (self.rows if unit == "pages" else 1))
+    
+    def on_mousewheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            return self.scroll(-1)
+        if event.num == 5 or event.delta < 0:
+            return self.scroll(1)
+    
+    def on_resize(self, event):
+        height = self.row_height()
+        # One row's worth of height is taken by the headings
+        rows = max(1, event.height // height - 1)
+        if rows != self.rows:
+            self.rows = rows
+            self.refresh()
+    
+    def on_click(self, event):
+        if self.tree.identify_region(event.x, event.y) != "cell":
+            return
+        iid = self.tree.identify_row(event.y)
+        if not iid:
+            return
+        index, _ = self.model.row(self.top + int(iid[3:]))
+        self.model.toggle(index)
+        self.refresh()
+        if self.on_change:
+            self.on_change()
+        return "break"
+
+
+class SpecteraEditor:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("Spectera Base Station Settings Transfer")
+        self.root.geometry("850x750")
+        
+        self.source_data = None
+        self.target_data = None
+        self.source_index = None
+        self.target_index = None
+        self.source_file_path = None
+        self.target_file_path = None
+        self.device_model = DeviceListModel()
+        self.filter_job = None
+        self.tasks = BackgroundTasks()
+        self.select_all_var = None
+        self.mode_var = tk.StringVar(value="transfer_selected")  # transfer_selected, transfer_all
+        self.match_by_name_var = tk.BooleanVar(value=True)
+        self.profile_var = tk.BooleanVar(value=False)
+        
+        self.create_widgets()
+        self.poll_tasks()
+        
+    def create_widgets(self):
+        # Main container
+        main_frame = ttk.Frame(self.root, padding="10")
+        main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.root.columnconfigure(0, weight=1)
+        self.root.rowconfigure(0, weight=1)
+        main_frame.columnconfigure(1, weight=1)
+        
+        # File selection section
+        file_frame = ttk.LabelFrame(main_frame, text="File Selection", padding="10")
+        file_frame.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
+        file_frame.columnconfigure(1, weight=1)
+        
+        # Source file (original base station with current settings)
+        ttk.Label(file_frame, text="Source File (Original Base Station):").grid(row=0, column=0, sticky=tk.W, padx=(0, 10), pady=5)
+        self.source_label = ttk.Label(file_frame, text="No file selected", foreground="gray")
+        self.source_label.grid(row=0, column=1, sticky=(tk.W, tk.E), padx=(0, 10))
+        self.source_button = ttk.Button(file_frame, text="Browse...", command=self.select_source_file)
+        self.source_button.grid(row=0, column=2, pady=5)
+        
+        # Target file (destination base station with re-paired devices)
+        ttk.Label(file_frame, text="Target File (Destination Base Station):").grid(row=1, column=0, sticky=tk.W, padx=(0, 10), pady=5)
+        self.target_label = ttk.Label(file_frame, text="No file selected", foreground="gray")
+        self.target_label.grid(row=1, column=1, sticky=(tk.W, tk.E), padx=(0, 10))
+        self.target_button = ttk.Button(file_frame, text="Browse...", command=self.select_target_file)
+        self.target_button.grid(row=1, column=2, pady=5)
+        
+        # Target device count indicator
+        self.target_device_count_label = ttk.Label(file_frame, text="Number of Portable devices available: 0", foreground="gray")
+        self.target_device_count_label.grid(row=2, column=0, columnspan=3, sticky=tk.W, padx=(0, 10), pady=(5, 0))
+        
+        # Operation mode selection
+        mode_frame = ttk.LabelFrame(main_frame, text="Operation Mode", padding="10")
+        mode_frame.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
+        
+        ttk.Radiobutton(
+            mode_frame,
+            text="Transfer Selected Devices (map settings from old UIDs to new UIDs)",
+            variable=self.mode_var,
+            value="transfer_selected",
+            command=self.on_mode_change
+        ).grid(row=0, column=0, sticky=tk.W, pady=2)
+        
+        ttk.Radiobutton(
+            mode_frame,
+            text="Transfer All Devices (automatically transfer all devices)",
+            variable=self.mode_var,
+            value="transfer_all",
+            command=self.on_mode_change
+        ).grid(row=1, column=0, sticky=tk.W, pady=2)
+        
+        ttk.Checkbutton(
+            mode_frame,
+            text="Match devices by name, type and RF channel before falling back to list position",
+            variable=self.match_by_name_var
+        ).grid(row=2, column=0, sticky=tk.W, pady=(8, 2))
+        
+        # Device selection section
+        device_frame = ttk.LabelFrame(main_frame, text="Select Devices to Transfer", padding="10")
+        device_frame.grid(row=2, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 10))
+        device_frame.columnconfigure(0, weight=1)
+        device_frame.rowconfigure(1, weight=1)
+        main_frame.rowconfigure(2, weight=1)
+        
+        # Select all checkbox
+        select_all_frame = ttk.Frame(device_frame)
+        select_all_frame.grid(row=0, column=0, sticky=(tk.W, tk.E), pady=(0, 10))
+        self.select_all_var = tk.BooleanVar()
+        select_all_cb = ttk.Checkbutton(
+            select_all_frame, 
+            text="Select All", 
+            variable=self.select_all_var,
+            command=self.toggle_select_all
+        )
+        select_all_cb.grid(row=0, column=0, sticky=tk.W)
+        
+        # Incremental search (name, type, rfChannelId or UID; "type:SEK rf:1" limits a term to one field)
+        ttk.Label(select_all_frame, text="Search:").grid(row=0, column=1, sticky=tk.E, padx=(20, 5))
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add("write", lambda *args: self.schedule_filter())
+        ttk.Entry(select_all_frame, textvariable=self.search_var, width=30).grid(row=0, column=2, sticky=(tk.W, tk.E))
+        self.selection_label = ttk.Label(select_all_frame, text="", foreground="gray")
+        self.selection_label.grid(row=0, column=3, sticky=tk.W, padx=(10, 0))
+        select_all_frame.columnconfigure(2, weight=1)
+        
+        # Virtualized device list: only the rows on screen exist as Treeview items
+        self.device_list = VirtualDeviceList(device_frame, on_change=self.update_selection_label)
+        self.device_list.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
+        # Buttons frame
+        button_frame = ttk.Frame(main_frame)
+        button_frame.grid(row=3, column=0, columnspan=2, pady=(0, 10))
+        
+        self.generate_button = ttk.Button(
+            button_frame, 
+            text="Generate Output File", 
+            command=self.generate_output,
+            state="disabled"
+        )
+        self.generate_button.pack(side=tk.LEFT, padx=5)
+        
+        # One source to several backup base stations, written into one folder
+        self.fleet_button = ttk.Button(
+            button_frame,
+            text="Transfer to Several Targets...",
+            command=self.generate_fleet,
+            state="disabled"
+        )
+        self.fleet_button.pack(side=tk.LEFT, padx=5)
+        
+        # Earlier sources, targets and outputs of this session (and past ones with SPECTERA_HISTORY_DIR)
+        self.history_button = ttk.Button(
+            button_frame,
+            text="History...",
+            command=self.show_history
+        )
+        self.history_button.pack(side=tk.LEFT, padx=5)
+        
+        self.cancel_button = ttk.Button(
+            button_frame,
+            text="Cancel",
+            command=self.cancel_task,
+            state="disabled"
+        )
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
+        
+        # Opt-in cProfile/tracemalloc report for the next transfer and save only
+        ttk.Checkbutton(
+            button_frame,
+            text="Profile next run",
+            variable=self.profile_var
+        ).pack(side=tk.LEFT, padx=5)
+        
+        # Status bar with progress for background loading/saving
+        status_frame = ttk.Frame(main_frame)
+        status_frame.grid(row=4, column=0, columnspan=2, sticky=(tk.W, tk.E))
+        status_frame.columnconfigure(0, weight=1)
+        self.status_label = ttk.Label(status_frame, text="Ready", relief=tk.SUNKEN, anchor=tk.W)
+        self.status_label.grid(row=0, column=0, sticky=(tk.W, tk.E))
+        self.progress_bar = ttk.Progressbar(status_frame, length=150, mode="determinate", maximum=1.0)
+        self.progress_bar.grid(row=0, column=1, padx=(5, 0))
+        
+    def on_mode_change(self):
+        """Update UI when operation mode changes"""
+        mode = self.mode_var.get()
+        if mode == "transfer_all":
+            # Auto-select all devices
+            self.select_all_devices()
+            self.update_status("All devices selected for transfer")
+        
+        # Both modes require target file (with new UIDs from re-paired devices)
+        if not self.target_data:
+            self.target_label.config(text="No file selected", foreground="gray")
+        self.check_ready()
+        
+    def select_source_file(self):
+        filename = filedialog.askopenfilename(
+            title="Select Source Base Station File",
+            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+        )
+        if filename:
+            timer = StageTimer('load_source', file=os.path.basename(filename))
+            self.run_task(
+                self.load_file_task, filename, 'source', timer,
+                on_done=lambda loaded: self.on_source_loaded(filename, *loaded, timer),
+                error_message="Failed to load source file"
+            )
+    
+    def on_source_loaded(self, filename: str, data: Dict, index: engine.RoutingIndex,
+                         validation: ValidationReport, timer: StageTimer, from_file: bool = True):
+        self.source_data = data
+        self.source_index = index
+        # A restored history entry has no file behind it; its label is not a path
+        self.source_file_path = filename if from_file else None
+        self.source_label.config(text=os.path.basename(filename), foreground="black")
+        with timer.stage('device_list', objects=len(data.get('pairedDevices', []))):
+            self.update_device_list()
+        timer.write_log()
+        self.update_status(
+            f"Loaded source file: {len(self.source_data.get('pairedDevices', []))} devices found, "
+            f"{validation.summary()} ({config_cache.describe()}) in {timer.summary()}"
+        )
+        self.check_ready()
+        self.warn_integrity(filename, validation)
+                
+    def select_target_file(self):
+        filename = filedialog.askopenfilename(
+            title="Select Target Base Station File",
+            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+        )
+        if filename:
+            timer = StageTimer('load_target', file=os.path.basename(filename))
+            self.run_task(
+                self.load_file_task, filename, 'target', timer,
+                on_done=lambda loaded: self.on_target_loaded(filename, *loaded, timer),
+                error_message="Failed to load target file"
+            )
+    
+    def on_target_loaded(self, filename: str, data: Dict, index: engine.RoutingIndex,
+                         validation: ValidationReport, timer: StageTimer, from_file: bool = True):
+        self.target_data = data
+        self.target_index = index
+        self.target_file_path = filename if from_file else None
+        self.target_label.config(text=os.path.basename(filename), foreground="black")
+        device_count = len(self.target_data.get('pairedDevices', []))
+        self.target_device_count_label.config(
+            text=f"Number of Portable devices available: {device_count}",
+            foreground="black" if device_count > 0 else "gray"
+        )
+        timer.write_log()
+        self.update_status(
+            f"Loaded target file: {device_count} devices available, "
+            f"{validation.summary()} ({config_cache.describe()}) in {timer.summary()}"
+        )
+        self.check_ready()
+        self.warn_integrity(filename, validation)
+    
+    @staticmethod
+    def warn_integrity(filename: str, validation: ValidationReport):
+        """Point out broken references in a loaded file; transfers still work on the rest"""
+        if validation.ok:
+            return
+        messagebox.showwarning(
+            "Integrity Problems",
+            f"{os.path.basename(filename)} has {len(validation.errors)} integrity error(s):\n\n"
+            f"{ValidationReport(validation.errors).describe(10)}"
+        )
+    
+    @staticmethod
+    def load_file_task(context: TaskContext, filename: str, kind: str,
+                       timer: StageTimer) -> Tuple[Dict, engine.RoutingIndex, ValidationReport]:
+        """Worker: read, parse, index and validate a config file (or fetch it from the cache), and record it in the history"""
+        name = os.path.basename(filename)
+        context.report(f"Reading {name}...", 0.0)
+        entry = config_cache.load(
+            filename,
+            progress=lambda done, total: context.report(f"Reading {name}...", done / total if total else None),
+            timer=timer
+        )
+        context.report(f"Indexing {name}...")
+        with timer.stage('index', objects=len(entry.data.get('audiolinks', []))):
+            routing = entry.routing
+        with timer.stage('validation'):
+            validation = entry.validation
+        history.commit(entry.data, kind, filename, timer)
+        return entry.data, routing, validation
+    
+    def update_device_list(self):
+        """Update the device list from source file"""
+        devices = (self.source_data or {}).get('pairedDevices', [])
+        self.device_model = DeviceListModel(devices)
+        self.select_all_var.set(False)
+        self.search_var.set("")
+        self.device_list.set_model(self.device_model)
+        self.update_selection_label()
+    
+    def schedule_filter(self):
+        """Re-filter shortly after the last keystroke instead of on every one"""
+        if self.filter_job is not None:
+            self.root.after_cancel(self.filter_job)
+        self.filter_job = self.root.after(150, self.apply_filter)
+    
+    def apply_filter(self):
+        """Apply the search box to the device list"""
+        self.filter_job = None
+        self.device_model.filter(self.search_var.get())
+        self.device_list.set_model(self.device_model)
+        self.update_selection_label()
+    
+    def update_selection_label(self):
+        """Show how many devices are shown and selected"""
+        model = self.device_model
+        if not model.devices:
+            self.selection_label.config(text="")
+            return
+        self.selection_label.config(
+            text=f"{len(model)} of {len(model.devices)} shown, {model.selected_count()} selected"
+        )
+    
+    def toggle_select_all(self):
+        """Toggle selection of all devices matching the current search"""
+        self.device_model.set_visible(self.select_all_var.get())
+        self.device_list.refresh()
+        self.update_selection_label()
+    
+    def select_all_devices(self):
+        """Select every device, including ones hidden by the search"""
+        self.select_all_var.set(True)
+        self.device_model.set_all(True)
+        self.device_list.refresh()
+        self.update_selection_label()
+    
+    def check_ready(self):
+        """Enable buttons based on loaded files and mode"""
+        # Both modes require both files (source with old UIDs, target with new UIDs)
+        ready = self.source_data is not None and self.target_data is not None and not self.tasks.busy
+        
+        self.generate_button.config(state="normal" if ready else "disabled")
+        source_ready = self.source_data is not None and not self.tasks.busy
+        self.fleet_button.config(state="normal" if source_ready else "disabled")
+        
+        # Update target device count if target not loaded
+        if self.target_data is None:
+            self.target_device_count_label.config(text="Number of Portable devices available: 0", foreground="gray")
+    
+    def get_selected_devices(self) -> List[Dict]:
+        """Get list of selected devices"""
+        return self.device_model.selected_devices()
+    
+    def get_audiolink_ids_for_devices(self, devices: List[Dict]) -> Set[int]:
+        """Get all audiolink IDs referenced by the given devices"""
+        return engine.get_audiolink_ids_for_devices(devices)
+    
+    def clone_devices_with_routing(self, selected_devices: List[Dict], output_data: Dict) -> Dict:
+        """Clone selected devices with their audio routing"""
+        return engine.clone_devices_with_routing(self.source_data, selected_devices, output_data, self.source_index)
+    
+    def generate_output(self):
+        """Generate the output file based on selected mode"""
+        mode = self.mode_var.get()
+        
+        if mode == "transfer_all":
+            # Auto-select all devices
+            self.select_all_devices()
+            self.generate_transfer()
+        else:  # transfer_selected
+            self.generate_transfer()
+    
+    def generate_transfer(self):
+        """Transfer device settings from source (old UIDs) to target (new UIDs)"""
+        if not self.source_data or not self.target_data:
+            messagebox.showerror("Error", "Please load both source and target files.")
+            return
+        
+        selected_devices = self.get_selected_devices()
+        if not selected_devices:
+            messagebox.showwarning("No Selection", "Please select at least one device to transfer.")
+            return
+        
+        strategies = STRATEGIES if self.match_by_name_var.get() else POSITION_ONLY
+        timer = StageTimer('transfer', devices=len(selected_devices))
+        profile_path = None
+        if self.profile_var.get():
+            profile_path = RunProfiler.new_report_path()
+            self.profile_var.set(False)
+        self.run_task(
+            self.transfer_task, self.source_data, self.target_data, selected_devices,
+            self.source_index, self.target_index, strategies, timer, profile_path,
+            on_done=lambda result: self.on_transfer_done(result, timer, profile_path),
+            error_message="Failed to generate output"
+        )
+    
+    @staticmethod
+    def transfer_task(context: TaskContext, source_data: Dict, target_data: Dict, selected_devices: List[Dict],
+                      source_index: engine.RoutingIndex, target_index: engine.RoutingIndex,
+                      strategies: Tuple[str, ...], timer: StageTimer,
+                      profile_path: Optional[str]) -> engine.TransferResult:
+        """Worker: build the output document"""
+        context.report(f"Transferring {len(selected_devices)} device(s)...")
+        with profile_if(profile_path, "Transfer"):
+            result = engine.generate_transfer(
+                source_data, target_data, selected_devices, source_index, target_index, strategies,
+                timer=timer
+            )
+        history.commit(result.output_data, 'output', result.description, timer)
+        return result
+    
+    def on_transfer_done(self, result: engine.TransferResult, timer: StageTimer = NULL_TIMER,
+                         profile_path: Optional[str] = None):
+        for warning in result.warnings:
+            messagebox.showwarning("Transfer Warning", warning)
+        
+        # Save file
+        self.save_output_file(result.output_data, f"{result.description}\nMatching: {result.match_summary}",
+                              timer, profile_path)
+    
+    def generate_fleet(self):
+        """Transfer the selected devices to several target files at once"""
+        if not self.source_data:
+            messagebox.showerror("Error", "Please load a source file.")
+            return
+        
+        if self.mode_var.get() == "transfer_all":
+            self.select_all_devices()
+        selected_devices = self.get_selected_devices()
+        if not selected_devices:
+            messagebox.showwarning("No Selection", "Please select at least one device to transfer.")
+            return
+        
+        initial_dir = os.path.dirname(self.source_file_path) if self.source_file_path else os.getcwd()
+        target_files = filedialog.askopenfilenames(
+            title="Select Target Files (Backup Base Stations)",
+            initialdir=initial_dir,
+            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+        )
+        if not target_files:
+            return
+        output_dir = filedialog.askdirectory(title="Select Output Folder", initialdir=initial_dir)
+        if not output_dir:
+            return
+        
+        strategies = STRATEGIES if self.match_by_name_var.get() else POSITION_ONLY
+        try:
+            jobs = fleet.plan_targets(target_files, output_dir, strategies)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        source = fleet.FleetSource(self.source_file_path, self.source_data, selected_devices, self.source_index)
+        self.run_task(
+            self.fleet_task, source, jobs, output_dir,
+            on_done=lambda report: self.on_fleet_done(report, output_dir),
+            error_message="Failed to transfer to the target files"
+        )
+    
+    @staticmethod
+    def fleet_task(context: TaskContext, source: 'fleet.FleetSource', jobs: List[Dict], output_dir: str) -> Dict:
+        """Worker: transfer to every target across a process pool and write the report"""
+        context.report(f"Transferring {len(source.selected_devices)} device(s) to {len(jobs)} targets...")
+        start = time.perf_counter()
+        # Spawned, not forked: this runs on a worker thread next to the Tk main loop
+        results = fleet.run_fleet(source, jobs, start_method='spawn', check=context.check)
+        report = fleet.build_fleet_report(source, results, time.perf_counter() - start)
+        report['report_path'] = os.path.join(output_dir, "fleet_report.json")
+        context.check()
+        fleet.write_report(report, report['report_path'])
+        return report
+    
+    def on_fleet_done(self, report: Dict, output_dir: str):
+        self.update_status(
+            f"{report['succeeded']} of {report['targets']} targets written to {output_dir} in {report['seconds']:.1f}s"
+        )
+        lines = []
+        for r in report['results']:
+            if r['status'] == 'ok':
+                lines.append(f"\u2713 {os.path.basename(r['output'])}: {r['mapped']} of {r['selected']} mapped")
+            else:
+                lines.append(f"\u2717 {os.path.basename(r['target'])}: {r['error']}")
+        unmapped = (f"\n\n{report['unmapped_devices']} device(s) could not be mapped on every target."
+                    if report['unmapped_devices'] else "")
+        show = messagebox.showinfo if report['failed'] == 0 else messagebox.showwarning
+        show(
+            "Fleet Transfer",
+            "\n".join(lines) + unmapped + f"\n\nReport: {report['report_path']}"
+        )
+    
+    def show_history(self):
+        """List earlier sources, targets and outputs to reuse, save or compare"""
+        snapshots = list(reversed(history.snapshots()))
+        if not snapshots:
+            messagebox.showinfo("History", "No files have been loaded or generated yet.")
+            return
+
+        dialog = tk.Toplevel(self.root)
+        dialog.title("History")
+        dialog.geometry("750x400")
+        dialog.transient(self.root)
+        frame = ttk.Frame(dialog, padding="10")
+        frame.pack(fill=tk.BOTH, expand=True)
+        frame.columnconfigure(0, weight=1)
+        frame.rowconfigure(0, weight=1)
+
+        listbox = tk.Listbox(frame, selectmode=tk.EXTENDED, font="TkFixedFont")
+        listbox.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=listbox.yview)
+        scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        listbox.config(yscrollcommand=scrollbar.set)
+        for snapshot in snapshots:
+            listbox.insert(tk.END, snapshot._replace(label=os.path.basename(snapshot.label)).describe())
+        ttk.Label(frame, text=f"Newest first; {history.describe()}", foreground="gray").grid(
+            row=1, column=0, columnspan=2, sticky=tk.W, pady=(5, 0))
+
+        def selected(count: int) -> Optional[List[Snapshot]]:
+            chosen = [snapshots[i] for i in listbox.curselection()]
+            if len(chosen) != count:
+                messagebox.showinfo("History", f"Please select {'one entry' if count == 1 else 'two entries'}.",
+                                    parent=dialog)
+                return None
+            return chosen
+
+        def use(role: str):
+            chosen = selected(1)
+            if chosen:
+                dialog.destroy()
+                self.use_snapshot(chosen[0], role)
+
+        def save():
+            chosen = selected(1)
+            if chosen:
+                dialog.destroy()
+                snapshot = chosen[0]
+                self.save_output_file(history.restore(snapshot), f"Restored {snapshot.kind} #{snapshot.number}")
+
+        def compare():
+            chosen = selected(2)
+            if chosen:
+                old, new = sorted(chosen, key=lambda s: s.number)
+                patch = history.compare(old, new)
+                messagebox.showinfo(f"Changes from #{old.number} to #{new.number}",
+                                    describe_patch(patch, 15), parent=dialog)
+
+        buttons = ttk.Frame(frame)
+        buttons.grid(row=2, column=0, columnspan=2, pady=(10, 0))
+        ttk.Button(buttons, text="Use as Source", command=lambda: use('source')).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons, text="Use as Target", command=lambda: use('target')).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons, text="Save As...", command=save).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons, text="Compare Two", command=compare).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons, text="Close", command=dialog.destroy).pack(side=tk.LEFT, padx=5)
+
+    def use_snapshot(self, snapshot: Snapshot, role: str):
+        """Load a history entry as the source or target, as if its file had been opened"""
+        name = snapshot.label if snapshot.kind in ('source', 'target') else f"History #{snapshot.number}"
+        timer = StageTimer(f'restore_{role}', snapshot=snapshot.number)
+        on_loaded = self.on_source_loaded if role == 'source' else self.on_target_loaded
+        self.run_task(
+            self.restore_task, snapshot, timer,
+            on_done=lambda loaded: on_loaded(name, *loaded, timer, from_file=False),
+            error_message="Failed to restore from history"
+        )
+
+    @staticmethod
+    def restore_task(context: TaskContext, snapshot: Snapshot,
+                     timer: StageTimer) -> Tuple[Dict, engine.RoutingIndex, ValidationReport]:
+        """Worker: rebuild, index and validate a history entry"""
+        context.report(f"Restoring #{snapshot.number}...")
+        data = history.restore(snapshot, timer)
+        with timer.stage('index', objects=len(data.get('audiolinks', []))):
+            routing = engine.RoutingIndex(data)
+        with timer.stage('validation'):
+            validation = validate_config(data)
+        return data, routing, validation
+
+    def save_output_file(self, output_data: Dict, operation_description: str,
+                         timer: StageTimer = NULL_TIMER, profile_path: Optional[str] = None):
+        """Save output file with timestamp default name"""
+        # Generate default filename with timestamp
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        default_filename = f"Spectera_Setup_{timestamp}.json"
+        
+        # Get directory from source file if available, otherwise use current directory
+        initial_dir = os.path.dirname(self.source_file_path) if self.source_file_path else os.getcwd()
+        
+        output_filename = filedialog.asksaveasfilename(
+            title="Save Output File",
+            defaultextension=".json",
+            initialfile=default_filename,
+            initialdir=initial_dir,
+            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+        )
+        
+        if output_filename:
+            self.run_task(
+                self.save_task, output_data, output_filename, timer, profile_path,
+                on_done=lambda _: self.on_save_done(
+                    output_data, output_filename, operation_description, timer, profile_path
+                ),
+                error_message="Failed to save output file"
+            )
+        else:
+            self.update_status("Ready")
+    
+    @staticmethod
+    def save_task(context: TaskContext, output_data: Dict, output_filename: str,
+                  timer: StageTimer, profile_path: Optional[str]):
+        """Worker: write the output file"""
+        context.report(f"Saving {os.path.basename(output_filename)}...")
+        with profile_if(profile_path, "Save"):
+            # Cancelling discards the temporary file, so the existing output is never replaced
+            engine.save_config(output_data, output_filename, timer=timer, check=context.check)
+    
+    def on_save_done(self, output_data: Dict, output_filename: str, operation_description: str,
+                     timer: StageTimer = NULL_TIMER, profile_path: Optional[str] = None):
+        device_count = len(output_data.get('pairedDevices', []))
+        timer.write_log()
+        timing = f" in {timer.summary()}" if timer.enabled else ""
+        self.update_status(f"Successfully saved: {os.path.basename(output_filename)}{timing}")
+        
+        profile_note = f"\nProfile report: {profile_path}" if profile_path else ""
+        messagebox.showinfo(
+            "Success",
+            f"Output file saved successfully!\n\n"
+            f"Operation: {operation_description}\n"
+            f"Devices: {device_count}{profile_note}"
+        )
+    
+    def run_task(self, func, *args, on_done=None, error_message: str = "Operation failed"):
+        """Run func(context, *args) on a worker thread while the window stays responsive"""
+        def on_error(e: Exception):
+            self.set_busy(False)
+            self.update_status("Ready")
+            if isinstance(e, engine.TransferError):
+                messagebox.showerror(e.title, e.message)
+            else:
+                messagebox.showerror("Error", f"{error_message}:\n{str(e)}")
+        
+        def finished(result):
+            self.set_busy(False)
+            if on_done:
+                on_done(result)
+        
+        self.tasks.start(func, *args, on_done=finished, on_error=on_error)
+        self.set_busy(True)
+    
+    def cancel_task(self):
+        """Abandon the running background task"""
+        if self.tasks.cancel():
+            self.set_busy(False)
+            self.update_status("Cancelled")
+    
+    def set_busy(self, busy: bool):
+        """Lock the controls that would start another task"""
+        state = "disabled" if busy else "normal"
+        self.source_button.config(state=state)
+        self.target_button.config(state=state)
+        self.cancel_button.config(state="normal" if busy else "disabled")
+        self.progress_bar.config(value=0.0)
+        self.history_button.config(state=state)
+        if busy:
+            self.generate_button.config(state="disabled")
+            self.fleet_button.config(state="disabled")
+        else:
+            self.check_ready()
+    
+    def poll_tasks(self):
+        """Deliver worker progress and results on the Tk thread"""
+        self.tasks.poll(self.on_task_progress)
+        self.root.after(50, self.poll_tasks)
+    
+    def on_task_progress(self, stage: str, fraction: Optional[float]):
+        self.update_status(stage)
+        if fraction is not None:
+            self.progress_bar.config(value=fraction)
+    
+    def update_status(self, message: str):
+        """Update status bar"""
+        self.status_label.config(text=message)
+
+
+def main():
+    root = tk.Tk()
+    app = SpecteraEditor(root)
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Fleet transfers start worker processes from the frozen app
+    main()
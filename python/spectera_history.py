@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+"""
+Spectera config history
+Keeps every loaded source and target and every generated output as a snapshot
+that can be restored or compared later, without starting over from files.
+
+Snapshots are content-addressed and deduplicated. Every record of a list
+section (pairedDevices, audiolinks, audioInputs, audioOutputs, ...) is stored
+once under the sha256 of its encoding, a section is stored as a list of chunks
+of record digests, and a snapshot is the list of its sections. Chunk boundaries
+depend on the records' digests rather than their positions, so a run of
+unchanged records forms the same chunk in every version even when records
+before it were added or removed. A record that is unchanged between versions
+is stored, and held in memory, only once, so hundreds of versions of a large
+config cost little more than one plus their changes. Records already in the store are recognised by identity (transfer
+outputs share untouched records with their target), so committing an output
+only encodes the records the transfer changed.
+
+Stored records are shared with the configs they came from and with restored
+configs, the same way transfer outputs share records with their target; like
+everywhere else in the engine, records are replaced rather than modified.
+
+With a directory, the store persists across sessions as an append-only object
+pack (objects.pack) and snapshot log (history.jsonl); objects are read back
+only when a snapshot that needs them is restored.
+
+max_snapshots and max_bytes bound what is held in memory: once either is
+exceeded, objects only the oldest snapshots use are released. Without a
+directory those snapshots are forgotten; with one they stay in the log and are
+read back from the pack if restored.
+
+    python spectera_history.py ~/.spectera_editor/history log
+    python spectera_history.py ~/.spectera_editor/history diff 3 7
+    python spectera_history.py ~/.spectera_editor/history restore 3 -o before.json
+
+Copyright (C) 2024
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+from spectera_model import is_record
+from spectera_profile import NULL_TIMER, StageTimer
+from spectera_writer import encoder_for
+
+
+PACK_FILE = 'objects.pack'
+LOG_FILE = 'history.jsonl'
+_DIGEST_LENGTH = 64
+CHUNK_BOUNDARY = '00'   # A chunk ends after a record whose digest ends like this: ~256 records per chunk
+MAX_CHUNK = 1024
+
+
+class Snapshot(NamedTuple):
+    number: int         # 1-based position in the history
+    id: str             # content digest; equal configs have equal IDs
+    kind: str           # 'source', 'target', 'output', ...
+    label: str
+    created: str
+    devices: int
+    entries: Tuple[Tuple[str, str, str], ...]  # (top-level key, 'records' or 'value', digest)
+
+    def to_record(self) -> Dict:
+        record = self._asdict()
+        record['entries'] = [list(entry) for entry in self.entries]
+        return record
+
+    @classmethod
+    def from_record(cls, record: Dict) -> 'Snapshot':
+        return cls(**dict(record, entries=tuple(tuple(entry) for entry in record['entries'])))
+
+    def describe(self) -> str:
+        return f"#{self.number:<4} {self.created[:19].replace('T', ' ')}  {self.kind:<7} {self.devices:>5} devices  {self.label}"
+
+
+class HistoryStore:
+    """Deduplicated snapshots of configs, in memory or backed by a directory"""
+
+    def __init__(self, directory: Optional[str] = None, max_snapshots: Optional[int] = None,
+                 max_bytes: Optional[int] = None):
+        self.directory = directory
+        self.max_snapshots = max_snapshots
+        self.max_bytes = max_bytes
+        self._objects = {}    # digest -> record dict, value, or tuple of digests (chunk or section)
+        self._sizes = {}      # digest -> encoded size, for every object in _objects
+        self._memo = {}       # id(stored record) -> digest
+        self._offsets = {}    # digest -> (offset, length) in the pack, for objects not read yet
+        self._snapshots = []
+        self._held_from = 0   # index of the oldest snapshot whose objects are kept in memory
+        self._next_number = 1
+        self._lock = threading.RLock()
+        # Digests name objects in the pack, so they must not depend on whether orjson is installed
+        self._encode = encoder_for('json')
+        self._pack = None
+        self._pack_reader = None
+        self._log = None
+        self.stored_bytes = 0
+        self.held_bytes = 0
+        if directory:
+            self._open()
+
+    # -- disk ---------------------------------------------------------------
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        pack_path = os.path.join(self.directory, PACK_FILE)
+        log_path = os.path.join(self.directory, LOG_FILE)
+
+        # An interrupted append leaves a partial last line; drop it so new objects start cleanly
+        offset = 0
+        if os.path.exists(pack_path):
+            with open(pack_path, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n') or line[_DIGEST_LENGTH:_DIGEST_LENGTH + 1] != b' ':
+                        break
+                    digest = line[:_DIGEST_LENGTH].decode('ascii')
+                    self._offsets[digest] = (offset + _DIGEST_LENGTH + 1, len(line) - _DIGEST_LENGTH - 2)
+                    offset += len(line)
+            if offset < os.path.getsize(pack_path):
+                os.truncate(pack_path, offset)
+        self.stored_bytes = offset
+
+        if os.path.exists(log_path):
+            with open(log_path, 'rb') as f:
+                for line in f:
+                    try:
+                        snapshot = Snapshot.from_record(json.loads(line))
+                    except (ValueError, TypeError, KeyError):
+                        continue
+                    self._snapshots.append(snapshot._replace(number=len(self._snapshots) + 1))
+        self._next_number = len(self._snapshots) + 1
+        self._held_from = len(self._snapshots)
+
+        self._pack = open(pack_path, 'ab')
+        self._pack_reader = open(pack_path, 'rb')
+        self._log = open(log_path, 'ab')
+
+    def close(self):
+        for f in (self._pack, self._pack_reader, self._log):
+            if f is not None:
+                f.close()
+        self._pack = self._pack_reader = self._log = None
+
+    def __enter__(self) -> 'HistoryStore':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def _load(self, digest: str):
+        """Parsed object for digest, reading it from the pack on first use"""
+        try:
+            return self._objects[digest]
+        except KeyError:
+            pass
+        if digest not in self._offsets:
+            raise KeyError(f"History object {digest[:12]} is missing")
+        offset, length = self._offsets[digest]
+        self._pack_reader.seek(offset)
+        return json.loads(self._pack_reader.read(length))
+
+    def _hold(self, digest: str, obj, size: int):
+        self._objects[digest] = obj
+        self._sizes[digest] = size
+        self.held_bytes += size
+
+    def _record(self, digest: str) -> Dict:
+        record = self._objects.get(digest)
+        if record is None:
+            record = self._load(digest)
+            self._hold(digest, record, self._offsets[digest][1])
+            self._memo[id(record)] = digest
+        return record
+
+    def _tree(self, digest: str) -> Tuple[str, ...]:
+        tree = self._objects.get(digest)
+        if tree is None:
+            tree = tuple(self._load(digest))
+            self._hold(digest, tree, self._offsets[digest][1])
+        return tree
+
+    def _value(self, digest: str):
+        if digest not in self._objects:
+            self._hold(digest, self._load(digest), self._offsets[digest][1])
+        return self._objects[digest]
+
+    # -- storing ------------------------------------------------------------
+
+    def _known(self, digest: str) -> bool:
+        return digest in self._objects or digest in self._offsets
+
+    def _put_record(self, record: Dict, new: List) -> str:
+        digest = self._memo.get(id(record))
+        if digest is not None:
+            return digest
+        raw = self._encode(record)
+        digest = hashlib.sha256(raw).hexdigest()
+        if digest not in self._objects:
+            # New content, or on disk but not read yet: this record becomes the shared copy
+            if digest not in self._offsets:
+                new.append((digest, raw))
+            self._hold(digest, record, len(raw))
+            self._memo[id(record)] = digest
+        return digest
+
+    def _put_section(self, digests: Tuple[str, ...], new: List) -> str:
+        chunks = []
+        start = 0
+        for end, digest in enumerate(digests, 1):
+            if digest.endswith(CHUNK_BOUNDARY) or end - start >= MAX_CHUNK:
+                chunks.append(self._put_tree(digests[start:end], new))
+                start = end
+        if start < len(digests):
+            chunks.append(self._put_tree(digests[start:], new))
+        return self._put_tree(tuple(chunks), new)
+
+    def _put_tree(self, digests: Tuple[str, ...], new: List) -> str:
+        digest = hashlib.sha256(('tree:' + ''.join(digests)).encode('ascii')).hexdigest()
+        if digest not in self._objects:
+            raw = self._encode(list(digests))
+            if digest not in self._offsets:
+                new.append((digest, raw))
+            self._hold(digest, digests, len(raw))
+        return digest
+
+    def _put_value(self, value, new: List) -> str:
+        raw = self._encode(value)
+        digest = hashlib.sha256(raw).hexdigest()
+        if not self._known(digest):
+            new.append((digest, raw))
+        if digest not in self._objects:
+            self._hold(digest, value, len(raw))
+        return digest
+
+    def commit(self, data: Dict, kind: str, label: str = "", timer: StageTimer = NULL_TIMER) -> Snapshot:
+        """Record data as the newest snapshot; returns the previous snapshot of that kind if data is unchanged"""
+        with timer.stage('history') as stage, self._lock:
+            new = []
+            entries = []
+            for key, value in data.items():
+                if isinstance(value, list) and value and all(is_record(r) for r in value):
+                    memo = self._memo.get
+                    digests = tuple(memo(id(record)) or self._put_record(record, new) for record in value)
+                    entries.append((key, 'records', self._put_section(digests, new)))
+                else:
+                    entries.append((key, 'value', self._put_value(value, new)))
+            entries = tuple(entries)
+            snapshot_id = hashlib.sha256(self._encode([list(e) for e in entries])).hexdigest()
+            stage.objects = len(new)
+
+            for previous in reversed(self._snapshots):
+                if previous.kind == kind:
+                    if previous.id == snapshot_id:
+                        return previous
+                    break
+
+            devices = data.get('pairedDevices')
+            snapshot = Snapshot(self._next_number, snapshot_id, kind, label,
+                                datetime.now().isoformat(timespec='seconds'),
+                                len(devices) if isinstance(devices, list) else 0, entries)
+            self.stored_bytes += sum(len(raw) + _DIGEST_LENGTH + 2 for _, raw in new)
+            if self._pack is not None:
+                self._append(new, snapshot)
+            self._snapshots.append(snapshot)
+            self._next_number += 1
+            self._trim()
+            return snapshot
+
+    def _reachable(self, snapshot: Snapshot) -> set:
+        """Digests of every object a snapshot uses"""
+        reached = set()
+        for _, kind, digest in snapshot.entries:
+            reached.add(digest)
+            if kind == 'records':
+                for chunk in self._tree(digest):
+                    reached.add(chunk)
+                    reached.update(self._tree(chunk))
+        return reached
+
+    def _trim(self):
+        """Release the objects only the oldest snapshots use once a memory limit is exceeded"""
+        over_count = (self.max_snapshots is not None
+                      and len(self._snapshots) - self._held_from > self.max_snapshots)
+        over_bytes = self.max_bytes is not None and self.held_bytes > self.max_bytes
+        if not (over_count or over_bytes):
+            return
+
+        # Keep the newest snapshots that fit three quarters of the limits, so trimming
+        # runs every few commits rather than on each one; the newest is always kept
+        keep_snapshots = None if self.max_snapshots is None else self.max_snapshots * 3 // 4
+        keep_bytes = None if self.max_bytes is None else self.max_bytes * 3 // 4
+        live = set()
+        held = 0
+        start = len(self._snapshots)
+        while start > self._held_from:
+            kept = len(self._snapshots) - start
+            if kept and keep_snapshots is not None and kept >= keep_snapshots:
+                break
+            reached = self._reachable(self._snapshots[start - 1]) - live
+            size = sum(self._sizes.get(d) or self._offsets[d][1] for d in reached)
+            if kept and keep_bytes is not None and held + size > keep_bytes:
+                break
+            live |= reached
+            held += size
+            start -= 1
+
+        released = 0
+        for digest in [d for d in self._objects if d not in live]:
+            del self._objects[digest]
+            size = self._sizes.pop(digest)
+            self.held_bytes -= size
+            released += size + _DIGEST_LENGTH + 2
+        # A released record may be freed and its id() reused, so its memo entry must go too
+        self._memo = {key: digest for key, digest in self._memo.items() if digest in live}
+        if self._pack is None:
+            del self._snapshots[:start]
+            self.stored_bytes -= released
+            self._held_from = 0
+        else:
+            self._held_from = start
+
+    def _append(self, new: List, snapshot: Snapshot):
+        # Objects are durable before the snapshot naming them; a crash in between only leaves orphans
+        offset = self._pack.tell()
+        for digest, raw in new:
+            self._pack.write(digest.encode('ascii') + b' ' + raw + b'\n')
+            self._offsets[digest] = (offset + _DIGEST_LENGTH + 1, len(raw))
+            offset += len(raw) + _DIGEST_LENGTH + 2
+        self._pack.flush()
+        os.fsync(self._pack.fileno())
+        self._log.write(json.dumps(snapshot.to_record(), separators=(',', ':')).encode('utf-8') + b'\n')
+        self._log.flush()
+        os.fsync(self._log.fileno())
+
+    # -- reading ------------------------------------------------------------
+
+    def snapshots(self, kind: Optional[str] = None) -> List[Snapshot]:
+        with self._lock:
+            return [s for s in self._snapshots if kind is None or s.kind == kind]
+
+    def __len__(self) -> int:
+        return len(self._snapshots)
+
+    def get(self, ref: Union[int, str, Snapshot]) -> Snapshot:
+        """Snapshot by number (negative counts from the newest), ID prefix, or itself"""
+        if isinstance(ref, Snapshot):
+            return ref
+        with self._lock:
+            if isinstance(ref, int) or (isinstance(ref, str) and ref.lstrip('-').isdigit()):
+                number = int(ref)
+                # Numbers stay fixed when the oldest snapshots are dropped from memory
+                index = len(self._snapshots) + number if number < 0 else number - self._next_number + len(self._snapshots)
+                if 0 <= index < len(self._snapshots) and number != 0:
+                    return self._snapshots[index]
+                raise KeyError(f"No snapshot #{ref}")
+            matches = [s for s in self._snapshots if s.id.startswith(ref)]
+            if not matches:
+                raise KeyError(f"No snapshot {ref}")
+            return matches[-1]
+
+    def restore(self, ref: Union[int, str, Snapshot], timer: StageTimer = NULL_TIMER) -> Dict:
+        """Rebuild a snapshot's config; its records are shared with the store"""
+        snapshot = self.get(ref)
+        with timer.stage('restore', objects=snapshot.devices), self._lock:
+            data = {}
+            for key, kind, digest in snapshot.entries:
+                if kind == 'records':
+                    data[key] = [self._record(d) for chunk in self._tree(digest) for d in self._tree(chunk)]
+                else:
+                    data[key] = self._value(digest)
+            return data
+
+    def compare(self, old: Union[int, str, Snapshot], new: Union[int, str, Snapshot]) -> Dict:
+        """Patch from one snapshot to another (see spectera_diff)
+
+        Records the two snapshots share are the same objects, so the diff skips
+        them by identity and its cost is dominated by what changed.
+        """
+        from spectera_diff import diff_configs
+        return diff_configs(self.restore(old), self.restore(new), base_digest=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'snapshots': len(self._snapshots),
+                'objects': len(self._objects.keys() | self._offsets.keys()),
+                'loaded_objects': len(self._objects),
+                'stored_bytes': self.stored_bytes,
+                'held_bytes': self.held_bytes,
+            }
+
+    def describe(self) -> str:
+        """One-line summary for status bars and logs"""
+        s = self.stats()
+        return (f"history: {s['snapshots']} snapshot(s), {s['objects']} unique objects, "
+                f"{s['stored_bytes'] / (1024 * 1024):.1f} MB")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse  # Only the command line needs it; the GUI imports this module
+    from spectera_diff import describe_patch
+    from spectera_engine import load_config, save_config
+
+    parser = argparse.ArgumentParser(description="Inspect and restore Spectera config history")
+    parser.add_argument('directory', help="History directory")
+    sub = parser.add_subparsers(dest='command', required=True)
+    log = sub.add_parser('log', help="List snapshots")
+    log.add_argument('--kind', help="Only snapshots of this kind (source, target, output)")
+    add = sub.add_parser('add', help="Record config files as snapshots")
+    add.add_argument('files', nargs='+')
+    add.add_argument('--kind', default='source')
+    restore = sub.add_parser('restore', help="Write a snapshot back to a file")
+    restore.add_argument('snapshot', help="Snapshot number (negative counts from the newest) or ID prefix")
+    restore.add_argument('-o', '--output', required=True)
+    diff = sub.add_parser('diff', help="Show what changed between two snapshots")
+    diff.add_argument('old')
+    diff.add_argument('new')
+    diff.add_argument('--limit', type=int, default=20, help="Records listed per section (default: 20)")
+    args = parser.parse_args(argv)
+
+    try:
+        with HistoryStore(args.directory) as store:
+            if args.command == 'log':
+                for snapshot in store.snapshots(args.kind):
+                    print(snapshot.describe())
+                print(store.describe())
+            elif args.command == 'add':
+                for path in args.files:
+                    snapshot = store.commit(load_config(path), args.kind, os.path.abspath(path))
+                    print(snapshot.describe())
+                print(store.describe())
+            elif args.command == 'restore':
+                save_config(store.restore(args.snapshot), args.output)
+                print(f"Snapshot {store.get(args.snapshot).number} written to {args.output}")
+            else:
+                print(describe_patch(store.compare(args.old, args.new), args.limit))
+    except KeyError as e:
+        print(f"Error: {e.args[0]}", file=sys.stderr)
+        return 2
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
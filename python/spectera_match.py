@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Spectera device matching
+Resolves which re-paired target device each source device becomes, using hash
+indexes over the target's pairedDevices instead of relying on pairing order.
+
+Strategies, in order of precedence:
+    name_type  same name and device type
+    name       same name
+    slot       same type and rfChannelId, and the same ordinal among devices
+               sharing that type/channel (e.g. the 3rd SEK on channel 0)
+    position   same index in pairedDevices (the original behaviour)
+
+Each strategy runs over all still-unmatched devices before the next one, so
+stronger evidence claims target devices first. A strategy only matches when it
+leaves exactly one unclaimed target device; several candidates are recorded as
+ambiguous and the next strategy is tried.
+
+Copyright (C) 2024
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+"""
+
+import itertools
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+
+STRATEGIES = ('name_type', 'name', 'slot', 'position')
+POSITION_ONLY = ('position',)
+
+
+def _name(device: Dict) -> Optional[str]:
+    # Blank names are what freshly paired devices carry; they identify nothing
+    name = str(device.get('name') or '').strip().lower()
+    return name or None
+
+
+def device_keys(devices: Sequence[Dict]) -> List[Dict[str, tuple]]:
+    """Return the lookup key of every strategy (except position) for each device"""
+    keys = []
+    slot_counts = {}
+    for device in devices:
+        device_type = device.get('type')
+        rf = device.get('rfChannelId')
+        ordinal = slot_counts.get((device_type, rf), 0)
+        slot_counts[(device_type, rf)] = ordinal + 1
+
+        name = _name(device)
+        device_key = {'slot': (device_type, rf, ordinal)}
+        if name is not None:
+            device_key['name_type'] = (name, device_type)
+            device_key['name'] = (name,)
+        keys.append(device_key)
+    return keys
+
+
+class MatchReport:
+    """Outcome of matching source devices to target devices"""
+
+    def __init__(self):
+        self.mapping = {}     # source mtUid -> target mtUid (unmatched keep their own UID)
+        self.matched = []     # {'source_uid', 'target_uid', 'name', 'strategy'}
+        self.ambiguous = []   # {'source_uid', 'name', 'strategy', 'candidate_count', 'candidates', 'resolved_by'}
+        self.unmatched = []   # {'source_uid', 'name'}
+
+    @property
+    def matched_count(self) -> int:
+        return len(self.matched)
+
+    def by_strategy(self) -> Dict[str, int]:
+        counts = {}
+        for match in self.matched:
+            counts[match['strategy']] = counts.get(match['strategy'], 0) + 1
+        return counts
+
+    def to_dict(self) -> Dict:
+        return {
+            'matched': self.matched,
+            'ambiguous': self.ambiguous,
+            'unmatched': self.unmatched,
+            'by_strategy': self.by_strategy(),
+        }
+
+    def warnings(self, selected_count: int) -> List[str]:
+        """Human-readable warnings for the GUI and batch reports"""
+        warnings = []
+        if self.unmatched:
+            names = ", ".join(str(u['name']) for u in self.unmatched[:10])
+            more = f" and {len(self.unmatched) - 10} more" if len(self.unmatched) > 10 else ""
+            warnings.append(
+                f"Only {self.matched_count} of {selected_count} devices could be mapped to target UIDs.\n"
+                f"The remaining devices will keep their original UIDs: {names}{more}"
+            )
+        unresolved = [a for a in self.ambiguous if a['resolved_by'] in (None, 'position')]
+        if unresolved:
+            names = ", ".join(str(a['name']) for a in unresolved[:10])
+            warnings.append(
+                f"{len(unresolved)} device(s) matched several target devices and were "
+                f"mapped by position or left unmapped: {names}"
+            )
+        return warnings
+
+
+class DeviceMatcher:
+    """Hash indexes over a target's pairedDevices, built once and reusable across matches"""
+
+    def __init__(self, target_devices: Sequence[Dict]):
+        self.target_devices = list(target_devices)
+        self.target_keys = device_keys(self.target_devices)
+        self.index = {}  # strategy -> key -> [target position]
+        for pos, keys in enumerate(self.target_keys):
+            for strategy, key in keys.items():
+                self.index.setdefault(strategy, {}).setdefault(key, []).append(pos)
+
+    def match(self, source_devices: Sequence[Dict], selected_uids: Optional[Set] = None,
+              strategies: Iterable[str] = STRATEGIES) -> MatchReport:
+        """Match selected source devices (all when selected_uids is None) to target devices
+
+        Every target device is used at most once. Runs in time linear in the number of
+        source and target devices.
+        """
+        strategies = tuple(strategies)
+        unknown = set(strategies) - set(STRATEGIES)
+        if unknown:
+            raise ValueError(f"Unknown matching strategies: {', '.join(sorted(unknown))}")
+
+        # Unclaimed target positions per key, materialized on first lookup so a small
+        # selection does not pay for copying the whole index
+        free = {strategy: {} for strategy in strategies if strategy != 'position'}
+        claimed = set()
+
+        def unclaimed(strategy: str, key: tuple) -> Optional[Set[int]]:
+            keyed = free[strategy]
+            if key not in keyed:
+                positions = self.index.get(strategy, {}).get(key)
+                if not positions:
+                    return None
+                keyed[key] = {p for p in positions if p not in claimed}
+            return keyed[key]
+
+        def claim(pos: int):
+            claimed.add(pos)
+            for strategy, key in self.target_keys[pos].items():
+                if strategy in free and key in free[strategy]:
+                    free[strategy][key].discard(pos)
+
+        source_keys = device_keys(source_devices)
+        pending = [pos for pos, device in enumerate(source_devices)
+                   if selected_uids is None or device.get('mtUid') in selected_uids]
+        targets = {}       # source position -> (target position, strategy)
+        ambiguities = {}   # source position -> first ambiguous lookup
+
+        # One pass per strategy, so stronger evidence claims target devices first
+        for strategy in strategies:
+            still_pending = []
+            for pos in pending:
+                target_pos = None
+                if strategy == 'position':
+                    if pos < len(self.target_devices) and pos not in claimed:
+                        target_pos = pos
+                else:
+                    key = source_keys[pos].get(strategy)
+                    candidates = unclaimed(strategy, key) if key is not None else None
+                    if candidates and len(candidates) == 1:
+                        target_pos = next(iter(candidates))
+                    elif candidates and pos not in ambiguities:
+                        ambiguities[pos] = {
+                            'source_uid': source_devices[pos].get('mtUid'),
+                            'name': source_devices[pos].get('name'),
+                            'strategy': strategy,
+                            'candidate_count': len(candidates),
+                            'candidates': sorted(self.target_devices[p].get('mtUid')
+                                                 for p in itertools.islice(candidates, 10)),
+                        }
+                if target_pos is None:
+                    still_pending.append(pos)
+                else:
+                    claim(target_pos)
+                    targets[pos] = (target_pos, strategy)
+            pending = still_pending
+
+        report = MatchReport()
+        for pos, device in enumerate(source_devices):
+            source_uid = device.get('mtUid')
+            if selected_uids is not None and source_uid not in selected_uids:
+                continue
+            if pos in ambiguities:
+                ambiguity = ambiguities[pos]
+                ambiguity['resolved_by'] = targets[pos][1] if pos in targets else None
+                report.ambiguous.append(ambiguity)
+            if pos not in targets:
+                report.mapping[source_uid] = source_uid
+                report.unmatched.append({'source_uid': source_uid, 'name': device.get('name')})
+                continue
+            target_pos, strategy = targets[pos]
+            target_uid = self.target_devices[target_pos].get('mtUid')
+            report.mapping[source_uid] = target_uid
+            report.matched.append({
+                'source_uid': source_uid,
+                'target_uid': target_uid,
+                'name': device.get('name'),
+                'strategy': strategy,
+            })
+        return report
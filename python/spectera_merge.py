@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Spectera Multi-Source Merge
+Consolidates devices from several source base stations into one target, e.g.
+two primary rigs onto a single backup:
+
+    python spectera_merge.py rig_A.json rig_B.json --target backup.json -o merged.json
+
+Each source numbers its audiolinks, inputs and outputs independently, so the
+same audiolinkId, inputId or outputId usually means different things in two
+sources. Sources are merged in the order given: an ID keeps its value when no
+earlier source claimed it, otherwise it moves to the lowest ID that neither the
+target nor any source uses, and every reference to it (devices' iem/mic links,
+inputs' iemAudiolinkId, outputs' micAudiolinkId) is rewritten in the same pass.
+The renumbered sources are then transferred as one, with the usual device
+matching. A remapping table records every ID that changed.
+
+Copyright (C) 2024
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple, Union
+
+import spectera_engine as engine
+from spectera_engine import RoutingIndex, TransferError, TransferResult, copy_record
+from spectera_match import POSITION_ONLY, STRATEGIES
+from spectera_profile import NULL_TIMER, StageTimer
+
+
+class IdAllocator:
+    """Collision-free IDs within one namespace (audiolinkId, inputId or outputId)
+
+    claim() keeps an ID if it is still free; allocate() hands out the lowest ID
+    that is neither taken nor reserved. IDs are never released, so the search
+    cursor only moves forward and allocation is amortized O(1).
+    """
+
+    def __init__(self, reserved: Iterable[int] = ()):
+        self.taken = set()
+        self.reserved = set(reserved)
+        self._cursor = 0
+
+    def claim(self, record_id: int) -> bool:
+        if record_id in self.taken:
+            return False
+        self.taken.add(record_id)
+        return True
+
+    def allocate(self) -> int:
+        while self._cursor in self.taken or self._cursor in self.reserved:
+            self._cursor += 1
+        self.taken.add(self._cursor)
+        return self._cursor
+
+    def assign(self, record_id: int) -> int:
+        """Return record_id when free, otherwise a newly allocated ID"""
+        return record_id if self.claim(record_id) else self.allocate()
+
+
+class MergeSource(NamedTuple):
+    """One source config and the devices to take from it"""
+    label: str
+    data: Dict
+    selected_devices: List[Dict]
+    index: Optional[RoutingIndex] = None
+
+
+class MergeResult(NamedTuple):
+    transfer: TransferResult
+    remapping: List[Dict]   # {'source', 'field', 'old', 'new'} for every renumbered ID
+    skipped: List[Dict]     # {'source', 'mtUid', 'name'} for devices already taken from an earlier source
+    device_sources: Dict    # source mtUid -> source label
+
+    def remapping_table(self) -> Dict:
+        """Audit record of renumbered IDs and where every merged device ended up"""
+        report = self.transfer.match_report
+        return {
+            'ids': self.remapping,
+            'devices': [dict(m, source=self.device_sources.get(m['source_uid'])) for m in report.matched]
+                       + [dict(u, source=self.device_sources.get(u['source_uid']), target_uid=None)
+                          for u in report.unmatched],
+            'skipped': self.skipped,
+        }
+
+
+def _source_routing(source: MergeSource, devices: List[Dict]) -> Tuple[Set[int], List[Dict], List[Dict], List[Dict]]:
+    index = source.index if source.index is not None else RoutingIndex(source.data)
+    used = engine.get_audiolink_ids_for_devices(devices)
+    links, inputs, outputs = index.routing_for(used)
+    return used, links, inputs, outputs
+
+
+def renumber_sources(sources: List[MergeSource], target_data: Dict) -> Tuple[Dict, List[Dict], List[Dict], Dict]:
+    """Combine the sources' selected devices and routing into one config with unique IDs
+
+    Returns (combined config, remapping rows, skipped devices, mtUid -> source label).
+    Runs in time linear in the size of the selected routing of all sources.
+    """
+    # A device found in several sources is taken from the first, with that source's routing
+    skipped = []
+    device_sources = {}
+    kept = []
+    for source in sources:
+        devices = []
+        for device in source.selected_devices:
+            uid = device.get('mtUid')
+            if uid in device_sources:
+                skipped.append({'source': source.label, 'mtUid': uid, 'name': device.get('name')})
+                continue
+            device_sources[uid] = source.label
+            devices.append(device)
+        kept.append(devices)
+    routing = [_source_routing(source, devices) for source, devices in zip(sources, kept)]
+
+    # Renumbered IDs must not land on an ID the target has or any source keeps
+    links = IdAllocator(link.get('audiolinkId') for link in target_data.get('audiolinks', []))
+    inputs = IdAllocator(inp.get('inputId') for inp in target_data.get('audioInputs', []))
+    outputs = IdAllocator(out.get('outputId') for out in target_data.get('audioOutputs', []))
+    for used, _, source_inputs, source_outputs in routing:
+        links.reserved.update(used)
+        inputs.reserved.update(inp.get('inputId') for inp in source_inputs)
+        outputs.reserved.update(out.get('outputId') for out in source_outputs)
+
+    combined = {'audiolinks': [], 'audioInputs': [], 'audioOutputs': [], 'pairedDevices': []}
+    remapping = []
+
+    for source, devices, (used, source_links, source_inputs, source_outputs) in zip(sources, kept, routing):
+        link_map = {link_id: links.assign(link_id) for link_id in sorted(used)}
+        input_map = {}
+        output_map = {}
+        for inp in source_inputs:
+            if inp.get('inputId') not in input_map:
+                input_map[inp.get('inputId')] = inputs.assign(inp.get('inputId'))
+        for out in source_outputs:
+            if out.get('outputId') not in output_map:
+                output_map[out.get('outputId')] = outputs.assign(out.get('outputId'))
+
+        for field, mapping in (('audiolinkId', link_map), ('inputId', input_map), ('outputId', output_map)):
+            remapping.extend({'source': source.label, 'field': field, 'old': old, 'new': new}
+                             for old, new in mapping.items() if old != new)
+
+        def relink(record: Dict, key: str) -> Dict:
+            # Only records whose IDs change are copied here; the transfer copies the rest
+            value = record.get(key, -1)
+            new_value = link_map.get(value, value)
+            return {key: new_value} if new_value != value else {}
+
+        for device in devices:
+            changes = {**relink(device, 'iemAudiolinkId'), **relink(device, 'micAudiolinkId')}
+            combined['pairedDevices'].append(copy_record(device, **changes) if changes else device)
+
+        for link in source_links:
+            new_id = link_map[link.get('audiolinkId')]
+            combined['audiolinks'].append(
+                link if new_id == link.get('audiolinkId') else copy_record(link, audiolinkId=new_id))
+        for inp in source_inputs:
+            changes = relink(inp, 'iemAudiolinkId')
+            if input_map[inp.get('inputId')] != inp.get('inputId'):
+                changes['inputId'] = input_map[inp.get('inputId')]
+            combined['audioInputs'].append(copy_record(inp, **changes) if changes else inp)
+        for out in source_outputs:
+            changes = relink(out, 'micAudiolinkId')
+            if output_map[out.get('outputId')] != out.get('outputId'):
+                changes['outputId'] = output_map[out.get('outputId')]
+            combined['audioOutputs'].append(copy_record(out, **changes) if changes else out)
+
+    return combined, remapping, skipped, device_sources
+
+
+def merge_configs(sources: List[MergeSource], target_data: Dict,
+                  target_index: Optional[RoutingIndex] = None,
+                  strategies: Iterable[str] = STRATEGIES,
+                  timer: StageTimer = NULL_TIMER) -> MergeResult:
+    """Merge the selected devices of several sources, with their routing, into target_data"""
+    if not sources:
+        raise TransferError("Error", "Please load at least one source file.")
+
+    with timer.stage('renumber') as stage:
+        combined, remapping, skipped, device_sources = renumber_sources(sources, target_data)
+        stage.objects = len(remapping)
+
+    result = engine.generate_transfer(combined, target_data, combined['pairedDevices'],
+                                      target_index=target_index, strategies=strategies, timer=timer)
+
+    warnings = list(result.warnings)
+    if remapping:
+        counts = {}
+        for row in remapping:
+            counts[row['field']] = counts.get(row['field'], 0) + 1
+        warnings.append("Renumbered to avoid collisions between sources: "
+                        + ", ".join(f"{count} {field}" for field, count in counts.items()))
+    if skipped:
+        names = ", ".join(str(s['name']) for s in skipped[:10])
+        warnings.append(f"{len(skipped)} device(s) appear in more than one source and were taken "
+                        f"from the first only: {names}")
+    return MergeResult(result._replace(warnings=warnings), remapping, skipped, device_sources)
+
+
+def run_merge_files(source_paths: List[str], target_path: str, output_path: str,
+                    selection: Union[str, List, None] = "all",
+                    strategies: Iterable[str] = STRATEGIES,
+                    timer: StageTimer = NULL_TIMER, force: bool = False,
+                    compact: bool = False) -> Tuple[Dict, Dict]:
+    """Load, merge and save; returns (summary record, remapping table)
+
+    An output with integrity errors (e.g. duplicate mtUid) is only saved with force;
+    the summary's 'written' and 'validation' say what happened. With compact, configs
+    are held as compact records while merging.
+    """
+    sources = []
+    for path in source_paths:
+        data = engine.load_config(path, timer=timer, compact=compact)
+        sources.append(MergeSource(os.path.basename(path), data, engine.select_devices(data, selection)))
+    target_data = engine.load_config(target_path, timer=timer, compact=compact)
+    merged = merge_configs(sources, target_data, strategies=strategies, timer=timer)
+    result = merged.transfer
+    written = result.validation.ok or force
+    if written:
+        engine.save_config(result.output_data, output_path, timer=timer)
+    summary = {
+        'sources': source_paths,
+        'target': target_path,
+        'output': output_path,
+        'selected': result.selected_count,
+        'mapped': result.mapped_count,
+        'renumbered': len(merged.remapping),
+        'skipped': len(merged.skipped),
+        'description': result.description,
+        'warnings': result.warnings,
+        'written': written,
+        'validation': result.validation.to_dict(limit=20),
+    }
+    return summary, merged.remapping_table()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Merge devices from several source base stations into one target")
+    parser.add_argument('sources', nargs='+', help="Source configs, in order of precedence for IDs")
+    parser.add_argument('-t', '--target', required=True, help="Target config with the re-paired devices")
+    parser.add_argument('-o', '--output', required=True, help="Merged output config")
+    parser.add_argument('-s', '--select', nargs='+', metavar='DEVICE',
+                        help="Device UIDs and/or names to take from each source (default: all)")
+    parser.add_argument('--match', choices=('auto', 'position'), default='auto',
+                        help="Match devices by name, type and slot (auto) or by position only")
+    parser.add_argument('--remap', default=None,
+                        help="Remapping table path (default: <output>_remap.json)")
+    parser.add_argument('--force', action='store_true',
+                        help="Write the output even if it has integrity errors (still exits 1)")
+    parser.add_argument('--timings', action='store_true', help="Print per-stage timings")
+    parser.add_argument('--compact', action='store_true',
+                        help="Hold configs as compact records: less memory, slower merges")
+    args = parser.parse_args(argv)
+
+    selection = engine.parse_selection(args.select)
+    strategies = POSITION_ONLY if args.match == 'position' else STRATEGIES
+    timer = StageTimer('merge', sources=len(args.sources)) if args.timings else NULL_TIMER
+    try:
+        summary, table = run_merge_files(args.sources, args.target, args.output, selection, strategies, timer,
+                                         force=args.force, compact=args.compact)
+    except TransferError as e:
+        print(f"{e.title}: {e.message}", file=sys.stderr)
+        return 1
+    except (OSError, ValueError) as e:
+        print(f"Merge failed: {e}", file=sys.stderr)
+        return 1
+
+    for warning in summary['warnings']:
+        print(f"warning: {warning}")
+    if timer.enabled:
+        print(f"timings: {timer.summary()}")
+    if not summary['written']:
+        print("Merge not written: the output has integrity errors (use --force to write it anyway)",
+              file=sys.stderr)
+        return 1
+
+    remap_path = args.remap or f"{os.path.splitext(args.output)[0]}_remap.json"
+    with open(remap_path, 'w') as f:
+        json.dump(table, f, indent=2)
+
+    print(f"{summary['description']} from {len(args.sources)} sources; "
+          f"{summary['renumbered']} IDs renumbered; remapping table: {remap_path}")
+    return 1 if summary['validation']['errors'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Spectera compact config model
+Slot-based records for the four record sections (pairedDevices, audiolinks,
+audioInputs, audioOutputs). A parsed record is a dict with its own hash table;
+a compact record keeps the known fields in __slots__, shares one key-order
+tuple with every record of the same shape, and interns short string values
+such as device types and "Off", so a large config takes a fraction of the
+memory. Fields a newer firmware adds are kept in a small per-record dict.
+
+Records are read-only mappings: everything that reads configs (the engine,
+matching, validation, the device list) works on them unchanged, and a changed
+record is a new record, the same copy-on-write rule the engine follows for
+dicts. The writer encodes them exactly as the dicts they came from, so a
+compact config saves byte-for-byte like the original:
+
+    data = compact_config(load_config(path))
+    save_config(data, path)          # identical bytes
+    data == original                 # and equal to the parsed dicts
+
+Copyright (C) 2024
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+"""
+
+import sys
+from collections.abc import Mapping
+from operator import attrgetter
+from typing import Dict, List, Sequence
+
+from spectera_profile import NULL_TIMER, StageTimer
+
+
+# Every distinct key order seen, so records of the same shape share one tuple
+_KEY_ORDERS = {}
+
+# Concrete record classes; membership is much cheaper than isinstance() against an ABC
+RECORD_TYPES = set()
+
+# Longer strings (names) are rarely repeated; interning them would only cost time
+INTERN_MAX_LENGTH = 24
+
+
+class Record(Mapping):
+    """Read-only mapping over slots for FIELDS plus a dict for any other keys"""
+
+    __slots__ = ('_keys', '_extra')
+    FIELDS = ()
+    _getters = {}
+    _setters = {}
+    _order_getters = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        RECORD_TYPES.add(cls)
+        # Slot descriptors called directly: no attribute lookup per field
+        cls._getters = {name: cls.__dict__[name].__get__ for name in cls.FIELDS}
+        cls._setters = {name: cls.__dict__[name].__set__ for name in cls.FIELDS}
+        # id(key order) -> attrgetter over all its keys, for orders made only of this class's
+        # slot fields; reads a whole record in one C call
+        cls._order_getters = {}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Record':
+        record = object.__new__(cls)
+        setters = cls._setters
+        intern = sys.intern
+        extra = None
+        for key, value in data.items():
+            if type(value) is str and len(value) <= INTERN_MAX_LENGTH:
+                value = intern(value)
+            setter = setters.get(key)
+            if setter is not None:
+                setter(record, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        keys = tuple(data)
+        shared = _KEY_ORDERS.setdefault(keys, keys)
+        if extra is None and len(shared) > 1 and id(shared) not in cls._order_getters:
+            cls._order_getters[id(shared)] = attrgetter(*shared)
+        _set_keys(record, shared)
+        _set_extra(record, extra)
+        return record
+
+    def to_dict(self) -> Dict:
+        """Plain dict with the original keys in the original order"""
+        return dict(self.items())
+
+    def replace(self, **changes) -> 'Record':
+        """New record with some fields changed or added; this one is left as it is"""
+        data = self.to_dict()
+        data.update(changes)
+        return self.from_dict(data)
+
+    def __getitem__(self, key):
+        try:
+            return self._getters[key](self)
+        except AttributeError:
+            raise KeyError(key) from None
+        except KeyError:
+            pass
+        extra = self._extra
+        if extra is None:
+            raise KeyError(key)
+        return extra[key]
+
+    def get(self, key, default=None):
+        try:
+            return self._getters[key](self)
+        except (AttributeError, KeyError):
+            pass
+        extra = self._extra
+        return default if extra is None else extra.get(key, default)
+
+    def __contains__(self, key) -> bool:
+        return key in self._keys
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def keys(self):
+        return list(self._keys)
+
+    def items(self):
+        keys = self._keys
+        getter = self._order_getters.get(id(keys))
+        if getter is not None:
+            return list(zip(keys, getter(self)))
+        getters = self._getters
+        extra = self._extra
+        return [(key, getters[key](self) if key in getters else extra[key]) for key in keys]
+
+    def values(self):
+        return [value for _, value in self.items()]
+
+    def __eq__(self, other):
+        # Like dict equality, key order does not matter
+        if isinstance(other, Mapping):
+            return self.to_dict() == (other if type(other) is dict else dict(other.items()))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} records are read-only; use replace()")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} records are read-only; use replace()")
+
+    def __reduce__(self):
+        return type(self).from_dict, (self.to_dict(),)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+_set_keys = Record.__dict__['_keys'].__set__
+_set_extra = Record.__dict__['_extra'].__set__
+
+
+class PairedDevice(Record):
+    FIELDS = ('mtUid', 'type', 'rfChannelId', 'name', 'sleep', 'micAudiolinkId', 'iemAudiolinkId',
+              'headphoneVolume', 'headphoneVolumeMin', 'headphoneVolumeMax', 'headphoneBalance',
+              'micPreampGain', 'micLowCutHz', 'micLineSelection', 'cableEmulation', 'ledBrightness',
+              'micTestToneLevel', 'micTestToneEnabled')
+    __slots__ = FIELDS
+
+
+class Audiolink(Record):
+    FIELDS = ('audiolinkId', 'rfChannelId', 'modeId')
+    __slots__ = FIELDS
+
+
+class AudioInput(Record):
+    FIELDS = ('inputId', 'iemAudiolinkId', 'source', 'name')
+    __slots__ = FIELDS
+
+
+class AudioOutput(Record):
+    FIELDS = ('outputId', 'micAudiolinkId', 'commandModeAudioNetwork', 'commandModeMadi1', 'commandModeMadi2')
+    __slots__ = FIELDS
+
+
+SECTION_TYPES = {
+    'pairedDevices': PairedDevice,
+    'audiolinks': Audiolink,
+    'audioInputs': AudioInput,
+    'audioOutputs': AudioOutput,
+}
+
+
+def compact_records(records: Sequence, record_type: type) -> List:
+    """Compact each dict record; anything else (already compact, or malformed) is kept as is"""
+    from_dict = record_type.from_dict
+    return [from_dict(r) if type(r) is dict else r for r in records]
+
+
+def compact_config(data: Dict, timer: StageTimer = NULL_TIMER) -> Dict:
+    """Config with the record sections held as compact records; other values are shared"""
+    if not isinstance(data, dict):
+        return data
+    with timer.stage('compact') as stage:
+        result = dict(data)
+        count = 0
+        for name, record_type in SECTION_TYPES.items():
+            records = data.get(name)
+            if isinstance(records, list):
+                result[name] = compact_records(records, record_type)
+                count += len(records)
+        stage.objects = count
+    return result
+
+
+def to_plain(value):
+    """JSON encoder hook: a compact record encodes as the dict it came from"""
+    if type(value) in RECORD_TYPES:
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def is_record(value) -> bool:
+    """True for a dict or compact record"""
+    return type(value) is dict or type(value) in RECORD_TYPES
+
@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+"""
+Spectera base station network client
+Pulls configurations from and pushes them to base stations over HTTP, so a
+transfer can run without exporting files by hand:
+
+    python spectera_net.py pull 10.0.0.21 10.0.0.22 -o exports/
+    python spectera_net.py transfer 10.0.0.21 10.0.0.22 10.0.0.23 -o out/
+    python spectera_net.py transfer 10.0.0.21 10.0.0.22 --push
+
+A station is given as host, host:port or a full URL; the config endpoint path
+(--endpoint) is used when the URL has none. Only the standard library is used:
+requests run concurrently on one asyncio event loop over a keep-alive
+connection pool (a few connections per station, reused across requests), each
+attempt has a timeout, and timeouts, dropped connections and 5xx/429 answers are
+retried with exponential backoff. Pushed configs are encoded exactly as
+save_config writes them.
+
+spectera_standin.py serves primary.json-style documents on localhost for
+trying this out without hardware.
+
+Copyright (C) 2024
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Union
+from urllib.parse import urlsplit
+
+import spectera_engine as engine
+from spectera_engine import TransferError
+from spectera_match import POSITION_ONLY, STRATEGIES
+from spectera_profile import NULL_TIMER, StageTimer
+from spectera_writer import iter_config_chunks
+
+
+DEFAULT_ENDPOINT = '/api/config'
+DEFAULT_PORT = 80
+MAX_RESPONSE_BYTES = 256 * 1024 * 1024
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class StationError(OSError):
+    """A base station could not be reached or refused a request"""
+
+    def __init__(self, station: 'Station', message: str, status: Optional[int] = None):
+        super().__init__(f"{station.label}: {message}")
+        self.station = station
+        self.status = status
+
+
+class Station(NamedTuple):
+    scheme: str
+    host: str
+    port: int
+    path: str
+
+    @property
+    def url(self) -> str:
+        return f"{self.scheme}://{self.host}:{self.port}{self.path}"
+
+    @property
+    def label(self) -> str:
+        return f"{self.host}:{self.port}"
+
+    @property
+    def file_stem(self) -> str:
+        return f"{self.host}_{self.port}".replace(':', '_')
+
+
+def parse_station(spec: Union[str, Station], endpoint: str = DEFAULT_ENDPOINT) -> Station:
+    """Station from host, host:port or URL; endpoint is the path when the URL has none"""
+    if isinstance(spec, Station):
+        return spec
+    parts = urlsplit(spec if '://' in spec else f"http://{spec}")
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ValueError(f"Not a base station address: {spec}")
+    port = parts.port or (443 if parts.scheme == 'https' else DEFAULT_PORT)
+    path = parts.path or endpoint
+    if parts.query:
+        path = f"{path}?{parts.query}"
+    return Station(parts.scheme, parts.hostname, port, path)
+
+
+class _Connection:
+    __slots__ = ('reader', 'writer', 'reused')
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.reused = False
+
+    def close(self):
+        self.writer.close()
+
+
+async def _read_response(reader: asyncio.StreamReader):
+    """Read one HTTP/1.1 response; returns (status, headers, body, keep_alive)"""
+    line = await reader.readline()
+    if not line:
+        raise ConnectionResetError("Connection closed before a response")
+    parts = line.decode('latin-1').split(None, 2)
+    if len(parts) < 2 or not parts[0].startswith('HTTP/'):
+        raise ConnectionError(f"Not an HTTP response: {line[:60]!r}")
+    version, status = parts[0], int(parts[1])
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        chunks = []
+        size = 0
+        while True:
+            length = int((await reader.readline()).split(b';')[0], 16)
+            if length == 0:
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass  # Trailers
+                break
+            size += length
+            if size > MAX_RESPONSE_BYTES:
+                raise ConnectionError("Response too large")
+            chunks.append(await reader.readexactly(length))
+            await reader.readexactly(2)
+        body = b''.join(chunks)
+    elif 'content-length' in headers:
+        length = int(headers['content-length'])
+        if length > MAX_RESPONSE_BYTES:
+            raise ConnectionError("Response too large")
+        body = await reader.readexactly(length)
+    elif status in (204, 304) or status < 200:
+        body = b''
+    else:
+        body = await reader.read(MAX_RESPONSE_BYTES)
+        keep_alive = False
+    return status, headers, body, keep_alive
+
+
+class StationClient:
+    """Concurrent HTTP client for base stations with keep-alive pooling, timeouts and retries
+
+    Use as `async with StationClient() as client:`; connections are closed on exit.
+    """
+
+    def __init__(self, endpoint: str = DEFAULT_ENDPOINT, timeout: float = 10.0, retries: int = 2,
+                 backoff: float = 0.25, per_station: int = 2, max_concurrency: int = 16,
+                 headers: Optional[Dict[str, str]] = None):
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.per_station = per_station
+        self.headers = dict(headers or {})
+        self._idle = {}       # (scheme, host, port) -> [_Connection]
+        self._limits = {}     # (scheme, host, port) -> Semaphore
+        self._concurrency = asyncio.Semaphore(max_concurrency)
+        self.connections_opened = 0
+        self.requests = 0
+        self.retried = 0
+
+    async def __aenter__(self) -> 'StationClient':
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+        return False
+
+    async def close(self):
+        idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for conn in connections:
+                conn.close()
+        for connections in idle.values():
+            for conn in connections:
+                try:
+                    await conn.writer.wait_closed()
+                except OSError:
+                    pass
+
+    def station(self, spec: Union[str, Station]) -> Station:
+        return parse_station(spec, self.endpoint)
+
+    async def _connect(self, station: Station) -> _Connection:
+        ssl = None
+        if station.scheme == 'https':
+            import ssl as ssl_module
+            ssl = ssl_module.create_default_context()
+        reader, writer = await asyncio.open_connection(station.host, station.port, ssl=ssl)
+        self.connections_opened += 1
+        return _Connection(reader, writer)
+
+    async def _exchange(self, station: Station, method: str, body: Optional[bytes]):
+        key = (station.scheme, station.host, station.port)
+        idle = self._idle.setdefault(key, [])
+        # A pooled connection the station has since closed fails on first use; retry that once
+        # on a fresh connection without counting it as a retry
+        while True:
+            conn = None
+            while idle and conn is None:
+                conn = idle.pop()
+                if conn.reader.at_eof() or conn.writer.is_closing():
+                    conn.close()
+                    conn = None
+                else:
+                    conn.reused = True
+            if conn is None:
+                conn = await self._connect(station)
+
+            head = [f"{method} {station.path} HTTP/1.1", f"Host: {station.host}:{station.port}",
+                    "User-Agent: spectera-editor", "Accept: application/json", "Connection: keep-alive"]
+            head.extend(f"{name}: {value}" for name, value in self.headers.items())
+            if body is not None:
+                head.extend(("Content-Type: application/json", f"Content-Length: {len(body)}"))
+            try:
+                conn.writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1'))
+                if body:
+                    conn.writer.write(body)
+                await conn.writer.drain()
+                status, headers, data, keep_alive = await _read_response(conn.reader)
+            except (ConnectionError, asyncio.IncompleteReadError) as e:
+                conn.close()
+                if conn.reused:
+                    continue
+                raise ConnectionError(str(e) or "Connection closed mid-response") from e
+            except BaseException:
+                conn.close()
+                raise
+            if keep_alive:
+                idle.append(conn)
+            else:
+                conn.close()
+            return status, headers, data
+
+    async def request(self, station: Union[str, Station], method: str = 'GET',
+                      body: Optional[bytes] = None) -> bytes:
+        """Send one request and return the response body, retrying transient failures"""
+        station = self.station(station)
+        key = (station.scheme, station.host, station.port)
+        limit = self._limits.setdefault(key, asyncio.Semaphore(self.per_station))
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.retried += 1
+                await asyncio.sleep(self.backoff * (2 ** (attempt - 1)))
+            try:
+                async with self._concurrency, limit:
+                    self.requests += 1
+                    status, _, data = await asyncio.wait_for(self._exchange(station, method, body), self.timeout)
+            except asyncio.TimeoutError:
+                error = StationError(station, f"No response within {self.timeout:g}s")
+                continue
+            except (OSError, ValueError) as e:
+                error = StationError(station, f"Connection failed: {e}")
+                continue
+            if 200 <= status < 300:
+                return data
+            message = data[:200].decode('utf-8', 'replace').strip()
+            error = StationError(station, f"{method} {station.path} returned HTTP {status}"
+                                          + (f": {message}" if message else ""), status)
+            if status not in RETRY_STATUSES:
+                break
+        raise error
+
+    async def pull(self, station: Union[str, Station], timer: StageTimer = NULL_TIMER) -> Dict:
+        """Download and parse a station's configuration"""
+        with timer.stage('fetch') as stage:
+            raw = await self.request(station)
+            stage.objects = len(raw)
+        try:
+            return engine.parse_config(raw, timer)
+        except ValueError as e:
+            raise StationError(self.station(station), f"Invalid configuration: {e}") from e
+
+    async def push(self, station: Union[str, Station], data: Dict, timer: StageTimer = NULL_TIMER):
+        """Upload a configuration, encoded exactly as save_config writes it"""
+        with timer.stage('encode'):
+            body = b''.join(iter_config_chunks(data))
+        with timer.stage('push') as stage:
+            await self.request(station, 'PUT', body)
+            stage.objects = len(body)
+
+    async def pull_many(self, stations: Iterable[Union[str, Station]],
+                        timer: StageTimer = NULL_TIMER) -> List[Union[Dict, StationError]]:
+        """Pull several stations concurrently; a failed station's entry is its StationError"""
+        results = await asyncio.gather(*(self.pull(station, timer) for station in stations),
+                                       return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException) and not isinstance(result, StationError):
+                raise result
+        return results
+
+
+async def transfer_stations(client: StationClient, source: Union[str, Station],
+                            targets: Sequence[Union[str, Station]],
+                            selection: Union[str, List, None] = "all",
+                            strategies: Iterable[str] = STRATEGIES,
+                            output_dir: Optional[str] = None, push: bool = False,
+                            timer: StageTimer = NULL_TIMER) -> List[Dict]:
+    """Pull a source and its targets concurrently, transfer onto each target, then save and/or push
+
+    Returns one summary per target in order; a failing target does not stop the others.
+    """
+    source = client.station(source)
+    targets = [client.station(target) for target in targets]
+    pulled = await client.pull_many([source] + targets, timer)
+    if isinstance(pulled[0], StationError):
+        raise pulled[0]
+
+    source_data = pulled[0]
+    selected_devices = engine.select_devices(source_data, selection)
+    if not selected_devices:
+        raise TransferError("No Selection", "Please select at least one device to transfer.")
+    with timer.stage('index', objects=len(source_data.get('audiolinks', []))):
+        source_index = engine.RoutingIndex(source_data)
+
+    async def finish(target: Station, target_data) -> Dict:
+        start = time.perf_counter()
+        try:
+            if isinstance(target_data, StationError):
+                raise target_data
+            result = engine.generate_transfer(source_data, target_data, selected_devices, source_index,
+                                              strategies=strategies, timer=timer)
+            output = None
+            if output_dir:
+                output = os.path.join(output_dir, f"{target.file_stem}_transfer.json")
+                engine.save_config(result.output_data, output, timer=timer)
+            if push:
+                await client.push(target, result.output_data, timer)
+            summary = engine.transfer_summary(result, target.url, output)
+            summary.update(status='ok', pushed=push)
+        except TransferError as e:
+            summary = {'status': 'error', 'error': f"{e.title}: {e.message}"}
+        except (OSError, ValueError) as e:
+            summary = {'status': 'error', 'error': str(e)}
+        summary.update(target=target.url, seconds=round(time.perf_counter() - start, 4))
+        return summary
+
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    return list(await asyncio.gather(*(finish(t, d) for t, d in zip(targets, pulled[1:]))))
+
+
+def _client(args) -> StationClient:
+    return StationClient(args.endpoint, args.timeout, args.retries, per_station=args.connections)
+
+
+async def _pull_command(args) -> int:
+    os.makedirs(args.output_dir, exist_ok=True)
+    failed = 0
+    async with _client(args) as client:
+        stations = [client.station(spec) for spec in args.stations]
+        for station, data in zip(stations, await client.pull_many(stations)):
+            if isinstance(data, StationError):
+                print(f"[error] {data}")
+                failed += 1
+                continue
+            path = os.path.join(args.output_dir, f"{station.file_stem}.json")
+            engine.save_config(data, path)
+            print(f"[ok]    {station.label}: {len(data.get('pairedDevices', []))} devices -> {path}")
+    return 1 if failed else 0
+
+
+async def _push_command(args) -> int:
+    data = engine.load_config(args.file)
+    failed = 0
+    async with _client(args) as client:
+        stations = [client.station(spec) for spec in args.stations]
+        results = await asyncio.gather(*(client.push(station, data) for station in stations),
+                                       return_exceptions=True)
+        for station, error in zip(stations, results):
+            if isinstance(error, StationError):
+                print(f"[error] {error}")
+                failed += 1
+            elif isinstance(error, BaseException):
+                raise error
+            else:
+                print(f"[ok]    {station.label}: pushed {args.file}")
+    return 1 if failed else 0
+
+
+async def _transfer_command(args) -> int:
+    if not args.output_dir and not args.push:
+        print("Give --output-dir, --push or both", file=sys.stderr)
+        return 2
+    selection = engine.parse_selection(args.select)
+    strategies = POSITION_ONLY if args.match == 'position' else STRATEGIES
+    timer = StageTimer('net_transfer', source=args.source) if args.timings else NULL_TIMER
+    async with _client(args) as client:
+        results = await transfer_stations(client, args.source, args.targets, selection, strategies,
+                                          args.output_dir, args.push, timer)
+        connections = client.connections_opened
+    for r in results:
+        if r['status'] == 'ok':
+            where = ", ".join(p for p in (r['output'], "pushed" if r['pushed'] else None) if p)
+            print(f"[ok]    {r['target']}: {r['description']} ({where})")
+        else:
+            print(f"[error] {r['target']}: {r['error']}")
+    if timer.enabled:
+        print(f"timings: {timer.summary()}; {connections} connection(s)")
+    return 0 if all(r['status'] == 'ok' for r in results) else 1
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Pull configs from and push them to Spectera base stations")
+    parser.add_argument('--endpoint', default=DEFAULT_ENDPOINT,
+                        help=f"Config path on the base station (default: {DEFAULT_ENDPOINT})")
+    parser.add_argument('--timeout', type=float, default=10.0, help="Seconds per request attempt (default: 10)")
+    parser.add_argument('--retries', type=int, default=2, help="Retries after a failed attempt (default: 2)")
+    parser.add_argument('--connections', type=int, default=2,
+                        help="Keep-alive connections per base station (default: 2)")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    pull = sub.add_parser('pull', help="Download configs to files")
+    pull.add_argument('stations', nargs='+', help="host, host:port or URL")
+    pull.add_argument('-o', '--output-dir', default='.', help="Directory for <host>_<port>.json files")
+
+    push = sub.add_parser('push', help="Upload one config file to base stations")
+    push.add_argument('file')
+    push.add_argument('stations', nargs='+')
+
+    transfer = sub.add_parser('transfer', help="Pull a source and targets and transfer onto each target")
+    transfer.add_argument('source')
+    transfer.add_argument('targets', nargs='+')
+    transfer.add_argument('-o', '--output-dir', help="Save outputs as <host>_<port>_transfer.json here")
+    transfer.add_argument('--push', action='store_true', help="Upload each output to its target")
+    transfer.add_argument('-s', '--select', nargs='+', metavar='DEVICE',
+                          help="Device UIDs and/or names to transfer (default: all)")
+    transfer.add_argument('--match', choices=('auto', 'position'), default='auto',
+                          help="Match devices by name, type and slot (auto) or by position only")
+    transfer.add_argument('--timings', action='store_true', help="Print per-stage timings")
+
+    args = parser.parse_args(argv)
+    command = {'pull': _pull_command, 'push': _push_command, 'transfer': _transfer_command}[args.command]
+    try:
+        return asyncio.run(command(args))
+    except TransferError as e:
+        print(f"{e.title}: {e.message}", file=sys.stderr)
+        return 2
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
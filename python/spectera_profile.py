@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Spectera stage timing and profiling
+Lightweight per-stage timers for the transfer pipeline (read, parse, index,
+device list, UID mapping, routing clone, write, fsync), a JSON-lines log
+of finished runs, and an opt-in cProfile/tracemalloc report for a single run.
+
+Pass NULL_TIMER (the default everywhere) to switch timing off; its stages are
+shared no-op objects, so instrumented code costs a method call per stage.
+
+Copyright (C) 2024
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+
+def default_log_dir() -> str:
+    """Directory for the timing log and profile reports (SPECTERA_LOG_DIR overrides)"""
+    return os.environ.get('SPECTERA_LOG_DIR') or os.path.join(os.path.expanduser('~'), '.spectera_editor')
+
+
+class _Stage:
+    __slots__ = ('timer', 'name', 'objects', 'start')
+
+    def __init__(self, timer: 'StageTimer', name: str, objects: Optional[int]):
+        self.timer = timer
+        self.name = name
+        self.objects = objects
+        self.start = 0.0
+
+    def __enter__(self) -> '_Stage':
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.timer.add(self.name, time.perf_counter() - self.start, self.objects)
+        return False
+
+
+class _NullStage:
+    __slots__ = ('objects',)
+
+    def __enter__(self) -> '_NullStage':
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class StageTimer:
+    """Collects (stage, seconds, objects) for one operation, e.g. loading a file or a transfer"""
+
+    enabled = True
+
+    def __init__(self, operation: str, **details):
+        self.operation = operation
+        self.details = details
+        self.started = datetime.now()
+        self.stages = []  # [{'stage', 'seconds', 'objects'}]
+        self._lock = threading.Lock()
+
+    def stage(self, name: str, objects: Optional[int] = None) -> _Stage:
+        """Context manager timing one stage; set .objects inside the block if the count is known late"""
+        return _Stage(self, name, objects)
+
+    def add(self, name: str, seconds: float, objects: Optional[int] = None):
+        with self._lock:
+            self.stages.append({'stage': name, 'seconds': seconds, 'objects': objects})
+
+    @property
+    def total(self) -> float:
+        return sum(s['seconds'] for s in self.stages)
+
+    def summary(self, limit: int = 6) -> str:
+        """Compact one-line breakdown for the status bar, slowest stages first"""
+        parts = []
+        for s in sorted(self.stages, key=lambda s: s['seconds'], reverse=True)[:limit]:
+            count = f" ({s['objects']})" if s['objects'] is not None else ""
+            parts.append(f"{s['stage']} {s['seconds'] * 1000:.0f} ms{count}")
+        return f"{self.total * 1000:.0f} ms: " + ", ".join(parts)
+
+    def to_record(self) -> Dict:
+        return {
+            'operation': self.operation,
+            'started': self.started.isoformat(timespec='milliseconds'),
+            'total_seconds': round(self.total, 6),
+            'stages': [dict(s, seconds=round(s['seconds'], 6)) for s in self.stages],
+            **self.details,
+        }
+
+    def write_log(self, path: Optional[str] = None) -> Optional[str]:
+        """Append this run as one JSON line; logging problems never interrupt the caller"""
+        path = path or os.path.join(default_log_dir(), 'timings.jsonl')
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'a') as f:
+                f.write(json.dumps(self.to_record()) + '\n')
+        except OSError:
+            return None
+        return path
+
+
+class NullTimer(StageTimer):
+    """Timer that records nothing"""
+
+    enabled = False
+    _stage = _NullStage()
+
+    def __init__(self):
+        self.operation = ''
+        self.details = {}
+        self.started = None
+        self.stages = []
+
+    def stage(self, name: str, objects: Optional[int] = None) -> _NullStage:
+        return self._stage
+
+    def add(self, name: str, seconds: float, objects: Optional[int] = None):
+        pass
+
+    def summary(self, limit: int = 6) -> str:
+        return ""
+
+    def write_log(self, path: Optional[str] = None) -> Optional[str]:
+        return None
+
+
+NULL_TIMER = NullTimer()
+
+
+class RunProfiler:
+    """Profile one block with cProfile and tracemalloc and append a text report to path
+
+    cProfile only sees the thread that enters the block, so use it inside the worker
+    that does the work.
+    """
+
+    def __init__(self, path: str, title: str, top: int = 30):
+        self.path = path
+        self.title = title
+        self.top = top
+        self._profile = None
+        self._started_tracemalloc = False
+
+    @staticmethod
+    def new_report_path() -> str:
+        return os.path.join(default_log_dir(), f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
+
+    def __enter__(self) -> 'RunProfiler':
+        # Imported here so timing-only and headless use never loads the profilers
+        import cProfile
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        import io
+        import pstats
+        import tracemalloc
+        self._profile.disable()
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+
+        out = io.StringIO()
+        out.write(f"=== {self.title} ({datetime.now().isoformat(timespec='seconds')}) ===\n")
+        out.write(f"tracemalloc: current {current / 1e6:.2f} MB, peak {peak / 1e6:.2f} MB\n\n")
+        pstats.Stats(self._profile, stream=out).sort_stats('cumulative').print_stats(self.top)
+        out.write("Top allocations by line:\n")
+        for stat in snapshot.statistics('lineno')[:self.top]:
+            out.write(f"  {stat}\n")
+        out.write("\n")
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'a') as f:
+                f.write(out.getvalue())
+        except OSError:
+            pass
+        return False
+
+
+def profile_if(path: Optional[str], title: str):
+    """RunProfiler when a report path is given, otherwise a no-op context manager"""
+    return RunProfiler(path, title) if path else _NullStage()
+
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Spectera stand-in base station
+A local HTTP server that behaves like a base station's config endpoint, for
+exercising spectera_net without hardware. GET on the endpoint returns the
+current document; PUT replaces it (it must be a JSON object). Connections are
+kept alive as a base station's would be, and latency and transient failures can
+be simulated.
+
+    python spectera_standin.py primary.json editortest.json --port 8080
+
+serves each file as its own station on consecutive ports (8080, 8081, ...).
+
+Copyright (C) 2024
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+from spectera_net import DEFAULT_ENDPOINT
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive
+    server_version = 'SpecteraStandIn'
+
+    def setup(self):
+        super().setup()
+        with self.server.station.lock:
+            self.server.station.connections += 1
+
+    def log_message(self, format, *args):
+        if self.server.station.verbose:
+            super().log_message(format, *args)
+
+    def _reply(self, status: int, body: bytes = b'', content_type: str = 'application/json'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _begin(self) -> bool:
+        """Count the request and apply simulated latency and failures; False when already answered"""
+        station = self.server.station
+        with station.lock:
+            station.requests += 1
+            failing = station.fail > 0
+            if failing:
+                station.fail -= 1
+        if station.delay:
+            time.sleep(station.delay)
+        if self.path.split('?')[0] != station.endpoint:
+            self._reply(404, b'Not found', 'text/plain')
+            return False
+        if failing:
+            self._reply(503, b'Busy', 'text/plain')
+            return False
+        return True
+
+    def do_GET(self):
+        if self._begin():
+            self._reply(200, self.server.station.document)
+
+    def do_PUT(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        if not self._begin():
+            return
+        try:
+            valid = isinstance(json.loads(body), dict)
+        except ValueError:
+            valid = False
+        if not valid:
+            self._reply(400, b'Expected a JSON object', 'text/plain')
+            return
+        station = self.server.station
+        with station.lock:
+            station.document = body
+            station.pushes += 1
+        self._reply(204)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that time out hang up mid-reply; that is expected here
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StandInStation:
+    """One simulated base station on localhost; use as a context manager or start()/stop()
+
+    port 0 picks a free port. delay adds seconds of latency per request; the first
+    `fail` requests are answered with 503 to exercise retries.
+    """
+
+    def __init__(self, document: bytes, endpoint: str = DEFAULT_ENDPOINT, host: str = '127.0.0.1',
+                 port: int = 0, delay: float = 0.0, fail: int = 0, verbose: bool = False):
+        self.document = document
+        self.endpoint = endpoint
+        self.delay = delay
+        self.fail = fail
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.pushes = 0
+        self._server = _Server((host, port), _Handler)
+        self._server.station = self
+        self._thread = None
+
+    @classmethod
+    def from_file(cls, path: str, **options) -> 'StandInStation':
+        with open(path, 'rb') as f:
+            return cls(f.read(), **options)
+
+    @property
+    def address(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"{host}:{port}"
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.address}{self.endpoint}"
+
+    def start(self) -> 'StandInStation':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'StandInStation':
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        return False
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve config files as stand-in Spectera base stations")
+    parser.add_argument('files', nargs='+', help="Configs to serve, one station each")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080, help="Port of the first station (default: 8080)")
+    parser.add_argument('--endpoint', default=DEFAULT_ENDPOINT, help=f"Config path (default: {DEFAULT_ENDPOINT})")
+    parser.add_argument('--delay', type=float, default=0.0, help="Simulated latency per request in seconds")
+    parser.add_argument('--fail', type=int, default=0, help="Answer the first N requests per station with 503")
+    parser.add_argument('-v', '--verbose', action='store_true', help="Log every request")
+    args = parser.parse_args(argv)
+
+    stations = []
+    try:
+        for offset, path in enumerate(args.files):
+            station = StandInStation.from_file(path, endpoint=args.endpoint, host=args.host,
+                                               port=args.port + offset, delay=args.delay, fail=args.fail,
+                                               verbose=args.verbose)
+            stations.append(station.start())
+            print(f"{station.url}  <- {path}")
+    except OSError as e:
+        print(f"Cannot start stand-in station: {e}", file=sys.stderr)
+        for station in stations:
+            station.stop()
+        return 2
+
+    print("Serving; Ctrl+C to stop")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    for station in stations:
+        station.stop()
+        print(f"{station.address}: {station.requests} request(s) on {station.connections} connection(s), "
+              f"{station.pushes} push(es)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
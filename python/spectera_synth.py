@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Spectera synthetic configs
+Generates Spectera-shaped base station configs of any size for benchmarks and
+load testing. Every device's audiolink IDs, and every input's and output's
+audiolink ID, point at audiolinks that exist in the same config.
+
+    python spectera_synth.py --devices 5000 source.json --target target.json
+
+Copyright (C) 2024
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+"""
+
+import argparse
+import json
+import random
+from typing import Dict, List, Optional
+
+
+DEVICE_TYPES = ('SEK',)
+INPUT_SOURCES = ('madi1', 'madi2', 'dante')
+NAMES = ('Ed', 'Brad', 'Rob', 'Matt', 'Jason', 'Harvey', 'Gwen', 'Dani', 'Lauren', 'Beau',
+         'Philip', 'Drew', 'Chris', 'Brent', 'Nate', 'Spare', 'Guest')
+
+
+def make_device(uid: int, name: str, device_type: str, rf_channel: int,
+                iem_link: int = -1, mic_link: int = -1, rng: Optional[random.Random] = None) -> Dict:
+    """Build one pairedDevices record with the same keys and key order as a base station export"""
+    rng = rng or random.Random(uid)
+    return {
+        'mtUid': uid,
+        'type': device_type,
+        'rfChannelId': rf_channel,
+        'name': name,
+        'sleep': False,
+        'micAudiolinkId': mic_link,
+        'iemAudiolinkId': iem_link,
+        'headphoneVolume': rng.choice((-60, -30, -19, -10, 0)),
+        'headphoneVolumeMin': -60,
+        'headphoneVolumeMax': rng.choice((12, 27.5)),
+        'headphoneBalance': 0,
+        'micPreampGain': 12,
+        'micLowCutHz': 20,
+        'micLineSelection': 'Auto',
+        'cableEmulation': 'Off',
+        'ledBrightness': 'Standard',
+        'micTestToneLevel': -60,
+        'micTestToneEnabled': False,
+    }
+
+
+def generate_config(devices: int, inputs_per_link: int = 2, outputs_per_link: int = 2,
+                    mic_fraction: float = 0.25, rf_channels: int = 2,
+                    device_types=DEVICE_TYPES, uid_base: int = 16780000, seed: int = 0) -> Dict:
+    """Generate a config with one IEM audiolink per device, plus a mic link for mic_fraction of them
+
+    Inputs reference IEM links and outputs reference mic links (or -1, like unused
+    outputs in real exports); inputId/outputId values are unique within the config.
+    """
+    rng = random.Random(seed)
+    config = {'audiolinks': [], 'audioInputs': [], 'audioOutputs': [], 'pairedDevices': []}
+    next_link = 0
+    for i in range(devices):
+        rf = rng.randrange(rf_channels)
+        iem_link = next_link
+        next_link += 1
+        config['audiolinks'].append({'audiolinkId': iem_link, 'rfChannelId': rf, 'modeId': rng.choice((6, 7, 8))})
+        mic_link = -1
+        if rng.random() < mic_fraction:
+            mic_link = next_link
+            next_link += 1
+            config['audiolinks'].append({'audiolinkId': mic_link, 'rfChannelId': rf, 'modeId': rng.choice((6, 7, 8))})
+
+        for _ in range(inputs_per_link):
+            config['audioInputs'].append({
+                'inputId': len(config['audioInputs']),
+                'iemAudiolinkId': iem_link,
+                'source': rng.choice(INPUT_SOURCES),
+                'name': '',
+            })
+        for _ in range(outputs_per_link):
+            config['audioOutputs'].append({
+                'outputId': len(config['audioOutputs']),
+                'micAudiolinkId': mic_link,
+                'commandModeAudioNetwork': 'On',
+                'commandModeMadi1': 'On',
+                'commandModeMadi2': 'On',
+            })
+
+        name = f"{NAMES[i % len(NAMES)]} {i // len(NAMES)}" if devices > len(NAMES) else NAMES[i]
+        config['pairedDevices'].append(make_device(
+            uid_base + i, name, device_types[i % len(device_types)], rf, iem_link, mic_link, rng
+        ))
+    return config
+
+
+def repaired_target(source: Dict, uid_base: int = 26780000, shuffle: bool = False,
+                    keep_names: bool = True, seed: int = 1) -> Dict:
+    """Derive the config a backup base station would export after re-pairing source's devices
+
+    Devices get new UIDs and default settings; the target's own routing is a copy of
+    the source's link/input/output IDs with default values.
+    """
+    rng = random.Random(seed)
+    devices = list(source.get('pairedDevices', []))
+    if shuffle:
+        rng.shuffle(devices)
+    return {
+        'audiolinks': [dict(link) for link in source.get('audiolinks', [])],
+        'audioInputs': [dict(inp, source='madi1') for inp in source.get('audioInputs', [])],
+        'audioOutputs': [dict(out) for out in source.get('audioOutputs', [])],
+        'pairedDevices': [
+            make_device(uid_base + i, d.get('name', '') if keep_names else '', d.get('type', 'SEK'),
+                        d.get('rfChannelId', 0), d.get('iemAudiolinkId', -1), d.get('micAudiolinkId', -1), rng)
+            for i, d in enumerate(devices)
+        ],
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Generate synthetic Spectera base station configs")
+    parser.add_argument('output', help="Path for the generated source config")
+    parser.add_argument('--devices', type=int, default=1000)
+    parser.add_argument('--inputs-per-link', type=int, default=2)
+    parser.add_argument('--outputs-per-link', type=int, default=2)
+    parser.add_argument('--mic-fraction', type=float, default=0.25)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--target', help="Also write a matching re-paired target config here")
+    parser.add_argument('--shuffle', action='store_true', help="Pair the target's devices in a different order")
+    args = parser.parse_args(argv)
+
+    source = generate_config(args.devices, args.inputs_per_link, args.outputs_per_link,
+                             args.mic_fraction, seed=args.seed)
+    with open(args.output, 'w') as f:
+        json.dump(source, f, separators=(',', ':'))
+    if args.target:
+        with open(args.target, 'w') as f:
+            json.dump(repaired_target(source, shuffle=args.shuffle, seed=args.seed + 1), f, separators=(',', ':'))
+
+
+if __name__ == "__main__":
+    main()
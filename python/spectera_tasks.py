@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Spectera background tasks
+Runs slow work (file loading, transfers, saving) off the GUI thread and hands
+progress and results back through a thread-safe queue.
+
+Copyright (C) 2024
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+"""
+
+import itertools
+import queue
+import threading
+from typing import Callable, Optional
+
+
+class TaskCancelled(Exception):
+    """Raised inside a task when the user has cancelled it"""
+
+
+class TaskContext:
+    """Handle passed to a running task for progress reports and cancellation checks"""
+
+    def __init__(self, task_id: int, messages: queue.Queue, cancel_event: threading.Event):
+        self.task_id = task_id
+        self._messages = messages
+        self._cancel_event = cancel_event
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def check(self):
+        """Raise TaskCancelled if the task has been cancelled"""
+        if self._cancel_event.is_set():
+            raise TaskCancelled()
+
+    def report(self, stage: str, fraction: Optional[float] = None):
+        """Report the current stage (and optionally 0..1 progress); also a cancellation point"""
+        self.check()
+        self._messages.put(('progress', self.task_id, stage, fraction))
+
+
+class BackgroundTasks:
+    """Runs one task at a time on a worker thread
+
+    Workers only ever put messages on a queue; ``poll`` must be called from the GUI
+    thread (e.g. from ``root.after``) and is the only place callbacks run.
+    Cancelling detaches the task immediately: the GUI is released straight away and
+    anything the worker produces afterwards is discarded. The worker itself only stops
+    at its next cancellation point, so tasks with side effects (e.g. replacing a file)
+    must check the context before committing them.
+    """
+
+    def __init__(self):
+        self.messages = queue.Queue()
+        self._ids = itertools.count(1)
+        self._current = None  # (task_id, cancel_event, on_done, on_error)
+
+    @property
+    def busy(self) -> bool:
+        return self._current is not None
+
+    def start(self, func: Callable, *args, on_done: Optional[Callable] = None,
+              on_error: Optional[Callable] = None) -> int:
+        """Run func(context, *args) on a worker thread"""
+        if self._current is not None:
+            raise RuntimeError("A background task is already running")
+        task_id = next(self._ids)
+        cancel_event = threading.Event()
+        self._current = (task_id, cancel_event, on_done, on_error)
+        context = TaskContext(task_id, self.messages, cancel_event)
+
+        def worker():
+            try:
+                result = func(context, *args)
+            except TaskCancelled:
+                self.messages.put(('cancelled', task_id, None, None))
+            except Exception as e:
+                self.messages.put(('error', task_id, e, None))
+            else:
+                self.messages.put(('done', task_id, result, None))
+
+        threading.Thread(target=worker, name=f"spectera-task-{task_id}", daemon=True).start()
+        return task_id
+
+    def cancel(self) -> bool:
+        """Cancel the running task; returns False if nothing was running"""
+        if self._current is None:
+            return False
+        self._current[1].set()
+        self._current = None
+        return True
+
+    def poll(self, on_progress: Optional[Callable] = None):
+        """Dispatch queued messages for the current task on the calling thread"""
+        while True:
+            try:
+                kind, task_id, payload, fraction = self.messages.get_nowait()
+            except queue.Empty:
+                return
+            if self._current is None or self._current[0] != task_id:
+                continue  # Stale message from a cancelled task
+            if kind == 'progress':
+                if on_progress:
+                    on_progress(payload, fraction)
+                continue
+            _, _, on_done, on_error = self._current
+            self._current = None
+            if kind == 'done' and on_done:
+                on_done(payload)
+            elif kind == 'error' and on_error:
+                on_error(payload)
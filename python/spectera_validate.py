@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Spectera config validation
+Checks a config's referential integrity before it is used or written:
+
+    duplicate_id          two audiolinks, devices, inputs or outputs share an ID
+    missing_id            a record has no ID
+    missing_audiolink     a device's iemAudiolinkId/micAudiolinkId, an input's
+                          iemAudiolinkId or an output's micAudiolinkId names no audiolink
+    invalid_reference     a link reference is not an integer
+    rf_channel_mismatch   a device's rfChannelId differs from its audiolink's (warning)
+    section_type          a section is not a list, or a record not an object
+
+Each section is read once; audiolinks are indexed first so references can be
+checked as the other sections stream past. Violations carry a JSON path such as
+$.pairedDevices[3].iemAudiolinkId.
+
+    python spectera_validate.py primary.json output.json
+
+Copyright (C) 2024
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+"""
+
+import json
+import sys
+from typing import Dict, List, NamedTuple, Optional
+
+from spectera_model import RECORD_TYPES
+
+
+class Violation(NamedTuple):
+    path: str
+    code: str
+    message: str
+    severity: str = 'error'  # 'error' or 'warning'
+
+
+# (section, ID key, link reference keys)
+SECTIONS = (
+    ('audiolinks', 'audiolinkId', ()),
+    ('pairedDevices', 'mtUid', ('iemAudiolinkId', 'micAudiolinkId')),
+    ('audioInputs', 'inputId', ('iemAudiolinkId',)),
+    ('audioOutputs', 'outputId', ('micAudiolinkId',)),
+)
+
+
+class ValidationReport:
+    """Violations found in one config"""
+
+    def __init__(self, violations: Optional[List[Violation]] = None):
+        self.violations = violations or []
+
+    @property
+    def errors(self) -> List[Violation]:
+        return [v for v in self.violations if v.severity == 'error']
+
+    @property
+    def warnings(self) -> List[Violation]:
+        return [v for v in self.violations if v.severity == 'warning']
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def by_code(self) -> Dict[str, int]:
+        counts = {}
+        for v in self.violations:
+            counts[v.code] = counts.get(v.code, 0) + 1
+        return counts
+
+    def summary(self) -> str:
+        """One line for status bars and logs"""
+        if not self.violations:
+            return "no integrity problems"
+        return ", ".join(f"{count} {code.replace('_', ' ')}" for code, count in sorted(self.by_code().items()))
+
+    def describe(self, limit: int = 10) -> str:
+        """Multi-line listing of the first violations, for dialogs and the command line"""
+        lines = [f"{v.path}: {v.message}" for v in self.violations[:limit]]
+        if len(self.violations) > limit:
+            lines.append(f"... and {len(self.violations) - limit} more")
+        return "\n".join(lines)
+
+    def to_dict(self, limit: Optional[int] = 100) -> Dict:
+        listed = self.violations if limit is None else self.violations[:limit]
+        return {
+            'errors': len(self.errors),
+            'warnings': len(self.warnings),
+            'by_code': self.by_code(),
+            'violations': [v._asdict() for v in listed],
+        }
+
+
+def validate_config(data: Dict) -> ValidationReport:
+    """Check a config's IDs and audiolink references in one pass over each section"""
+    violations = []
+    if not isinstance(data, dict):
+        return ValidationReport([Violation('$', 'section_type', "Config is not a JSON object")])
+
+    links = {}  # audiolinkId -> rfChannelId
+    add = violations.append
+    for section, id_key, ref_keys in SECTIONS:
+        records = data.get(section, [])
+        if not isinstance(records, list):
+            add(Violation(f"$.{section}", 'section_type', f"{section} is not a list"))
+            continue
+
+        is_links = section == 'audiolinks'
+        check_rf = section == 'pairedDevices'
+        first_seen = {}
+        for pos, record in enumerate(records):
+            if type(record) is not dict and type(record) not in RECORD_TYPES:
+                add(Violation(f"$.{section}[{pos}]", 'section_type', "Record is not an object"))
+                continue
+
+            record_id = record.get(id_key)
+            if record_id is None or isinstance(record_id, (list, dict)):
+                add(Violation(f"$.{section}[{pos}]", 'missing_id', f"No valid {id_key}"))
+            elif record_id in first_seen:
+                add(Violation(
+                    f"$.{section}[{pos}].{id_key}", 'duplicate_id',
+                    f"{id_key} {record_id} is already used by $.{section}[{first_seen[record_id]}]"
+                ))
+            else:
+                first_seen[record_id] = pos
+                if is_links:
+                    links[record_id] = record.get('rfChannelId')
+
+            for ref_key in ref_keys:
+                link_id = record.get(ref_key, -1)
+                # Fast path: a valid reference (paths are only built for violations)
+                if type(link_id) is int and link_id in links:
+                    rf = links[link_id]
+                    if check_rf and rf is not None and record.get('rfChannelId', rf) != rf:
+                        add(Violation(
+                            f"$.{section}[{pos}].rfChannelId", 'rf_channel_mismatch',
+                            f"rfChannelId {record['rfChannelId']} differs from audiolink {link_id} "
+                            f"(rfChannelId {rf})",
+                            'warning'
+                        ))
+                elif link_id == -1:
+                    continue
+                elif type(link_id) is not int or link_id < 0:
+                    add(Violation(
+                        f"$.{section}[{pos}].{ref_key}", 'invalid_reference',
+                        f"{ref_key} {link_id!r} is not an audiolink ID or -1"
+                    ))
+                else:
+                    add(Violation(
+                        f"$.{section}[{pos}].{ref_key}", 'missing_audiolink',
+                        f"{ref_key} {link_id} does not exist in audiolinks"
+                    ))
+    return ValidationReport(violations)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse  # Only the command line needs it; the engine imports this module
+    parser = argparse.ArgumentParser(description="Check Spectera configs for broken references and duplicate IDs")
+    parser.add_argument('files', nargs='+', help="Configs to check")
+    parser.add_argument('--limit', type=int, default=20, help="Violations to list per file (default: 20)")
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for path in args.files:
+        try:
+            with open(path, 'rb') as f:
+                report = validate_config(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"ERROR     {path}: {e}")
+            failed += 1
+            continue
+        status = "OK" if report.ok else "INVALID"
+        print(f"{status:<9} {path}: {report.summary()}")
+        if report.violations:
+            for line in report.describe(args.limit).splitlines():
+                print(f"          {line}")
+        failed += not report.ok
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
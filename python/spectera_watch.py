@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Spectera Watch Mode
+Keeps transfer outputs up to date while base station exports land in a shared
+folder. The jobs come from a batch manifest (see spectera_batch); whenever a
+source or target export changes, only the jobs that use it are re-run.
+
+    python spectera_watch.py tour_manifest.json --output-dir out/
+
+A job's source or target may be a glob pattern such as "exports/rigA_*.json",
+which watches the folder: the newest matching file is used, and a new export
+dropped (or renamed) into the folder that becomes the newest match re-runs the
+job once it has settled. Jobs with a pattern target need an explicit output.
+
+Files are polled by stat. A file whose size or mtime changed is left alone until
+it has been quiet for the debounce period (so half-copied exports are not read),
+then it goes through the config cache: a file that was only touched or rewritten
+with the same bytes is recognised by its content hash and triggers nothing, and
+parsed configs and indexes are reused across runs. Outputs are written
+atomically. Editing the manifest re-runs the jobs that were added or changed.
+
+Copyright (C) 2024
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+"""
+
+import argparse
+import glob
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Container, Dict, List, Optional, Tuple
+
+import spectera_engine as engine
+from spectera_batch import load_manifest
+from spectera_cache import ConfigCache
+from spectera_engine import TransferError
+from spectera_match import POSITION_ONLY, STRATEGIES, DeviceMatcher
+from spectera_profile import NULL_TIMER, StageTimer
+
+
+def _stat_key(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def _is_pattern(path: str) -> bool:
+    return any(c in path for c in '*?[')
+
+
+def _newest_match(pattern: str, exclude: Container[str] = ()) -> Optional[str]:
+    """Most recently modified file matching pattern (ties go to the later name), skipping the absolute paths in exclude"""
+    newest = None
+    for path in glob.glob(pattern):
+        if os.path.abspath(path) in exclude:
+            continue
+        st = _stat_key(path)
+        if st is not None and os.path.isfile(path) and (newest is None or (st[1], path) > newest[0]):
+            newest = ((st[1], path), path)
+    return newest[1] if newest else None
+
+
+def _job_key(job: Dict) -> tuple:
+    selection = job['selection'] if isinstance(job['selection'], str) else tuple(job['selection'])
+    return job['source'], job['target'], job['output'], selection, job['match']
+
+
+def _matcher(data: Dict) -> DeviceMatcher:
+    return DeviceMatcher(data.get('pairedDevices', []))
+
+
+def run_cached_job(cache: ConfigCache, job: Dict, timer: StageTimer = NULL_TIMER) -> Dict:
+    """Run one manifest job from cached configs and indexes; never raises"""
+    start = time.perf_counter()
+    try:
+        source = cache.load(job['source'], timer=timer)
+        target = cache.load(job['target'], timer=timer)
+        selected_devices = engine.select_devices(source.data, job['selection'])
+        strategies = POSITION_ONLY if job.get('match') == 'position' else STRATEGIES
+        with timer.stage('index'):
+            source_index, target_index = source.routing, target.routing
+            matcher = target.derived('matcher', _matcher)
+        result = engine.generate_transfer(source.data, target.data, selected_devices, source_index, target_index,
+                                          strategies, matcher, timer)
+        out_dir = os.path.dirname(job['output'])
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+        engine.save_config(result.output_data, job['output'], timer=timer)
+        summary = engine.transfer_summary(result, job['target'], job['output'])
+        summary['status'] = 'ok'
+    except TransferError as e:
+        summary = {'status': 'error', 'error': f"{e.title}: {e.message}"}
+    except Exception as e:
+        summary = {'status': 'error', 'error': f"{type(e).__name__}: {e}"}
+    summary.update({
+        'index': job['index'],
+        'source': job['source'],
+        'target': job['target'],
+        'output': job['output'],
+        'seconds': round(time.perf_counter() - start, 4),
+    })
+    return summary
+
+
+class FolderWatcher:
+    """Polls a manifest's input files (and the folders of pattern inputs) and re-runs the jobs whose inputs changed"""
+
+    def __init__(self, manifest_path: str, output_dir: Optional[str] = None, debounce: float = 2.0,
+                 cache: Optional[ConfigCache] = None, log: Callable[[str], None] = print,
+                 timings: bool = False, compact: bool = False):
+        self.manifest_path = manifest_path
+        self.output_dir = output_dir
+        self.debounce = debounce
+        self.cache = cache
+        self.log = log
+        self.timings = timings
+        self.compact = compact  # only used when the watcher makes its own cache
+        self.jobs = []
+        self.manifest_stat = None
+        self.stats = {}     # path -> (size, mtime_ns) last seen
+        self.digests = {}   # path -> content digest the outputs were last built from
+        self.pending = {}   # path -> time of the latest stat change still settling
+        self.resolved = {}  # input pattern -> newest matching file in use (None when nothing matches)
+        self.candidates = {}  # input pattern -> (newer file, its stat, first seen) while it settles
+        self.runs = 0
+
+    def _inputs(self) -> List[str]:
+        """Every source and target as written in the manifest: file paths and patterns"""
+        inputs = []
+        for job in self.jobs:
+            for path in (job['source'], job['target']):
+                if path not in inputs:
+                    inputs.append(path)
+        return inputs
+
+    def _paths(self) -> List[str]:
+        """Files currently watched: plain inputs and the file each pattern resolved to"""
+        paths = []
+        for path in self._inputs():
+            path = self.resolved.get(path) if _is_pattern(path) else path
+            if path is not None and path not in paths:
+                paths.append(path)
+        return paths
+
+    def _newest(self, pattern: str) -> Optional[str]:
+        # Outputs are written next to the exports they come from often enough; one matching an
+        # input pattern must not be taken for a new export
+        return _newest_match(pattern, {os.path.abspath(job['output']) for job in self.jobs})
+
+    def _concrete(self, job: Dict) -> Dict:
+        """The job with pattern inputs replaced by the files they resolved to"""
+        return dict(job, **{key: self.resolved.get(job[key]) or job[key]
+                            for key in ('source', 'target') if _is_pattern(job[key])})
+
+    def _load_manifest(self) -> List[Dict]:
+        """(Re)read the manifest; returns the jobs that are new or changed"""
+        try:
+            jobs = load_manifest(self.manifest_path, self.output_dir)
+        except (OSError, ValueError) as e:
+            self.log(f"Cannot read manifest, keeping the previous jobs: {e}")
+            return []
+        bad = [job for job in jobs if _is_pattern(os.path.basename(job['output']))]
+        if bad:
+            self.log(f"Cannot read manifest, keeping the previous jobs: job {bad[0]['index']} "
+                     f"has a target pattern, so it needs an explicit 'output'")
+            return []
+        known = {_job_key(job) for job in self.jobs}
+        self.jobs = jobs
+        patterns = [path for path in self._inputs() if _is_pattern(path)]
+        for pattern in list(self.resolved):
+            if pattern not in patterns:
+                del self.resolved[pattern]
+                self.candidates.pop(pattern, None)
+        for pattern in patterns:
+            if pattern not in self.resolved:
+                self.resolved[pattern] = self._newest(pattern)
+        paths = self._paths()
+        if self.cache is None:
+            self.cache = ConfigCache(max_entries=max(8, len(paths) + 2), compact=self.compact)
+        else:
+            self.cache.max_entries = max(self.cache.max_entries, len(paths) + 2)
+        for path in list(self.stats):
+            if path not in paths:
+                del self.stats[path]
+                self.digests.pop(path, None)
+                self.pending.pop(path, None)
+        # New inputs are baselined as they are; the jobs using them run as new jobs
+        for path in paths:
+            if path not in self.stats:
+                self.stats[path] = _stat_key(path)
+                if self.stats[path] is not None:
+                    self.digests[path] = self._digest(path)
+        return [job for job in jobs if _job_key(job) not in known]
+
+    def start(self) -> List[Dict]:
+        """Load the manifest and bring stale or missing outputs up to date"""
+        self.manifest_stat = _stat_key(self.manifest_path)
+        self._load_manifest()
+        stale = []
+        for job in self.jobs:
+            concrete = self._concrete(job)
+            inputs = [_stat_key(concrete['source']), _stat_key(concrete['target'])]
+            output = _stat_key(job['output'])
+            if None in inputs or output is None or output[1] < max(s[1] for s in inputs):
+                stale.append(job)
+        if stale:
+            self.log(f"{len(stale)} of {len(self.jobs)} output(s) missing or older than their inputs")
+        return self._run(stale)
+
+    def _digest(self, path: str) -> Optional[str]:
+        try:
+            return self.cache.load(path).digest
+        except (OSError, ValueError) as e:
+            self.log(f"Cannot read {os.path.basename(path)}: {e}")
+            return None
+
+    def poll(self, now: Optional[float] = None) -> List[Dict]:
+        """Check every input once; returns the results of any jobs that were re-run"""
+        now = time.monotonic() if now is None else now
+        jobs = []
+
+        manifest_stat = _stat_key(self.manifest_path)
+        if manifest_stat != self.manifest_stat:
+            self.manifest_stat = manifest_stat
+            changed = self._load_manifest()
+            if changed:
+                self.log(f"Manifest changed: {len(changed)} new or changed job(s)")
+                jobs.extend(changed)
+
+        for job in self._poll_patterns(now):
+            if job not in jobs:
+                jobs.append(job)
+
+        for path in self._paths():
+            st = _stat_key(path)
+            if st != self.stats.get(path):
+                self.stats[path] = st
+                self.pending[path] = now
+                continue
+            if path not in self.pending or now - self.pending[path] < self.debounce or st is None:
+                continue
+
+            # Quiet for the debounce period: only now is the file read and hashed
+            del self.pending[path]
+            digest = self._digest(path)
+            if digest is None or digest == self.digests.get(path):
+                continue
+            self.digests[path] = digest
+            affected = [job for job in self.jobs
+                        if path in (self._concrete(job)['source'], self._concrete(job)['target'])]
+            self.log(f"{os.path.basename(path)} changed: re-running {len(affected)} job(s)")
+            jobs.extend(job for job in affected if job not in jobs)
+        return self._run(jobs)
+
+    def _poll_patterns(self, now: float) -> List[Dict]:
+        """Switch patterns to newer matching files once they have settled; returns the jobs to re-run"""
+        jobs = []
+        for pattern, current in list(self.resolved.items()):
+            newest = self._newest(pattern)
+            if newest is None or newest == current:
+                self.candidates.pop(pattern, None)
+                continue
+            st = _stat_key(newest)
+            seen = self.candidates.get(pattern)
+            if seen is None or seen[:2] != (newest, st):
+                self.candidates[pattern] = (newest, st, now)
+                continue
+            if now - seen[2] < self.debounce:
+                continue
+
+            del self.candidates[pattern]
+            # A new file with the same content as the one it replaces changes no output
+            previous = self.digests.get(current) if current is not None else None
+            self.resolved[pattern] = newest
+            if current is not None and current not in self._paths():
+                for table in (self.stats, self.digests, self.pending):
+                    table.pop(current, None)
+            self.stats[newest] = st
+            self.pending.pop(newest, None)
+            digest = self._digest(newest)
+            if digest is None:
+                continue
+            self.digests[newest] = digest
+            if digest == previous:
+                continue
+            affected = [job for job in self.jobs if pattern in (job['source'], job['target'])]
+            self.log(f"New export {os.path.basename(newest)}: re-running {len(affected)} job(s)")
+            jobs.extend(affected)
+        return jobs
+
+    def _run(self, jobs: List[Dict]) -> List[Dict]:
+        results = []
+        for job in jobs:
+            timer = StageTimer('watch_job', target=job['target']) if self.timings else NULL_TIMER
+            r = run_cached_job(self.cache, self._concrete(job), timer)
+            if timer.enabled:
+                timer.write_log()
+            self.runs += 1
+            stamp = datetime.now().strftime('%H:%M:%S')
+            if r['status'] == 'ok':
+                timing = f" in {timer.summary()}" if timer.enabled else f" in {r['seconds']:.2f}s"
+                self.log(f"{stamp} [ok]    {os.path.basename(r['output'])}: {r['description']}{timing}")
+                for warning in r['warnings']:
+                    self.log(f"         warning: {warning.splitlines()[0]}")
+            else:
+                self.log(f"{stamp} [error] {os.path.basename(r['target'])}: {r['error']}")
+            results.append(r)
+        return results
+
+    def run(self, interval: float = 1.0, stop: Optional[threading.Event] = None):
+        """Poll until stop is set (or forever)"""
+        stop = stop or threading.Event()
+        self.start()
+        self.log(f"Watching {len(self._paths())} file(s) for {len(self.jobs)} job(s); Ctrl+C to stop")
+        while not stop.wait(interval):
+            self.poll()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Re-run Spectera transfers whenever their exports change")
+    parser.add_argument('manifest', help="Batch manifest listing source/target/selection jobs")
+    parser.add_argument('-o', '--output-dir', help="Directory for job outputs (default: manifest directory)")
+    parser.add_argument('--interval', type=float, default=1.0, help="Seconds between polls (default: 1)")
+    parser.add_argument('--debounce', type=float, default=2.0,
+                        help="Seconds a changed file must stay unchanged before it is read (default: 2)")
+    parser.add_argument('--once', action='store_true', help="Bring stale outputs up to date and exit")
+    parser.add_argument('--timings', action='store_true', help="Show and log per-stage timings")
+    parser.add_argument('--compact', action='store_true',
+                        help="Keep cached configs as compact records: less memory, slower transfers")
+    args = parser.parse_args(argv)
+
+    watcher = FolderWatcher(args.manifest, args.output_dir, args.debounce, timings=args.timings,
+                            compact=args.compact)
+    if not os.path.exists(args.manifest):
+        print(f"Manifest not found: {args.manifest}", file=sys.stderr)
+        return 2
+    try:
+        if args.once:
+            results = watcher.start()
+            return 0 if all(r['status'] == 'ok' for r in results) else 1
+        watcher.run(args.interval)
+    except KeyboardInterrupt:
+        print(f"Stopped after {watcher.runs} run(s) ({watcher.cache.describe()})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
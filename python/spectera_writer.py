@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Spectera config writer
+Streams a config to disk in the minified base station format, one section and
+one chunk of records at a time, into a temporary file next to the destination.
+The file is flushed, fsynced and renamed over the destination only once it is
+complete, so a crash or a full disk never leaves a truncated config behind.
+
+Output keeps the key order of the data and uses compact separators and raw
+UTF-8, which is byte-for-byte what the base station exports. orjson is used
+when it is installed, otherwise the standard library encoder. Check that a
+file survives a load/save round trip unchanged with:
+
+    python spectera_writer.py primary.json
+
+Copyright (C) 2024
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+"""
+
+import importlib.util
+import json
+import os
+import re
+import sys
+from typing import Callable, Dict, List, Optional
+
+from spectera_model import to_plain
+from spectera_profile import NULL_TIMER, StageTimer
+
+
+# orjson is an optional speed-up (the standard library encoder is byte-compatible);
+# it is only imported on first use so loading this module stays cheap
+BACKENDS = ('orjson', 'json') if importlib.util.find_spec('orjson') is not None else ('json',)
+DEFAULT_BACKEND = BACKENDS[0]
+_orjson_dumps = None
+
+# orjson writes some floats differently from the standard library (1e-7 for 1e-07, 1e16 for
+# 1e+16, 0.00001 for 1e-05); its exponents always follow a digit
+_ORJSON_EXPONENT = re.compile(rb'e[-\d]')
+
+
+def _orjson_floats_differ(raw: bytes) -> bool:
+    """True when orjson output may hold a float the standard library writes differently
+
+    A few strings match too (e.g. "Mic 2e3"); those values are then just encoded the
+    standard way.
+    """
+    if b'0.0000' in raw:
+        return True
+    for match in _ORJSON_EXPONENT.finditer(raw):
+        if raw[match.start() - 1:match.start()].isdigit():
+            return True
+    return False
+
+
+# Records encoded per write; bounds the size of the text held in memory at once
+CHUNK_RECORDS = 2048
+
+# Compact records (spectera_model) encode as the dicts they were made from
+_json_encoder = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False, allow_nan=False, default=to_plain)
+
+
+def _encode_json(value) -> bytes:
+    return _json_encoder.encode(value).encode('utf-8')
+
+
+def _encode_orjson(value) -> bytes:
+    global _orjson_dumps
+    if _orjson_dumps is None:
+        import orjson
+        _orjson_dumps = orjson.dumps
+    try:
+        raw = _orjson_dumps(value, default=to_plain)
+    except TypeError:
+        # Integers beyond 64 bits and other values orjson refuses
+        return _encode_json(value)
+    if _orjson_floats_differ(raw):
+        return _encode_json(value)
+    return raw
+
+
+def encoder_for(backend: Optional[str] = None) -> Callable[[object], bytes]:
+    """Return a function encoding one value as minified UTF-8 JSON"""
+    backend = backend or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"JSON backend {backend!r} is not available (installed: {', '.join(BACKENDS)})")
+    return _encode_orjson if backend == 'orjson' else _encode_json
+
+
+def iter_config_chunks(data: Dict, backend: Optional[str] = None, chunk_records: int = CHUNK_RECORDS):
+    """Yield the encoded config as byte chunks, section by section
+
+    List sections are encoded chunk_records records at a time; the joined chunks
+    equal the encoding of the whole document.
+    """
+    encode = encoder_for(backend)
+    if not isinstance(data, dict):
+        yield encode(data)
+        return
+
+    yield b'{'
+    for i, (key, value) in enumerate(data.items()):
+        yield (b',' if i else b'') + encode(key) + b':'
+        if not isinstance(value, list) or len(value) <= chunk_records:
+            yield encode(value)
+            continue
+        yield b'['
+        for start in range(0, len(value), chunk_records):
+            # Slicing the list encoding drops its brackets, keeping the records' own bytes
+            chunk = encode(value[start:start + chunk_records])[1:-1]
+            yield chunk if start == 0 else b',' + chunk
+        yield b']'
+    yield b'}'
+
+
+def _fsync_directory(directory: str):
+    # Makes the rename itself durable; directories cannot be opened on Windows
+    if os.name != 'posix':
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_config(data: Dict, path: str, timer: StageTimer = NULL_TIMER,
+                 backend: Optional[str] = None, check: Optional[Callable[[], None]] = None) -> int:
+    """Atomically write data to path in the base station format; returns the bytes written
+
+    When given, check() is called after each chunk and just before the file is renamed
+    into place; if it raises (e.g. the user cancelled), the temporary file is removed and
+    path is left untouched.
+    """
+    import tempfile
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            with timer.stage('write') as stage:
+                written = 0
+                for chunk in iter_config_chunks(data, backend):
+                    f.write(chunk)
+                    written += len(chunk)
+                    if check is not None:
+                        check()
+                stage.objects = written
+            with timer.stage('fsync'):
+                f.flush()
+                os.fsync(f.fileno())
+        _copy_mode(path, tmp_path)
+        if check is not None:
+            check()
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_directory(directory)
+    return written
+
+
+def _copy_mode(path: str, tmp_path: str):
+    # mkstemp creates the file owner-only; give it the destination's mode, or the umask default
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+    try:
+        os.chmod(tmp_path, mode)
+    except OSError:
+        pass
+
+
+def round_trip_mismatch(path: str, backend: Optional[str] = None) -> Optional[int]:
+    """Return the offset of the first byte that differs after load and save, or None if identical"""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    rewritten = b''.join(iter_config_chunks(json.loads(raw), backend))
+    if rewritten == raw:
+        return None
+    for offset, (a, b) in enumerate(zip(raw, rewritten)):
+        if a != b:
+            return offset
+    return min(len(raw), len(rewritten))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="Check that configs are rewritten byte-for-byte after loading and saving"
+    )
+    parser.add_argument('files', nargs='+', help="Base station exports (golden files)")
+    parser.add_argument('--backend', choices=BACKENDS, help=f"JSON backend (default: {DEFAULT_BACKEND})")
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for path in args.files:
+        with open(path, 'rb') as f:
+            raw = f.read()
+        offset = round_trip_mismatch(path, args.backend)
+        if offset is None:
+            print(f"OK        {path} ({len(raw)} bytes)")
+            continue
+        failed += 1
+        print(f"MISMATCH  {path} at byte {offset}: {raw[max(0, offset - 30):offset + 30]!r}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Tests for spectera_diff: a patch must reproduce the new config byte-for-byte
+
+    python -m unittest test_spectera_diff
+"""
+
+import unittest
+
+from spectera_diff import apply_patch, diff_configs
+from spectera_writer import iter_config_chunks
+
+
+def saved_bytes(data):
+    return b''.join(iter_config_chunks(data))
+
+
+class TypeChangeRoundTrip(unittest.TestCase):
+    """0/False, 1/True and 1/1.0 compare equal with == but save differently"""
+
+    def assert_round_trip(self, old, new):
+        patch = diff_configs(old, new)
+        self.assertEqual(saved_bytes(apply_patch(old, patch)), saved_bytes(new))
+        return patch
+
+    def test_record_field_zero_to_false(self):
+        old = {'pairedDevices': [{'mtUid': 1, 'sleep': 0, 'name': 'A'}]}
+        new = {'pairedDevices': [{'mtUid': 1, 'sleep': False, 'name': 'A'}]}
+        patch = self.assert_round_trip(old, new)
+        self.assertEqual(patch['sections']['pairedDevices']['changed'], [{'set': {'sleep': False}, 'id': 1}])
+
+    def test_int_to_float_and_nested_values(self):
+        old = {'pairedDevices': [{'mtUid': 1, 'gain': 1, 'levels': [1, {'on': 0}]}], 'flag': 1}
+        new = {'pairedDevices': [{'mtUid': 1, 'gain': 1.0, 'levels': [1, {'on': False}]}], 'flag': True}
+        patch = self.assert_round_trip(old, new)
+        self.assertEqual(patch['set'], {'flag': True})
+
+    def test_equal_configs_give_empty_patch(self):
+        old = {'pairedDevices': [{'mtUid': 1, 'sleep': False}], 'flag': 0}
+        new = {'pairedDevices': [{'mtUid': 1, 'sleep': False}], 'flag': 0}
+        patch = self.assert_round_trip(old, new)
+        self.assertNotIn('sections', patch)
+        self.assertNotIn('set', patch)
+
+
+if __name__ == '__main__':
+    unittest.main()
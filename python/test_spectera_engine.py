@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Tests for spectera_engine: broken references are reported, never fatal
+
+    python -m unittest test_spectera_engine
+"""
+
+import copy
+import json
+import os
+import tempfile
+import unittest
+
+import spectera_engine as engine
+from spectera_cache import ConfigCache
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_example(name):
+    with open(os.path.join(HERE, name), 'rb') as f:
+        return json.loads(f.read())
+
+
+class NullLinkReferences(unittest.TestCase):
+    """A null or non-integer audiolink reference is an invalid_reference, not a crash"""
+
+    def setUp(self):
+        self.source = load_example('primary.json')
+        self.target = load_example('editortest.json')
+        self.broken = copy.deepcopy(self.source)
+        self.broken['audioInputs'][0]['iemAudiolinkId'] = None
+        self.broken['audioOutputs'][0]['micAudiolinkId'] = "3"
+        self.broken['pairedDevices'][0]['iemAudiolinkId'] = None
+
+    def test_routing_index_skips_null_links(self):
+        index = engine.RoutingIndex(self.broken)
+        self.assertNotIn(None, index.inputs)
+        self.assertNotIn("3", index.outputs)
+
+    def test_audiolink_ids_skip_null_links(self):
+        ids = engine.get_audiolink_ids_for_devices(self.broken['pairedDevices'])
+        self.assertTrue(all(type(i) is int for i in ids))
+
+    def test_transfer_and_cache_load(self):
+        result = engine.generate_transfer(self.broken, self.target, self.broken['pairedDevices'])
+        self.assertTrue(result.output_data['pairedDevices'])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bad.json')
+            engine.save_config(self.broken, path)
+            entry = ConfigCache().load(path)
+            entry.routing
+            codes = {v.code for v in entry.validation.violations}
+        self.assertIn('invalid_reference', codes)
+
+
+if __name__ == '__main__':
+    unittest.main()
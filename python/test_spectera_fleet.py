@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests for spectera_fleet: cancellation, and compact records giving the same outputs
+
+    python -m unittest test_spectera_fleet
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from spectera_fleet import FleetSource, plan_targets, run_fleet
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class Cancelled(Exception):
+    pass
+
+
+class Cancellation(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        targets = []
+        for name in ('A', 'B', 'C', 'D'):
+            targets.append(os.path.join(self.directory, f'backup_{name}.json'))
+            shutil.copy(os.path.join(HERE, 'editortest.json'), targets[-1])
+        self.out = os.path.join(self.directory, 'out')
+        os.makedirs(self.out)
+        self.source = FleetSource.load(os.path.join(HERE, 'primary.json'))
+        self.jobs = plan_targets(targets, self.out)
+
+    def cancel_after(self, calls: int):
+        made = []
+
+        def check():
+            made.append(1)
+            if len(made) > calls:
+                raise Cancelled()
+        return check
+
+    def test_serial_run_stops_between_targets(self):
+        with self.assertRaises(Cancelled):
+            run_fleet(self.source, self.jobs, workers=1, check=self.cancel_after(2))
+        self.assertEqual(sorted(os.listdir(self.out)), ['backup_A_transfer.json', 'backup_B_transfer.json'])
+
+    def test_pool_run_raises_and_leaves_only_complete_outputs(self):
+        with self.assertRaises(Cancelled):
+            run_fleet(self.source, self.jobs, workers=2, check=self.cancel_after(0))
+        for name in os.listdir(self.out):
+            self.assertTrue(name.endswith('_transfer.json'), name)
+            with open(os.path.join(self.out, name), 'rb') as f:
+                self.assertTrue(json.loads(f.read())['pairedDevices'])
+
+    def test_uncancelled_pool_run_writes_every_target(self):
+        results = run_fleet(self.source, self.jobs, workers=2, check=lambda: None)
+        self.assertEqual([r['status'] for r in results], ['ok'] * 4)
+        self.assertEqual([r['index'] for r in results], [0, 1, 2, 3])
+
+
+class CompactRecords(unittest.TestCase):
+
+    def test_compact_run_writes_the_same_outputs(self):
+        outputs = {}
+        with tempfile.TemporaryDirectory() as directory:
+            for compact in (False, True):
+                out = os.path.join(directory, str(compact))
+                source = FleetSource.load(os.path.join(HERE, 'primary.json'), compact=compact)
+                jobs = plan_targets([os.path.join(HERE, 'editortest.json')], out, compact=compact)
+                os.makedirs(out)
+                self.assertEqual([r['status'] for r in run_fleet(source, jobs)], ['ok'])
+                with open(jobs[0]['output'], 'rb') as f:
+                    outputs[compact] = f.read()
+            self.assertNotIsInstance(source.data['pairedDevices'][0], dict)
+        self.assertEqual(outputs[True], outputs[False])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tests for spectera_net against stand-in base stations on localhost
+
+    python -m unittest test_spectera_net
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+
+from spectera_net import StationClient, transfer_stations
+from spectera_standin import StandInStation
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class TransferAndPush(unittest.TestCase):
+    """One transfer from a source onto two targets, the first of which answers 503 once"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.stations = []
+        cls.source = cls.station('primary.json')
+        cls.busy = cls.station('editortest.json', fail=1)
+        cls.steady = cls.station('editortest.json')
+
+        async def run():
+            async with StationClient(timeout=5.0, retries=2, backoff=0.01) as client:
+                results = await transfer_stations(client, cls.source.address,
+                                                  [cls.busy.address, cls.steady.address],
+                                                  output_dir=cls.directory, push=True)
+                return client, results
+        cls.client, cls.results = asyncio.run(run())
+
+    @classmethod
+    def tearDownClass(cls):
+        for station in cls.stations:
+            station.stop()
+        shutil.rmtree(cls.directory)
+
+    @classmethod
+    def station(cls, example: str, **options) -> StandInStation:
+        station = StandInStation.from_file(os.path.join(HERE, example), **options).start()
+        cls.stations.append(station)
+        return station
+
+    def test_busy_station_is_retried_once(self):
+        self.assertEqual([r['status'] for r in self.results], ['ok', 'ok'])
+        self.assertTrue(all(r['pushed'] for r in self.results))
+        self.assertEqual(self.client.retried, 1)
+        # 503 for the first GET, the retried GET, then the PUT
+        self.assertEqual(self.busy.requests, 3)
+        self.assertEqual((self.steady.requests, self.source.requests), (2, 1))
+
+    def test_connections_are_kept_alive(self):
+        # One connection per station, the 503 and the push included
+        self.assertEqual(self.client.connections_opened, 3)
+        self.assertEqual([s.connections for s in (self.source, self.busy, self.steady)], [1, 1, 1])
+
+    def test_pushed_document_is_the_saved_output(self):
+        for station, result in zip((self.busy, self.steady), self.results):
+            with open(result['output'], 'rb') as f:
+                self.assertEqual(station.document, f.read())
+            self.assertEqual(station.pushes, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
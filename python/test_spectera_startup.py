@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Tests for headless startup: the command line tools never load tkinter and import quickly
+
+    python -m unittest test_spectera_startup
+"""
+
+import unittest
+
+from spectera_bench import STARTUP_BUDGET_MS, STARTUP_MODULES, bench_startup
+
+
+class HeadlessImports(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # Best of three fresh interpreters, so one slow start on a busy machine does not fail the test
+        cls.results = {r['module']: r for r in bench_startup(STARTUP_MODULES, repeat=3)}
+
+    def test_tkinter_is_not_loaded(self):
+        for module in STARTUP_MODULES:
+            with self.subTest(module=module):
+                self.assertFalse(self.results[module]['tkinter'])
+
+    def test_imports_stay_within_budget(self):
+        for module in STARTUP_MODULES:
+            with self.subTest(module=module):
+                self.assertLessEqual(self.results[module]['import_ms'], STARTUP_BUDGET_MS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Tests for spectera_watch: export folders watched through manifest patterns
+
+    python -m unittest test_spectera_watch
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from spectera_watch import FolderWatcher
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class PatternInputs(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        os.makedirs(os.path.join(self.directory, 'exports'))
+        self.copy('primary.json', 'exports/rigA_1.json')
+        self.copy('editortest.json', 'backup.json')
+        self.logs = []
+
+    def copy(self, example: str, name: str, age: float = 0.0) -> str:
+        path = os.path.join(self.directory, name)
+        shutil.copy(os.path.join(HERE, example), path)
+        mtime = time.time() + age
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def watcher(self, jobs) -> FolderWatcher:
+        manifest = os.path.join(self.directory, 'manifest.json')
+        with open(manifest, 'w') as f:
+            json.dump({'jobs': jobs}, f)
+        return FolderWatcher(manifest, debounce=1.0, log=self.logs.append)
+
+    def test_output_matching_the_pattern_is_not_an_export(self):
+        watcher = self.watcher([{'source': 'exports/rigA_*.json', 'target': 'backup.json',
+                                 'output': 'exports/rigA_out.json'}])
+        results = watcher.start()
+        self.assertEqual([r['status'] for r in results], ['ok'])
+        self.assertTrue(os.path.exists(os.path.join(self.directory, 'exports', 'rigA_out.json')))
+
+        self.assertEqual(watcher.poll(100.0), [])
+        self.assertEqual(watcher.poll(102.0), [])
+        self.assertEqual(list(watcher.resolved.values()),
+                         [os.path.join(self.directory, 'exports', 'rigA_1.json')])
+        self.assertFalse([line for line in self.logs if 'New export' in line])
+
+    def test_newer_export_reruns_the_job_once_settled(self):
+        watcher = self.watcher([{'source': 'exports/rigA_*.json', 'target': 'backup.json', 'output': 'A.json'}])
+        watcher.start()
+        # Same devices as primary.json but a different file: editortest.json is a real change
+        newer = self.copy('editortest.json', 'exports/rigA_2.json', age=10)
+        self.assertEqual(watcher.poll(100.0), [])
+        self.assertEqual(watcher.poll(100.5), [])
+        results = watcher.poll(101.5)
+        self.assertEqual([r['source'] for r in results], [newer])
+        self.assertEqual(watcher.poll(103.0), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
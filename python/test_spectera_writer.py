@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Tests for spectera_writer: saved files match the base station format byte-for-byte
+
+    python -m unittest test_spectera_writer
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from spectera_diff import config_digest
+from spectera_writer import BACKENDS, encoder_for, iter_config_chunks, write_config
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+class Cancelled(Exception):
+    pass
+
+
+class RoundTrip(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.original = read_bytes(os.path.join(HERE, 'primary.json'))
+        self.data = json.loads(self.original)
+
+    def test_primary_round_trips_with_every_backend(self):
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                path = os.path.join(self.directory, f'{backend}.json')
+                written = write_config(self.data, path, backend=backend)
+                self.assertEqual(read_bytes(path), self.original)
+                self.assertEqual(written, len(self.original))
+
+    def test_floats_are_written_as_the_standard_library_does(self):
+        value = {'gain': 1e-7, 'levels': [1e16, 0.00001, -2.5e-8, 0.1, 1.5], 'name': 'Mic 2e3'}
+        expected = encoder_for('json')(value)
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                self.assertEqual(encoder_for(backend)(value), expected)
+
+    def test_digest_does_not_depend_on_the_backend(self):
+        data = dict(self.data, gain=1e-7)
+        expected = config_digest(data)
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                path = os.path.join(self.directory, f'{backend}.json')
+                write_config(data, path, backend=backend)
+                with open(path, 'rb') as f:
+                    self.assertEqual(config_digest(json.loads(f.read())), expected)
+
+    def test_non_ascii_names_survive_any_locale(self):
+        path = os.path.join(self.directory, 'names.json')
+        data = dict(self.data)
+        data['pairedDevices'] = [dict(data['pairedDevices'][0], name='Jürgen Ø')]
+        write_config(data, path)
+        # The default text encoding in the child is ASCII (C locale without UTF-8 mode)
+        code = ("import sys, spectera_engine as e; "
+                "d = e.load_config(sys.argv[1]); "
+                "e.save_config(d, sys.argv[1]); "
+                "print(ascii(d['pairedDevices'][0]['name']))")
+        env = dict(os.environ, LC_ALL='C', LANG='C', PYTHONUTF8='0', PYTHONCOERCECLOCALE='0',
+                   PYTHONIOENCODING='ascii')
+        env.pop('PYTHONPATH', None)
+        result = subprocess.run([sys.executable, '-c', code, path], cwd=HERE, env=env,
+                                capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), ascii('Jürgen Ø'))
+        self.assertIn('Jürgen Ø'.encode('utf-8'), read_bytes(path))
+
+
+class InterruptedWrites(unittest.TestCase):
+    """A write that stops part-way leaves the existing file as it was, with no temp file"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'config.json')
+        self.original = read_bytes(os.path.join(HERE, 'primary.json'))
+        with open(self.path, 'wb') as f:
+            f.write(self.original)
+        self.data = json.loads(self.original)
+
+    def assert_untouched(self):
+        self.assertEqual(read_bytes(self.path), self.original)
+        self.assertEqual(os.listdir(self.directory), ['config.json'])
+
+    def test_cancelled_after_first_chunk(self):
+        def check():
+            raise Cancelled()
+        with self.assertRaises(Cancelled):
+            write_config(dict(self.data, name='new'), self.path, check=check)
+        self.assert_untouched()
+
+    def test_cancelled_just_before_rename(self):
+        data = dict(self.data, name='new')
+        calls = []
+        chunks = len(list(iter_config_chunks(data)))
+
+        def check():
+            calls.append(1)
+            # One call per chunk, then a last one before the rename
+            if len(calls) > chunks:
+                raise Cancelled()
+        with self.assertRaises(Cancelled):
+            write_config(data, self.path, check=check)
+        self.assertEqual(len(calls), chunks + 1)
+        self.assert_untouched()
+
+    def test_unencodable_value_part_way(self):
+        data = dict(self.data)
+        data['pairedDevices'] = list(data['pairedDevices']) + [{'name': object()}]
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                with self.assertRaises(TypeError):
+                    write_config(data, self.path, backend=backend)
+                self.assert_untouched()
+
+
+if __name__ == '__main__':
+    unittest.main()